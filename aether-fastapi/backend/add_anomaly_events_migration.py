@@ -0,0 +1,61 @@
+"""
+Create the anomaly_events table for the streaming share anomaly detector
+
+Run this with:
+python add_anomaly_events_migration.py
+"""
+
+from database import get_db
+from sqlalchemy import text
+
+def run_migration():
+    db = next(get_db())
+    
+    try:
+        # Check if table exists
+        check_query = text("""
+            SELECT table_name 
+            FROM information_schema.tables 
+            WHERE table_name='anomaly_events';
+        """)
+        
+        result = db.execute(check_query).fetchone()
+        
+        if result:
+            print("✅ Table 'anomaly_events' already exists!")
+            return
+        
+        # Create the table and its paging index
+        migration_query = text("""
+            CREATE TABLE anomaly_events (
+                id BIGSERIAL PRIMARY KEY,
+                symbol VARCHAR NOT NULL,
+                anomaly_type VARCHAR NOT NULL,
+                severity VARCHAR NOT NULL,
+                description VARCHAR NOT NULL,
+                price DOUBLE PRECISION NOT NULL,
+                previous_price DOUBLE PRECISION NOT NULL,
+                price_change DOUBLE PRECISION NOT NULL,
+                volume_change DOUBLE PRECISION NULL,
+                price_zscore DOUBLE PRECISION NULL,
+                volume_zscore DOUBLE PRECISION NULL,
+                quote_time TIMESTAMPTZ NOT NULL,
+                detected_at TIMESTAMPTZ DEFAULT now()
+            );
+            CREATE INDEX ix_anomaly_events_symbol_id ON anomaly_events (symbol, id);
+        """)
+        
+        db.execute(migration_query)
+        db.commit()
+        
+        print("✅ Successfully created 'anomaly_events' table!")
+        
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error running migration: {e}")
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    run_migration()
@@ -1,5 +1,5 @@
 from database import engine, Base
-from models import user, real_estate, document, crypto, bonds, business
+from models import user, real_estate, document, crypto, bonds, business, anomaly_event
 
 print("Creating tables...")
 Base.metadata.create_all(bind=engine)
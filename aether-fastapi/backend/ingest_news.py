@@ -0,0 +1,61 @@
+"""
+Ingest news headlines for every held share and crypto coin into the shared headline store
+
+Run this with:
+python ingest_news.py               # one pass
+python ingest_news.py --every 15    # a pass every 15 minutes (start.sh runs this)
+"""
+
+import argparse
+import time
+
+from database import SessionLocal
+from models.shares import Share, ShareStatus
+from models.crypto import CryptoHolding
+from ml.data.news_ingest import news_ingester
+
+
+def held_symbols():
+    """Active share tickers (with company names) and held coin symbols"""
+    db = SessionLocal()
+    try:
+        stocks = {
+            symbol.upper(): company
+            for symbol, company in db.query(Share.symbol, Share.company_name)
+            .filter(Share.status == ShareStatus.ACTIVE).distinct()
+        }
+        coins = sorted({symbol.upper() for (symbol,) in db.query(CryptoHolding.symbol).distinct()})
+        return stocks, coins
+    finally:
+        db.close()
+
+
+def run_once():
+    stocks, coins = held_symbols()
+    summary = news_ingester.run(stocks, coins)
+    print(f"📰 {summary['refreshed']} symbols refreshed, {summary['skipped_fresh']} still fresh, "
+          f"{summary['new_headlines']} new headlines in {summary['elapsed_seconds']}s "
+          f"(each symbol refreshed every {summary['interval_seconds'] // 60} min)")
+    for provider, budget in summary['budgets'].items():
+        print(f"   {provider}: {budget['used']} requests used today, {budget['remaining']} left")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest news headlines for held shares and coins")
+    parser.add_argument('--every', type=float, help="Repeat every N minutes instead of running once")
+    args = parser.parse_args()
+
+    while True:
+        try:
+            run_once()
+        except Exception as e:
+            print(f"❌ News ingestion failed: {e}")
+            if not args.every:
+                raise
+        if not args.every:
+            return
+        time.sleep(args.every * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""
+Model Artifact Store
+Versioned model artifacts: safetensors-layout tensor files (memory-mapped on load) plus a JSON manifest
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+
+FORMAT_VERSION = 1
+ARTIFACTS_DIR = os.path.join(os.path.dirname(__file__), 'models', 'artifacts')
+TENSORS_FILE = 'tensors.safetensors'
+MANIFEST_FILE = 'manifest.json'
+CURRENT_FILE = 'CURRENT'
+
+# safetensors dtype codes
+_DTYPE_CODES = {
+    np.dtype(np.float16): 'F16',
+    np.dtype(np.float32): 'F32',
+    np.dtype(np.float64): 'F64',
+    np.dtype(np.int32): 'I32',
+    np.dtype(np.int64): 'I64',
+    np.dtype(np.uint8): 'U8',
+    np.dtype(np.bool_): 'BOOL',
+}
+_CODE_DTYPES = {code: dtype for dtype, code in _DTYPE_CODES.items()}
+
+
+def write_tensors(path: str, tensors: Dict[str, np.ndarray], metadata: Optional[Dict[str, str]] = None):
+    """
+    Write arrays in the safetensors layout: u64 little-endian header length,
+    JSON header (padded to 8 bytes), then each array's raw little-endian bytes.
+    """
+    header = {}
+    offset = 0
+    arrays = []
+    for name in sorted(tensors):
+        array = np.ascontiguousarray(tensors[name])
+        if array.dtype.byteorder == '>':
+            array = array.astype(array.dtype.newbyteorder('<'))
+        if array.dtype not in _DTYPE_CODES:
+            raise TypeError(f"Unsupported dtype {array.dtype} for tensor '{name}'")
+        header[name] = {
+            'dtype': _DTYPE_CODES[array.dtype],
+            'shape': list(array.shape),
+            'data_offsets': [offset, offset + array.nbytes]
+        }
+        offset += array.nbytes
+        arrays.append(array)
+    if metadata:
+        header['__metadata__'] = {str(k): str(v) for k, v in metadata.items()}
+
+    header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    header_bytes += b' ' * (-len(header_bytes) % 8)
+
+    with open(path, 'wb') as f:
+        f.write(len(header_bytes).to_bytes(8, 'little'))
+        f.write(header_bytes)
+        for array in arrays:
+            f.write(array.tobytes())
+
+
+def read_tensors(path: str) -> Tuple[Dict[str, np.ndarray], Dict[str, str]]:
+    """
+    Memory-map a safetensors-layout file.
+
+    Arrays are copy-on-write views of the file: pages are loaded lazily and
+    shared by every process that maps the same artifact until one writes.
+    """
+    with open(path, 'rb') as f:
+        header_len = int.from_bytes(f.read(8), 'little')
+        header = json.loads(f.read(header_len))
+    metadata = header.pop('__metadata__', {})
+
+    data_start = 8 + header_len
+    data_len = max((spec['data_offsets'][1] for spec in header.values()), default=0)
+    if data_len == 0:
+        return {name: np.zeros(spec['shape'], dtype=_CODE_DTYPES[spec['dtype']]) for name, spec in header.items()}, metadata
+
+    buffer = np.memmap(path, dtype=np.uint8, mode='c', offset=data_start, shape=(data_len,))
+    tensors = {}
+    for name, spec in header.items():
+        begin, end = spec['data_offsets']
+        dtype = _CODE_DTYPES[spec['dtype']]
+        tensors[name] = buffer[begin:end].view(dtype).reshape(spec['shape']).view(np.ndarray)
+    return tensors, metadata
+
+
+def hash_arrays(*arrays: np.ndarray) -> str:
+    """SHA-256 over the dtype, shape and bytes of each array (training-data fingerprint)"""
+    digest = hashlib.sha256()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(str(array.dtype).encode())
+        digest.update(str(array.shape).encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+# Fitted attributes needed to rebuild each supported sklearn scaler
+_SCALER_ATTRIBUTES = {
+    'MinMaxScaler': ('min_', 'scale_', 'data_min_', 'data_max_', 'data_range_'),
+    'StandardScaler': ('mean_', 'scale_', 'var_'),
+}
+
+
+def scaler_to_arrays(scaler, prefix: str = 'scaler.') -> Tuple[Dict[str, np.ndarray], Dict]:
+    """Split a fitted MinMaxScaler/StandardScaler into plain arrays plus JSON-able settings"""
+    kind = type(scaler).__name__
+    if kind not in _SCALER_ATTRIBUTES:
+        raise TypeError(f"Unsupported scaler type {kind}")
+
+    arrays = {
+        f"{prefix}{attr}": np.asarray(getattr(scaler, attr), dtype=np.float64)
+        for attr in _SCALER_ATTRIBUTES[kind]
+        if getattr(scaler, attr, None) is not None
+    }
+    settings = {
+        'type': kind,
+        'params': scaler.get_params(),
+        'n_features_in': int(scaler.n_features_in_),
+        'n_samples_seen': int(np.max(scaler.n_samples_seen_)),
+    }
+    return arrays, settings
+
+
+def scaler_from_arrays(arrays: Dict[str, np.ndarray], settings: Dict, prefix: str = 'scaler.'):
+    """Rebuild a fitted scaler from scaler_to_arrays output"""
+    from sklearn.preprocessing import MinMaxScaler, StandardScaler
+
+    kind = settings['type']
+    params = dict(settings['params'])
+    if kind == 'MinMaxScaler':
+        params['feature_range'] = tuple(params['feature_range'])
+        scaler = MinMaxScaler(**params)
+    elif kind == 'StandardScaler':
+        scaler = StandardScaler(**params)
+    else:
+        raise TypeError(f"Unsupported scaler type {kind}")
+
+    for attr in _SCALER_ATTRIBUTES[kind]:
+        key = f"{prefix}{attr}"
+        if key in arrays:
+            setattr(scaler, attr, np.array(arrays[key]))
+    scaler.n_features_in_ = settings['n_features_in']
+    scaler.n_samples_seen_ = settings['n_samples_seen']
+    return scaler
+
+
+class ArtifactStore:
+    """
+    Versioned artifact directories:
+
+        {root}/{kind}/{name}/{version}/manifest.json
+        {root}/{kind}/{name}/{version}/tensors.safetensors  (+ any native files)
+        {root}/{kind}/{name}/CURRENT                         (active version)
+
+    Versions are written to a temp directory and renamed into place, and the
+    CURRENT pointer is replaced atomically, so readers never see a partial
+    artifact. The pointer's mtime doubles as the change signal for hot reload.
+    """
+
+    def __init__(self, root: str = ARTIFACTS_DIR, keep_versions: int = 3):
+        self.root = root
+        self.keep_versions = keep_versions
+
+    def _model_dir(self, kind: str, name: str) -> str:
+        return os.path.join(self.root, kind, name)
+
+    def save(
+        self,
+        kind: str,
+        name: str,
+        tensors: Optional[Dict[str, np.ndarray]] = None,
+        files: Optional[Dict[str, Callable[[str], None]]] = None,
+        metadata: Optional[Dict] = None,
+        training_data_hash: Optional[str] = None,
+        make_current: bool = True
+    ) -> str:
+        """
+        Write a new artifact version.
+
+        Args:
+            kind: Model family (e.g. 'lstm', 'risk_classifier')
+            name: Model name within the family (e.g. symbol)
+            tensors: Arrays stored in the memory-mappable tensor file
+            files: Extra files in native formats, as filename -> writer(path)
+            metadata: JSON-serializable settings stored in the manifest
+            training_data_hash: Fingerprint of the training data
+            make_current: Point CURRENT at the new version
+
+        Returns:
+            The new version id
+        """
+        model_dir = self._model_dir(kind, name)
+        os.makedirs(model_dir, exist_ok=True)
+
+        version = datetime.now().strftime('%Y%m%dT%H%M%S%f')
+        tmp_dir = os.path.join(model_dir, f".{version}.{os.getpid()}.tmp")
+        os.makedirs(tmp_dir)
+
+        try:
+            written = []
+            if tensors:
+                write_tensors(os.path.join(tmp_dir, TENSORS_FILE), tensors)
+                written.append(TENSORS_FILE)
+            for filename, writer in (files or {}).items():
+                writer(os.path.join(tmp_dir, filename))
+                written.append(filename)
+
+            manifest = {
+                'format_version': FORMAT_VERSION,
+                'kind': kind,
+                'name': name,
+                'version': version,
+                'created_at': datetime.now().isoformat(),
+                'training_data_hash': training_data_hash,
+                'files': {
+                    filename: os.path.getsize(os.path.join(tmp_dir, filename))
+                    for filename in written
+                },
+                'metadata': metadata or {}
+            }
+            with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w') as f:
+                json.dump(manifest, f, indent=2)
+
+            os.replace(tmp_dir, os.path.join(model_dir, version))
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        if make_current:
+            self.set_current(kind, name, version)
+        self._prune(kind, name)
+        return version
+
+    def set_current(self, kind: str, name: str, version: str):
+        """Atomically point CURRENT at an existing version"""
+        model_dir = self._model_dir(kind, name)
+        if not os.path.isdir(os.path.join(model_dir, version)):
+            raise FileNotFoundError(f"No version {version} for {kind}/{name}")
+        tmp_path = os.path.join(model_dir, f".{CURRENT_FILE}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w') as f:
+            f.write(version)
+        os.replace(tmp_path, os.path.join(model_dir, CURRENT_FILE))
+
+    def current_version(self, kind: str, name: str) -> Optional[str]:
+        try:
+            with open(os.path.join(self._model_dir(kind, name), CURRENT_FILE), 'r') as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def current_mtime(self, kind: str, name: str) -> Optional[float]:
+        """When CURRENT last changed (None if the model has no artifact)"""
+        try:
+            return os.path.getmtime(os.path.join(self._model_dir(kind, name), CURRENT_FILE))
+        except OSError:
+            return None
+
+    def version_dir(self, kind: str, name: str, version: Optional[str] = None) -> Optional[str]:
+        """Directory of a version (CURRENT by default), or None if missing"""
+        version = version or self.current_version(kind, name)
+        if version is None:
+            return None
+        path = os.path.join(self._model_dir(kind, name), version)
+        return path if os.path.isdir(path) else None
+
+    def list_versions(self, kind: str, name: str) -> list:
+        model_dir = self._model_dir(kind, name)
+        if not os.path.isdir(model_dir):
+            return []
+        return sorted(
+            entry for entry in os.listdir(model_dir)
+            if not entry.startswith('.') and os.path.isdir(os.path.join(model_dir, entry))
+        )
+
+    def load_manifest(self, kind: str, name: str, version: Optional[str] = None) -> Optional[Dict]:
+        """Manifest of a version (CURRENT by default), with its directory under 'dir'"""
+        path = self.version_dir(kind, name, version)
+        if path is None:
+            return None
+        with open(os.path.join(path, MANIFEST_FILE), 'r') as f:
+            manifest = json.load(f)
+        manifest['dir'] = path
+        return manifest
+
+    def load_tensors(self, kind: str, name: str, version: Optional[str] = None) -> Optional[Tuple[Dict[str, np.ndarray], Dict]]:
+        """Memory-mapped tensors and manifest of a version, or None if there is no artifact"""
+        manifest = self.load_manifest(kind, name, version)
+        if manifest is None:
+            return None
+        tensors_path = os.path.join(manifest['dir'], TENSORS_FILE)
+        tensors = read_tensors(tensors_path)[0] if os.path.exists(tensors_path) else {}
+        return tensors, manifest
+
+    def _prune(self, kind: str, name: str):
+        """Delete the oldest versions beyond keep_versions, never the current one"""
+        current = self.current_version(kind, name)
+        versions = self.list_versions(kind, name)
+        for version in versions[:max(0, len(versions) - self.keep_versions)]:
+            if version != current:
+                shutil.rmtree(os.path.join(self._model_dir(kind, name), version), ignore_errors=True)
+
+
+# Singleton instance
+artifact_store = ArtifactStore()
@@ -0,0 +1,122 @@
+"""
+Indicator Kernel Benchmark
+Compares the batched NumPy kernels with per-symbol `ta`/pandas indicators for speed and numerical agreement
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+import time
+import numpy as np
+import pandas as pd
+
+from ml.data import indicators
+
+
+def time_call(fn, repeats: int) -> float:
+    """Median latency in milliseconds"""
+    fn()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return float(np.median(samples))
+
+
+def kernel_features(prices: np.ndarray) -> dict:
+    """All indicators for every symbol in one call per kernel"""
+    macd_line, macd_signal, macd_diff = indicators.macd(prices)
+    bb_high, bb_mid, bb_low = indicators.bollinger(prices, 20, 2)
+    return {
+        'rsi': indicators.rsi(prices, 14),
+        'macd': macd_line,
+        'macd_signal': macd_signal,
+        'macd_diff': macd_diff,
+        'bb_high': bb_high,
+        'bb_mid': bb_mid,
+        'bb_low': bb_low,
+        'ema_7': indicators.ema(prices, 7),
+        'ema_21': indicators.ema(prices, 21),
+        'ema_50': indicators.ema(prices, 50),
+        'volatility_30d': indicators.rolling_volatility(prices, 30),
+    }
+
+
+def ta_features(prices: np.ndarray) -> dict:
+    """The same indicators with `ta` and pandas, one symbol at a time"""
+    from ta.momentum import RSIIndicator
+    from ta.trend import MACD, EMAIndicator
+    from ta.volatility import BollingerBands
+
+    rows = []
+    for row in prices:
+        close = pd.Series(row)
+        macd = MACD(close=close, window_slow=26, window_fast=12, window_sign=9)
+        bb = BollingerBands(close=close, window=20, window_dev=2)
+        rows.append({
+            'rsi': RSIIndicator(close=close, window=14).rsi().values,
+            'macd': macd.macd().values,
+            'macd_signal': macd.macd_signal().values,
+            'macd_diff': macd.macd_diff().values,
+            'bb_high': bb.bollinger_hband().values,
+            'bb_mid': bb.bollinger_mavg().values,
+            'bb_low': bb.bollinger_lband().values,
+            'ema_7': EMAIndicator(close=close, window=7).ema_indicator().values,
+            'ema_21': EMAIndicator(close=close, window=21).ema_indicator().values,
+            'ema_50': EMAIndicator(close=close, window=50).ema_indicator().values,
+            'volatility_30d': close.pct_change().rolling(30).std().values,
+        })
+    return {name: np.vstack([row[name] for row in rows]) for name in rows[0]}
+
+
+def max_relative_error(a: np.ndarray, b: np.ndarray) -> float:
+    if not np.array_equal(np.isnan(a), np.isnan(b)):
+        return float('inf')
+    mask = ~np.isnan(a)
+    if not mask.any():
+        return 0.0
+    return float(np.max(np.abs(a[mask] - b[mask]) / np.maximum(np.abs(b[mask]), 1e-12)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--symbols', type=int, nargs='+', default=[1, 10, 100, 1000])
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+
+    try:
+        import ta  # noqa: F401
+        have_ta = True
+    except ImportError:
+        have_ta = False
+        print("`ta` is not installed: timing the kernels only (pip install ta to compare)")
+
+    rng = np.random.default_rng(0)
+    print(f"\n{args.days} days per symbol")
+    print(f"{'symbols':>8}{'kernels':>12}{'ta/pandas':>14}{'speedup':>10}{'max rel err':>14}")
+
+    for n_symbols in args.symbols:
+        scale = rng.uniform(0.01, 5e4, size=(n_symbols, 1))
+        prices = scale * np.exp(np.cumsum(rng.normal(0, 0.03, (n_symbols, args.days)), axis=1))
+
+        kernel_ms = time_call(lambda: kernel_features(prices), args.repeats)
+        if not have_ta:
+            print(f"{n_symbols:>8}{kernel_ms:>9.2f} ms")
+            continue
+
+        reference_repeats = max(1, args.repeats // max(1, n_symbols // 10))
+        ta_ms = time_call(lambda: ta_features(prices), reference_repeats)
+
+        ours, reference = kernel_features(prices), ta_features(prices)
+        error = max(max_relative_error(ours[name], reference[name]) for name in reference)
+
+        print(f"{n_symbols:>8}{kernel_ms:>9.2f} ms{ta_ms:>11.2f} ms{ta_ms / kernel_ms:>9.1f}x{error:>14.1e}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
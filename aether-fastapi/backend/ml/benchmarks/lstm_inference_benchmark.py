@@ -0,0 +1,121 @@
+"""
+LSTM Inference Benchmark
+Compares eager, TorchScript and int8-quantized TorchScript latency and accuracy drift
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+import glob
+import time
+import warnings
+import numpy as np
+import torch
+
+from ml.artifacts import artifact_store
+from ml.predictors.lstm_price_predictor import LSTM_ARTIFACT_KIND, MODELS_DIR, load_bundle, rollout_multi_horizon
+from ml.predictors.lstm_runtime import load_eager_model, quantize_model
+
+
+def time_call(fn, repeats: int) -> dict:
+    """Median and p95 latency in milliseconds"""
+    for _ in range(5):
+        fn()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {'p50': float(np.percentile(samples, 50)), 'p95': float(np.percentile(samples, 95))}
+
+
+def benchmark_symbol(symbol: str, repeats: int, batch_size: int) -> None:
+    model = load_eager_model(symbol)
+    if model is None:
+        print(f"{symbol}: no trained model")
+        return
+
+    bundle = load_bundle(symbol)
+    scaler = bundle['scaler']
+    sequence_length = bundle['sequence_length']
+    n_features = len(bundle['feature_columns'])
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        variants = {
+            'eager': model,
+            'torchscript': torch.jit.script(model),
+            'torchscript-int8': torch.jit.script(quantize_model(model)),
+        }
+
+    # Scaled features live in [0, 1]
+    rng = np.random.default_rng(0)
+    windows = torch.from_numpy(rng.random((batch_size, sequence_length, n_features), dtype=np.float32))
+    single = windows[:1]
+    device = torch.device('cpu')
+
+    with torch.no_grad():
+        reference = model(windows).numpy()
+
+    print(f"\n{symbol} (threads={torch.get_num_threads()}, window={sequence_length}x{n_features})")
+    print(f"{'runtime':<18}{'1 window p50':>14}{'p95':>10}{f'batch {batch_size} p50':>16}{'30d rollout':>14}{'max drift %':>14}")
+
+    for name, variant in variants.items():
+        with torch.no_grad():
+            single_ms = time_call(lambda: variant(single), repeats)
+            batch_ms = time_call(lambda: variant(windows), max(10, repeats // 10))
+            rollout_ms = time_call(
+                lambda: rollout_multi_horizon(variant, single[0].numpy(), [30], device), max(5, repeats // 20)
+            )
+            output = variant(windows).numpy()
+
+        # Drift measured in price terms: inverse-transform the price column (0)
+        def to_price(values):
+            dummy = np.zeros((len(values), scaler.n_features_in_))
+            dummy[:, 0] = values
+            return scaler.inverse_transform(dummy)[:, 0]
+
+        ref_price = to_price(reference[:, 0])
+        drift_pct = np.abs(to_price(output[:, 0]) - ref_price) / np.abs(ref_price) * 100
+
+        print(f"{name:<18}{single_ms['p50']:>11.3f} ms{single_ms['p95']:>7.3f} ms"
+              f"{batch_ms['p50']:>13.3f} ms{rollout_ms['p50']:>11.2f} ms{drift_pct.max():>13.4f}%")
+
+
+def trained_symbols() -> list:
+    """Symbols with a versioned artifact or a legacy pickle"""
+    symbols = {
+        os.path.basename(p)[len('lstm_'):-len('.pkl')].upper()
+        for p in glob.glob(os.path.join(MODELS_DIR, 'lstm_*.pkl'))
+    }
+    lstm_root = os.path.join(artifact_store.root, LSTM_ARTIFACT_KIND)
+    if os.path.isdir(lstm_root):
+        symbols.update(os.listdir(lstm_root))
+    return sorted(symbols)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('symbols', nargs='*', help="Symbols to benchmark (default: every trained LSTM)")
+    parser.add_argument('--threads', type=int, default=None, help="torch intra-op threads")
+    parser.add_argument('--repeats', type=int, default=200)
+    parser.add_argument('--batch-size', type=int, default=64)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    symbols = [s.upper() for s in args.symbols] or trained_symbols()
+    if not symbols:
+        print("No trained LSTM models found")
+        return 1
+
+    for symbol in symbols:
+        benchmark_symbol(symbol, args.repeats, args.batch_size)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,7 +8,8 @@ import os
 import json
 from datetime import datetime, date
 from typing import List, Dict, Any, Optional
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+
+from ml.nlp.sentiment_scorer import sentiment_scorer
 
 
 class BondInsightsGenerator:
@@ -204,16 +205,17 @@ class BondSentimentAnalyzer:
     ]
 
     def __init__(self):
-        self.vader = SentimentIntensityAnalyzer()
+        # Shared process-wide VADER analyzer with memoized scores
+        self.scorer = sentiment_scorer
 
     def analyze(self) -> Dict[str, Any]:
         """Return bond market sentiment based on fixed-income news"""
         news_items = []
         scores = []
 
-        for headline, source, hours_ago, positive in self.BOND_NEWS_HEADLINES:
-            vs = self.vader.polarity_scores(headline)
-            score = round(vs["compound"], 2)
+        compounds = self.scorer.compound_batch([h[0] for h in self.BOND_NEWS_HEADLINES])
+        for (headline, source, hours_ago, positive), compound in zip(self.BOND_NEWS_HEADLINES, compounds):
+            score = round(compound, 2)
             scores.append(score)
             news_items.append({
                 "title": headline,
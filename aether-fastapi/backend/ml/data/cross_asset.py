@@ -0,0 +1,375 @@
+"""
+Cross-Asset Correlation Engine
+Aligns 24/7 crypto and exchange-calendar equity series on one session grid and computes their joint correlation/covariance
+"""
+
+import asyncio
+import time
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from ml.data.data_collector import data_collector
+
+logger = logging.getLogger(__name__)
+
+CRYPTO = 'crypto'
+EQUITY = 'equity'
+# Daily close, hours after midnight UTC (crypto points are exact timestamps already)
+MARKET_CLOSE_UTC = {'india': 10.0, 'us': 20.0}
+# A price older than this at a grid point is treated as missing (halted/delisted)
+MAX_STALE_DAYS = 5
+# On an exchange grid, crypto points further than this from a close don't price it
+CRYPTO_MATCH_HOURS = 24
+# Cached price series are reused for this long
+SERIES_TTL_MINUTES = 60
+
+
+def equity_market(ticker: str) -> str:
+    """Exchange calendar a ticker trades on ('india' for NSE/BSE tickers, otherwise 'us')"""
+    return 'india' if ticker.upper().endswith(('.NS', '.BO', '.BSE')) else 'us'
+
+
+def _close_times(series: pd.Series, market: Optional[str]) -> np.ndarray:
+    """Observation times in UTC nanoseconds (equity dates are stamped at their exchange's close)"""
+    index = pd.DatetimeIndex(series.index)
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    if market is not None:
+        index = index.normalize() + pd.Timedelta(hours=MARKET_CLOSE_UTC[market])
+    return index.to_numpy(dtype='datetime64[ns]')
+
+
+def session_grid(prices: Dict[str, pd.Series], markets: Dict[str, Optional[str]]) -> pd.DatetimeIndex:
+    """
+    Common observation times for a mix of assets
+
+    With only crypto, every calendar day. Otherwise the days on which every
+    exchange present traded (each exchange's calendar is the union of its
+    tickers' dates), stamped at the latest close among them. Equities are
+    priced as of that close and crypto at it (see align_prices).
+    """
+    exchanges = sorted({m for m in markets.values() if m is not None})
+    if not exchanges:
+        days = set()
+        for series in prices.values():
+            days.update(pd.DatetimeIndex(series.index).normalize())
+        return pd.DatetimeIndex(sorted(days))
+
+    calendars = []
+    for exchange in exchanges:
+        days = set()
+        for symbol, series in prices.items():
+            if markets[symbol] == exchange:
+                days.update(pd.DatetimeIndex(series.index).normalize())
+        calendars.append(days)
+    days = sorted(set.intersection(*calendars))
+    return pd.DatetimeIndex(days) + pd.Timedelta(hours=max(MARKET_CLOSE_UTC[e] for e in exchanges))
+
+
+def align_prices(
+    prices: Dict[str, pd.Series],
+    markets: Dict[str, Optional[str]],
+    max_stale_days: float = MAX_STALE_DAYS
+) -> Tuple[pd.DatetimeIndex, np.ndarray]:
+    """
+    Join of every series onto the session grid
+
+    Equities (and crypto on a crypto-only grid) take their last price at or
+    before each grid time. On an exchange grid crypto is instead
+    interpolated between its last point before and first point at or after
+    the close: CoinGecko's daily points are stamped 00:00 UTC, so the last
+    one before a 20:00 UTC close is 20 hours older than the equity price it
+    would be paired with, and the next one 4 hours newer.
+
+    Args:
+        prices: Symbol to close series (DatetimeIndex)
+        markets: Symbol to exchange ('india'/'us'), None for 24/7 crypto
+
+    Returns:
+        Grid times and an (n_symbols, n_grid) price matrix (NaN before a
+        symbol's history starts, when its last price is too old, or when a
+        close isn't bracketed by crypto points within CRYPTO_MATCH_HOURS)
+    """
+    grid = session_grid(prices, markets)
+    grid_times = grid.to_numpy(dtype='datetime64[ns]')
+    max_stale = np.timedelta64(int(max_stale_days * 86400), 's')
+    match_window = np.timedelta64(int(CRYPTO_MATCH_HOURS * 3600), 's')
+    exchange_grid = any(m is not None for m in markets.values())
+
+    aligned = np.full((len(prices), len(grid)), np.nan)
+    for row, (symbol, series) in enumerate(prices.items()):
+        times = _close_times(series, markets[symbol])
+        order = np.argsort(times, kind='stable')
+        times, values = times[order], series.to_numpy(dtype=np.float64)[order]
+        if exchange_grid and markets[symbol] is None:
+            after = np.minimum(np.searchsorted(times, grid_times, side='left'), len(times) - 1)
+            exact = times[after] == grid_times
+            before = np.where(exact, after, np.maximum(after - 1, 0))
+            span = (times[after] - times[before]).astype(np.float64)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                weight = np.where(span > 0, (grid_times - times[before]).astype(np.float64) / span, 0.0)
+            fresh = exact | (
+                (times[before] < grid_times) & (times[after] > grid_times)
+                & (grid_times - times[before] <= match_window) & (times[after] - grid_times <= match_window)
+            )
+            aligned[row] = np.where(fresh, values[before] + weight * (values[after] - values[before]), np.nan)
+        else:
+            positions = np.searchsorted(times, grid_times, side='right') - 1
+            safe = np.maximum(positions, 0)
+            fresh = (positions >= 0) & (grid_times - times[safe] <= max_stale)
+            aligned[row] = np.where(fresh, values[safe], np.nan)
+    return grid, aligned
+
+
+def grid_returns(aligned: np.ndarray, log: bool = False) -> np.ndarray:
+    """
+    Returns between consecutive grid points, (n_symbols, n_grid - 1)
+
+    Crypto moves over weekends and one-exchange holidays fall between two
+    grid points, so they are aggregated into the next session's return.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = aligned[:, 1:] / aligned[:, :-1]
+    return np.log(ratio) if log else ratio - 1
+
+
+def pairwise_covariance(returns: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Covariance and correlation over each pair's overlapping observations
+    (pandas DataFrame.cov/corr semantics), as a few matrix products
+
+    Args:
+        returns: (n_symbols, n_observations), NaN where missing
+
+    Returns:
+        Covariance, correlation and the (n_symbols, n_symbols) overlap counts
+    """
+    valid = (~np.isnan(returns)).astype(np.float64)
+    x = np.where(valid > 0, returns, 0.0)
+
+    counts = valid @ valid.T
+    # Sums of row i over the observations it shares with row j
+    sums = x @ valid.T
+    squares = (x * x) @ valid.T
+    products = x @ x.T
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        covariance = (products - sums * sums.T / counts) / (counts - 1)
+        variance_i = (squares - sums ** 2 / counts) / (counts - 1)
+        correlation = covariance / np.sqrt(variance_i * variance_i.T)
+    covariance[counts < 2] = np.nan
+    correlation[counts < 2] = np.nan
+    np.fill_diagonal(correlation, np.where(np.diag(counts) >= 2, 1.0, np.nan))
+    return covariance, np.clip(correlation, -1.0, 1.0), counts
+
+
+class CrossAssetMatrix:
+    """Aligned returns with their covariance and correlation, for any mix of crypto and equities"""
+
+    def __init__(self, prices: Dict[str, pd.Series], asset_classes: Dict[str, str], log_returns: bool = False):
+        self.symbols = list(prices)
+        self.asset_classes = [asset_classes[s] for s in self.symbols]
+        markets = {
+            s: None if asset_classes[s] == CRYPTO else equity_market(s)
+            for s in self.symbols
+        }
+        grid, aligned = align_prices(prices, markets)
+        returns = grid_returns(aligned, log=log_returns)
+
+        self.returns = pd.DataFrame(returns.T, index=grid[1:], columns=self.symbols)
+        self.covariance, self.correlation, self.observations = pairwise_covariance(returns)
+        span_years = (grid[-1] - grid[0]).days / 365.25 if len(grid) > 1 else 0
+        # ~365 for crypto-only grids, ~250 once an exchange calendar is involved
+        self.periods_per_year = (len(grid) - 1) / span_years if span_years > 0 else 365.0
+
+    def __len__(self) -> int:
+        return len(self.returns)
+
+    def correlation_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.correlation, index=self.symbols, columns=self.symbols)
+
+    def annualized_volatility(self) -> np.ndarray:
+        return np.sqrt(np.diag(self.covariance) * self.periods_per_year)
+
+
+def fetch_equity_closes(tickers: List[str], days: int = 90) -> Dict[str, pd.Series]:
+    """Daily closes for several tickers with one yfinance download (tickers without data are omitted)"""
+    if not tickers:
+        return {}
+    data = yf.download(
+        tickers,
+        start=datetime.now() - timedelta(days=days),
+        group_by='ticker',
+        auto_adjust=True,
+        threads=True,
+        progress=False
+    )
+    closes = {}
+    for ticker in tickers:
+        if isinstance(data.columns, pd.MultiIndex):
+            if (ticker, 'Close') not in data.columns:
+                continue
+            close = data[(ticker, 'Close')]
+        elif 'Close' in data.columns and len(tickers) == 1:
+            close = data['Close']
+        else:
+            continue
+        close = close.dropna()
+        if not close.empty:
+            closes[ticker] = close
+    return closes
+
+
+class CrossAssetEngine:
+    """
+    Joint correlation/covariance across crypto and equities
+
+    Crypto closes come from the data collector, equities from one batched
+    yfinance download; each series is cached per symbol, so matrices for
+    different portfolios share the fetched history.
+    """
+
+    def __init__(self, ttl_minutes: float = SERIES_TTL_MINUTES):
+        self.ttl_minutes = ttl_minutes
+        self._series: Dict[Tuple[str, str, int], Tuple[float, pd.Series]] = {}
+
+    def _cached(self, asset_class: str, symbol: str, days: int) -> Optional[pd.Series]:
+        entry = self._series.get((asset_class, symbol, days))
+        if entry is not None and time.time() - entry[0] < self.ttl_minutes * 60:
+            return entry[1]
+        return None
+
+    async def _crypto_closes(self, symbols: List[str], days: int) -> Dict[str, pd.Series]:
+        async def fetch(symbol: str) -> Optional[pd.Series]:
+            df = await data_collector.fetch_historical_data(symbol, days=days)
+            if df is None or df.empty or df.attrs.get('synthetic'):
+                logger.warning(f"No market data for {symbol}, leaving it out of the correlation")
+                return None
+            return pd.Series(df['price'].to_numpy(dtype=np.float64), index=pd.to_datetime(df['date']))
+
+        results = await asyncio.gather(*(fetch(s) for s in symbols), return_exceptions=True)
+        closes = {}
+        for symbol, result in zip(symbols, results):
+            if isinstance(result, Exception):
+                logger.error(f"Crypto history failed for {symbol}: {result}")
+            elif result is not None:
+                closes[symbol] = result
+        return closes
+
+    async def _closes(self, crypto: List[str], equities: List[str], days: int) -> Tuple[Dict[str, pd.Series], Dict[str, str]]:
+        prices: Dict[str, pd.Series] = {}
+        asset_classes: Dict[str, str] = {}
+        missing = {CRYPTO: [], EQUITY: []}
+        for asset_class, symbols in ((CRYPTO, crypto), (EQUITY, equities)):
+            for symbol in symbols:
+                series = self._cached(asset_class, symbol, days)
+                if series is None:
+                    missing[asset_class].append(symbol)
+                else:
+                    prices[symbol], asset_classes[symbol] = series, asset_class
+
+        fetched_crypto, fetched_equities = await asyncio.gather(
+            self._crypto_closes(missing[CRYPTO], days),
+            asyncio.to_thread(fetch_equity_closes, missing[EQUITY], days)
+        )
+        now = time.time()
+        for asset_class, fetched in ((CRYPTO, fetched_crypto), (EQUITY, fetched_equities)):
+            for symbol, series in fetched.items():
+                self._series[(asset_class, symbol, days)] = (now, series)
+                prices[symbol], asset_classes[symbol] = series, asset_class
+
+        # Keep the requested order
+        order = [s for s in list(crypto) + list(equities) if s in prices]
+        return {s: prices[s] for s in order}, asset_classes
+
+    async def build(self, crypto: List[str], equities: List[str], days: int = 90) -> CrossAssetMatrix:
+        """
+        Aligned return/covariance matrix for crypto symbols and equity tickers
+
+        Raises:
+            ValueError: fewer than two assets have data
+        """
+        crypto = list(dict.fromkeys(s.upper() for s in crypto))
+        equities = list(dict.fromkeys(t.upper() for t in equities))
+        prices, asset_classes = await self._closes(crypto, equities, days)
+        if len(prices) < 2:
+            raise ValueError("Need at least 2 assets with market data")
+        return await asyncio.to_thread(CrossAssetMatrix, prices, asset_classes)
+
+    async def diversification(self, crypto: Dict[str, float], equities: Dict[str, float], days: int = 90) -> Dict:
+        """
+        Cross-asset diversification of a portfolio
+
+        Args:
+            crypto: Crypto symbol to position value
+            equities: Equity ticker to position value
+            days: History window
+
+        Returns:
+            Correlation matrix, average correlation within and between asset
+            classes, portfolio vs. stand-alone volatility and each asset's
+            share of portfolio risk
+        """
+        matrix = await self.build(list(crypto), list(equities), days)
+        values = {**{s.upper(): v for s, v in crypto.items()}, **{t.upper(): v for t, v in equities.items()}}
+        weights = np.array([values[s] for s in matrix.symbols], dtype=np.float64)
+        if weights.sum() <= 0:
+            raise ValueError("Portfolio has no value")
+        weights = weights / weights.sum()
+
+        covariance = np.nan_to_num(matrix.covariance) * matrix.periods_per_year
+        correlation = matrix.correlation
+        volatility = matrix.annualized_volatility()
+        portfolio_variance = float(weights @ covariance @ weights)
+        portfolio_volatility = float(np.sqrt(max(portfolio_variance, 0.0)))
+        standalone_volatility = float(np.nansum(weights * volatility))
+        risk_share = weights * (covariance @ weights) / portfolio_variance if portfolio_variance > 0 else weights * 0
+
+        classes = np.array(matrix.asset_classes)
+        upper = np.triu(np.ones_like(correlation, dtype=bool), k=1) & ~np.isnan(correlation)
+
+        def average_correlation(mask: np.ndarray) -> Optional[float]:
+            values = correlation[upper & mask]
+            return round(float(values.mean()), 4) if values.size else None
+
+        is_crypto = classes == CRYPTO
+        avg_abs_correlation = float(np.abs(correlation[upper]).mean()) if upper.any() else 0.0
+        diversification_score = round(max(0, min(100, (1 - avg_abs_correlation) * 100)))
+
+        return {
+            'symbols': matrix.symbols,
+            'asset_classes': matrix.asset_classes,
+            'matrix': np.round(np.nan_to_num(correlation), 4).tolist(),
+            'average_correlation': {
+                'crypto_crypto': average_correlation(np.outer(is_crypto, is_crypto)),
+                'equity_equity': average_correlation(np.outer(~is_crypto, ~is_crypto)),
+                'crypto_equity': average_correlation(np.outer(is_crypto, ~is_crypto) | np.outer(~is_crypto, is_crypto)),
+            },
+            'diversification_score': diversification_score,
+            'portfolio_volatility': round(portfolio_volatility * 100, 2),
+            'standalone_volatility': round(standalone_volatility * 100, 2),
+            # Stand-alone volatility / portfolio volatility (1 = no diversification benefit)
+            'diversification_ratio': round(standalone_volatility / portfolio_volatility, 3) if portfolio_volatility > 0 else None,
+            'holdings': [
+                {
+                    'symbol': symbol,
+                    'asset_class': asset_class,
+                    'weight': round(float(w), 4),
+                    'volatility': round(float(v) * 100, 2) if np.isfinite(v) else None,
+                    'risk_contribution': round(float(r), 4)
+                }
+                for symbol, asset_class, w, v, r in zip(matrix.symbols, matrix.asset_classes, weights, volatility, risk_share)
+            ],
+            'observations': len(matrix),
+            'periods_per_year': round(matrix.periods_per_year, 1),
+            'period': f'{days} days',
+            'generated_at': datetime.now().isoformat()
+        }
+
+
+# Singleton instance
+cross_asset_engine = CrossAssetEngine()
@@ -12,6 +12,8 @@ import json
 import aiohttp
 import ssl
 
+from ml.data.indicator_state import indicator_states
+
 
 class CryptoDataCollector:
     """
@@ -28,6 +30,20 @@ class CryptoDataCollector:
     }
     DEFAULT_CACHE_TTL = 5  # Default: 5 minutes for any other window
     
+    # Supported symbols and their CoinGecko IDs
+    SYMBOL_MAP = {
+        'BTC': 'bitcoin',
+        'ETH': 'ethereum',
+        'SOL': 'solana',
+        'ADA': 'cardano',
+        'DOT': 'polkadot',
+        'MATIC': 'polygon',
+        'AVAX': 'avalanche-2',
+        'LINK': 'chainlink',
+        'UNI': 'uniswap',
+        'ATOM': 'cosmos'
+    }
+    
     def __init__(self):
         self.cache_dir = os.path.join(os.path.dirname(__file__), '../cache')
         os.makedirs(self.cache_dir, exist_ok=True)
@@ -97,6 +113,7 @@ class CryptoDataCollector:
             mem_result = self._check_memory_cache(cache_key, ttl)
             if mem_result is not None:
                 print(f"Loading {symbol} {days}d data from memory cache")
+                self._advance_indicators(symbol, mem_result)
                 return mem_result
             
             # 2. Check disk cache
@@ -107,26 +124,13 @@ class CryptoDataCollector:
                 df = pd.DataFrame(data)
                 # Promote to memory cache
                 self._memory_cache[cache_key] = (datetime.now(), df)
+                self._advance_indicators(symbol, df)
                 return df
         
         # 3. Fetch from CoinGecko API
         print(f"Fetching {symbol} data from CoinGecko (last {days} days)")
         
-        # Map symbols to CoinGecko IDs
-        symbol_map = {
-            'BTC': 'bitcoin',
-            'ETH': 'ethereum',
-            'SOL': 'solana',
-            'ADA': 'cardano',
-            'DOT': 'polkadot',
-            'MATIC': 'polygon',
-            'AVAX': 'avalanche-2',
-            'LINK': 'chainlink',
-            'UNI': 'uniswap',
-            'ATOM': 'cosmos'
-        }
-        
-        coin_id = symbol_map.get(symbol.upper(), symbol.lower())
+        coin_id = self.SYMBOL_MAP.get(symbol.upper(), symbol.lower())
         
         url = f"{self.coingecko_base_url}/coins/{coin_id}/market_chart"
         params = {
@@ -155,6 +159,7 @@ class CryptoDataCollector:
                                 data = json.load(f)
                             df = pd.DataFrame(data)
                             self._memory_cache[cache_key] = (datetime.now(), df)
+                            self._advance_indicators(symbol, df)
                             return df
                         return self._get_fallback_data(symbol, days)
                     
@@ -187,6 +192,7 @@ class CryptoDataCollector:
             df.to_json(cache_path, orient='records', date_format='iso')
             self._memory_cache[cache_key] = (datetime.now(), df)
             
+            self._advance_indicators(symbol, df)
             return df
         
         except Exception as e:
@@ -196,9 +202,18 @@ class CryptoDataCollector:
                 print(f"Using stale disk cache for {symbol} after error")
                 with open(cache_path, 'r') as f:
                     data = json.load(f)
-                return pd.DataFrame(data)
+                df = pd.DataFrame(data)
+                self._advance_indicators(symbol, df)
+                return df
             return self._get_fallback_data(symbol, days)
     
+    def _advance_indicators(self, symbol: str, df: pd.DataFrame):
+        """Advance the symbol's streaming indicators to df's newest closed bar (a no-op if already there)"""
+        try:
+            indicator_states.advance(symbol, df)
+        except Exception as e:
+            print(f"Indicator state update failed for {symbol}: {e}")
+    
     def _get_fallback_data(self, symbol: str, days: int) -> pd.DataFrame:
         """Generate synthetic fallback data when no real data is available"""
         print(f"Using fallback synthetic data for {symbol}")
@@ -230,6 +245,7 @@ class CryptoDataCollector:
             'volume': volumes,
             'market_cap': prices * volumes * 1000
         })
+        df.attrs['synthetic'] = True
         
         return df
     
@@ -1,14 +1,23 @@
 """
 Feature Engineering for Crypto Price Prediction
-Calculates technical indicators using the 'ta' library
+Calculates technical indicators with the vectorized kernels in ml.data.indicators
 """
 
 import pandas as pd
 import numpy as np
-from ta.momentum import RSIIndicator
-from ta.trend import MACD, EMAIndicator
-from ta.volatility import BollingerBands
-from typing import Dict
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import Dict, List, Optional
+
+from ml.data import indicators
+
+# Feature layout produced by add_technical_indicators (price first)
+FEATURE_COLUMNS = [
+    'price', 'volume', 'rsi', 'macd', 'macd_signal', 'macd_diff',
+    'bb_high', 'bb_low', 'bb_mid', 'bb_width',
+    'ema_7', 'ema_21', 'ema_50',
+    'volume_sma_7', 'volume_ratio',
+    'price_change_1d', 'price_change_7d'
+]
 
 
 class CryptoFeatureEngineer:
@@ -24,7 +33,7 @@ class CryptoFeatureEngineer:
     """
     
     def __init__(self):
-        self.feature_columns = []
+        self.feature_columns = list(FEATURE_COLUMNS)
     
     def add_technical_indicators(self, df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -42,70 +51,74 @@ class CryptoFeatureEngineer:
         df['price'] = pd.to_numeric(df['price'], errors='coerce')
         df['volume'] = pd.to_numeric(df['volume'], errors='coerce')
         
-        # RSI (14-period)
-        rsi = RSIIndicator(close=df['price'], window=14)
-        df['rsi'] = rsi.rsi()
-        
-        # MACD
-        macd = MACD(close=df['price'], window_slow=26, window_fast=12, window_sign=9)
-        df['macd'] = macd.macd()
-        df['macd_signal'] = macd.macd_signal()
-        df['macd_diff'] = macd.macd_diff()
-        
-        # Bollinger Bands (20-period, 2 std)
-        bb = BollingerBands(close=df['price'], window=20, window_dev=2)
-        df['bb_high'] = bb.bollinger_hband()
-        df['bb_low'] = bb.bollinger_lband()
-        df['bb_mid'] = bb.bollinger_mavg()
-        df['bb_width'] = (df['bb_high'] - df['bb_low']) / df['bb_mid']
-        
-        # EMA (7, 21, 50-day)
-        ema_7 = EMAIndicator(close=df['price'], window=7)
-        ema_21 = EMAIndicator(close=df['price'], window=21)
-        ema_50 = EMAIndicator(close=df['price'], window=50)
-        
-        df['ema_7'] = ema_7.ema_indicator()
-        df['ema_21'] = ema_21.ema_indicator()
-        df['ema_50'] = ema_50.ema_indicator()
-        
-        # Volume indicators
-        df['volume_sma_7'] = df['volume'].rolling(window=7).mean()
-        df['volume_ratio'] = df['volume'] / df['volume_sma_7']
-        
-        # Price momentum
-        df['price_change_1d'] = df['price'].pct_change(1)
-        df['price_change_7d'] = df['price'].pct_change(7)
+        for name, values in self.indicator_arrays(df['price'].values, df['volume'].values).items():
+            df[name] = values
         
         # Store feature column names
-        self.feature_columns = [
-            'price', 'volume', 'rsi', 'macd', 'macd_signal', 'macd_diff',
-            'bb_high', 'bb_low', 'bb_mid', 'bb_width',
-            'ema_7', 'ema_21', 'ema_50',
-            'volume_sma_7', 'volume_ratio',
-            'price_change_1d', 'price_change_7d'
-        ]
+        self.feature_columns = list(FEATURE_COLUMNS)
         
         # Fill NaN values (from indicators that need warmup)
         df = df.bfill().ffill()
         
         return df
     
+    def indicator_arrays(self, price: np.ndarray, volume: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Compute every technical indicator column (NaN during warm-up)
+        
+        Args:
+            price: Prices, shape (n_days,) or (n_symbols, n_days)
+            volume: Volumes, same shape as price
+        
+        Returns:
+            Dict mapping indicator column name to an array shaped like price
+        """
+        macd_line, macd_signal, macd_diff = indicators.macd(price, fast=12, slow=26, signal=9)
+        bb_high, bb_mid, bb_low = indicators.bollinger(price, window=20, n_std=2)
+        volume_sma_7 = indicators.sma(volume, 7)
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return {
+                'rsi': indicators.rsi(price, window=14),
+                'macd': macd_line,
+                'macd_signal': macd_signal,
+                'macd_diff': macd_diff,
+                'bb_high': bb_high,
+                'bb_low': bb_low,
+                'bb_mid': bb_mid,
+                'bb_width': (bb_high - bb_low) / bb_mid,
+                'ema_7': indicators.ema(price, 7),
+                'ema_21': indicators.ema(price, 21),
+                'ema_50': indicators.ema(price, 50),
+                'volume_sma_7': volume_sma_7,
+                'volume_ratio': np.asarray(volume, dtype=np.float64) / volume_sma_7,
+                'price_change_1d': indicators.pct_change(price, 1),
+                'price_change_7d': indicators.pct_change(price, 7),
+            }
+    
     def prepare_lstm_sequences(
         self, 
         df: pd.DataFrame, 
         sequence_length: int = 60,
-        target_column: str = 'price'
+        target_column: str = 'price',
+        horizons: Optional[List[int]] = None
     ) -> Dict:
         """
         Prepare sequences for LSTM training
         
+        X is a read-only sliding-window view over the scaled float32 feature
+        matrix: window i shares memory with window i + 1, so building it costs
+        no copies. Consumers gather the windows they need (e.g. per batch).
+        
         Args:
             df: DataFrame with features
             sequence_length: Number of timesteps to look back
             target_column: Column to predict
+            horizons: If given, y has one column per horizon (price h days
+                after the window) for training a direct multi-horizon model
         
         Returns:
-            Dictionary with X, y, scaler info
+            Dictionary with X, y, last_sequence, scaler info
         """
         from sklearn.preprocessing import MinMaxScaler
         
@@ -118,33 +131,60 @@ class CryptoFeatureEngineer:
         
         # Normalize features to [0, 1] range
         scaler = MinMaxScaler(feature_range=(0, 1))
-        scaled_data = scaler.fit_transform(feature_data)
+        scaled_data = scaler.fit_transform(feature_data).astype(np.float32)
         
-        # Create sequences
-        X, y = [], []
+        # Input: past 60 days of features; the final window has no next day to predict
+        windows = sliding_window_view(scaled_data, (sequence_length, scaled_data.shape[1]))[:, 0]
+        X = windows[:-1]
         
-        for i in range(sequence_length, len(scaled_data)):
-            # Input: past 60 days of features
-            X.append(scaled_data[i - sequence_length:i])
-            
-            # Target: next day's price (first column is price)
-            y.append(scaled_data[i, 0])  # price is column 0
+        # Target: next day's price (first column is price)
+        y = scaled_data[sequence_length:, 0]
         
-        X = np.array(X)
-        y = np.array(y)
+        if horizons:
+            # y[i] is the price 1 day after window i, so horizon h is y[i + h - 1]
+            max_horizon = max(horizons)
+            n_samples = len(y) - max_horizon + 1
+            X = X[:n_samples]
+            y = np.stack([y[h - 1:h - 1 + n_samples] for h in horizons], axis=1)
         
         return {
             'X': X,
             'y': y,
+            'last_sequence': windows[-1],  # newest window, for inference
             'scaler': scaler,
             'feature_columns': self.feature_columns,
             'sequence_length': sequence_length
         }
     
+    def prepare_inference_window(
+        self,
+        df: pd.DataFrame,
+        scaler,
+        feature_columns: List[str],
+        sequence_length: int = 60
+    ) -> np.ndarray:
+        """
+        Scale only the newest window with a trained model's scaler
+        
+        Args:
+            df: DataFrame with technical indicators
+            scaler: Scaler fitted when the model was trained
+            feature_columns: The model's feature layout
+            sequence_length: The model's lookback
+        
+        Returns:
+            float32 array of shape (sequence_length, len(feature_columns))
+        """
+        if len(df) < sequence_length:
+            raise ValueError(f"Need {sequence_length} rows of features, got {len(df)}")
+        
+        window = df[list(feature_columns)].values[-sequence_length:]
+        return scaler.transform(window).astype(np.float32)
+    
     def calculate_volatility(self, df: pd.DataFrame, window: int = 30) -> float:
         """Calculate annualized volatility"""
-        returns = df['price'].pct_change().dropna()
-        volatility = returns.rolling(window=window).std().iloc[-1]
+        returns = indicators.pct_change(df['price'].values)[1:]
+        volatility = indicators.rolling_std(returns, window)[-1]
         # Annualize (assuming daily data)
         annualized_volatility = volatility * np.sqrt(365)
         return annualized_volatility
@@ -167,11 +207,7 @@ class CryptoFeatureEngineer:
     
     def calculate_max_drawdown(self, df: pd.DataFrame) -> float:
         """Calculate maximum drawdown percentage"""
-        cumulative = (1 + df['price'].pct_change()).cumprod()
-        running_max = cumulative.cummax()
-        drawdown = (cumulative - running_max) / running_max
-        max_drawdown = drawdown.min()
-        return abs(max_drawdown) * 100  # Return as percentage
+        return float(indicators.max_drawdown(df['price'].values)) * 100  # Return as percentage
 
 
 # Singleton instance
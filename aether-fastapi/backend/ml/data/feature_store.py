@@ -0,0 +1,309 @@
+"""
+Daily Feature Store
+Materializes each symbol's technical and risk features once per day and shares them across the ML modules
+"""
+
+import os
+import json
+import glob
+import asyncio
+import time
+import numpy as np
+import pandas as pd
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from ml.data.data_collector import data_collector
+from ml.data.feature_engineering import FEATURE_COLUMNS, feature_engineer
+from ml.data.risk_features import RiskFeatureEngineer
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the materialized columns or risk features change meaning
+FEATURE_SET_VERSION = 2
+HISTORY_DAYS = 365
+# Window fetched for the live (still-changing) bar; the collector caches it for minutes, not a day
+LIVE_DAYS = 7
+STORE_DIR = os.path.join(os.path.dirname(__file__), '../cache/feature_store')
+
+
+def utc_today() -> str:
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+class DailyFeatures:
+    """
+    One symbol's features for one day, stored column by column
+
+    Only closed daily bars are materialized; the live bar comes from
+    FeatureStore.live_history. `columns` holds the raw history (price,
+    volume, market_cap) and every
+    technical indicator column (NaN during warm-up), aligned with `dates`.
+    `risk` holds the XGBoost risk-classifier features.
+    """
+
+    def __init__(
+        self,
+        symbol: str,
+        as_of: str,
+        dates: np.ndarray,
+        columns: Dict[str, np.ndarray],
+        risk: Dict[str, float],
+        built_at: float,
+        version: int = FEATURE_SET_VERSION,
+        synthetic: bool = False
+    ):
+        self.symbol = symbol
+        self.as_of = as_of
+        self.dates = dates
+        self.columns = columns
+        self.risk = risk
+        self.built_at = built_at
+        self.version = version
+        # Built from the collector's synthetic fallback (served, never stored)
+        self.synthetic = synthetic
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    @property
+    def last_close(self) -> float:
+        return float(self.columns['price'][-1])
+
+    def history(self, days: Optional[int] = None) -> pd.DataFrame:
+        """
+        Raw date/price/volume frame of the closed bars, in the data
+        collector's format; `days` keeps the newest `days` bars
+        """
+        start = 0 if days is None else max(len(self) - days, 0)
+        frame = pd.DataFrame({'date': pd.to_datetime(self.dates[start:])})
+        for name in ('price', 'volume', 'market_cap'):
+            if name in self.columns:
+                frame[name] = self.columns[name][start:]
+        return frame
+
+    def frame(self) -> pd.DataFrame:
+        """History with technical indicators, gap-filled like add_technical_indicators"""
+        frame = self.history()
+        for name in FEATURE_COLUMNS:
+            if name not in frame.columns:
+                frame[name] = self.columns[name]
+        return frame.bfill().ffill()
+
+    def staleness(self) -> Dict:
+        """How far behind today's materialization this entry is"""
+        latest = pd.Timestamp(self.dates[-1])
+        return {
+            'as_of': self.as_of,
+            'days_behind': (pd.Timestamp(utc_today()) - pd.Timestamp(self.as_of)).days,
+            'age_minutes': round((time.time() - self.built_at) / 60, 1),
+            'latest_observation': latest.isoformat(),
+            'data_lag_days': (pd.Timestamp(self.as_of) - latest.normalize()).days,
+        }
+
+    def save(self, path: str):
+        arrays = {f"col_{name}": values for name, values in self.columns.items()}
+        arrays['dates'] = self.dates.astype('datetime64[ns]').astype(np.int64)
+        arrays['meta'] = np.array(json.dumps({
+            'symbol': self.symbol,
+            'as_of': self.as_of,
+            'version': self.version,
+            'built_at': self.built_at,
+            'risk': self.risk,
+        }))
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'DailyFeatures':
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            columns = {key[4:]: data[key] for key in data.files if key.startswith('col_')}
+            dates = data['dates'].astype('datetime64[ns]')
+        return cls(meta['symbol'], meta['as_of'], dates, columns, meta['risk'], meta['built_at'], meta['version'])
+
+
+class FeatureStore:
+    """
+    Per-symbol daily features keyed by (symbol, as-of date, feature-set
+    version), cached in memory and as compressed per-column .npz files
+
+    The first request of a UTC day fetches the symbol's history once and
+    computes everything over its closed bars; the rest of the day is served
+    from the store. The live bar is not frozen with them: live_history()
+    appends it from the data collector on the collector's own short TTL.
+    Synthetic fallback data is served but never stored, so an outage
+    doesn't pin fake features for the whole day.
+    """
+
+    def __init__(self, store_dir: str = STORE_DIR, history_days: int = HISTORY_DAYS):
+        self.store_dir = store_dir
+        self.history_days = history_days
+        self._entries: Dict[str, DailyFeatures] = {}
+        self._building: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._risk_engineer = RiskFeatureEngineer()
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._build_seconds = 0.0
+
+    def _entry_path(self, symbol: str, as_of: str) -> str:
+        return os.path.join(self.store_dir, f"{symbol}_{as_of}_v{FEATURE_SET_VERSION}.npz")
+
+    def _load_entry(self, symbol: str, as_of: str) -> Optional[DailyFeatures]:
+        path = self._entry_path(symbol, as_of)
+        if not os.path.exists(path):
+            return None
+        try:
+            return DailyFeatures.load(path)
+        except Exception as e:
+            logger.warning(f"Discarding unreadable feature store entry {path}: {e}")
+            return None
+
+    def _store_entry(self, entry: DailyFeatures):
+        os.makedirs(self.store_dir, exist_ok=True)
+        entry.save(self._entry_path(entry.symbol, entry.as_of))
+        # Older days and feature-set versions are never served again
+        for path in glob.glob(os.path.join(self.store_dir, f"{entry.symbol}_*.npz")):
+            if path != self._entry_path(entry.symbol, entry.as_of):
+                os.remove(path)
+
+    def _materialize(
+        self,
+        symbol: str,
+        as_of: str,
+        history: pd.DataFrame,
+        btc_history: Optional[pd.DataFrame]
+    ) -> DailyFeatures:
+        """Compute every column and the risk features from one history frame"""
+        dates = pd.to_datetime(history['date']).to_numpy(dtype='datetime64[ns]')
+        columns = {
+            name: pd.to_numeric(history[name], errors='coerce').to_numpy(dtype=np.float64)
+            for name in ('price', 'volume', 'market_cap') if name in history.columns
+        }
+        columns.update(feature_engineer.indicator_arrays(columns['price'], columns['volume']))
+
+        risk_input = pd.DataFrame({'price': columns['price'], 'volume': columns['volume']})
+        risk = self._risk_engineer.engineer_features(risk_input, btc_history)
+        risk = {name: float(value) for name, value in risk.items()}
+        return DailyFeatures(symbol, as_of, dates, columns, risk, time.time(), synthetic=bool(history.attrs.get('synthetic')))
+
+    async def _build(self, symbol: str, as_of: str) -> DailyFeatures:
+        started = time.perf_counter()
+        history = await data_collector.fetch_historical_data(symbol, days=self.history_days)
+        # The newest CoinGecko point is the live price, not a daily close
+        if len(history) > 1:
+            synthetic = history.attrs.get('synthetic', False)
+            history = history.iloc[:-1].reset_index(drop=True)
+            history.attrs['synthetic'] = synthetic
+
+        btc_history = None
+        if symbol != 'BTC':
+            try:
+                btc_history = (await self.get('BTC', as_of)).history()
+            except Exception as e:
+                logger.warning(f"BTC features unavailable for {symbol} correlation: {e}")
+
+        entry = await asyncio.to_thread(self._materialize, symbol, as_of, history, btc_history)
+        if not entry.synthetic:
+            await asyncio.to_thread(self._store_entry, entry)
+            self._entries[symbol] = entry
+        self._build_seconds += time.perf_counter() - started
+        return entry
+
+    async def get(self, symbol: str, as_of: Optional[str] = None) -> DailyFeatures:
+        """
+        Features for a symbol as of a UTC date (default today)
+
+        Concurrent requests for the same missing entry share one build.
+        """
+        symbol = symbol.upper()
+        as_of = as_of or utc_today()
+
+        entry = self._entries.get(symbol)
+        if entry is not None and entry.as_of == as_of and entry.version == FEATURE_SET_VERSION:
+            self._hits += 1
+            return entry
+
+        entry = await asyncio.to_thread(self._load_entry, symbol, as_of)
+        if entry is not None and entry.version == FEATURE_SET_VERSION:
+            self._hits += 1
+            self._disk_hits += 1
+            self._entries[symbol] = entry
+            return entry
+
+        key = (symbol, as_of)
+        pending = self._building.get(key)
+        if pending is not None:
+            self._hits += 1
+            return await asyncio.shield(pending)
+
+        self._misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._building[key] = future
+        try:
+            entry = await self._build(symbol, as_of)
+            future.set_result(entry)
+            return entry
+        except Exception as e:
+            future.set_exception(e)
+            # Don't warn about an unretrieved exception when nobody else waited
+            future.exception()
+            raise
+        finally:
+            del self._building[key]
+
+    async def get_many(self, symbols: List[str], as_of: Optional[str] = None) -> Dict[str, DailyFeatures]:
+        """Features for several symbols; symbols that fail are left out"""
+        results = await asyncio.gather(*(self.get(s, as_of) for s in symbols), return_exceptions=True)
+        entries = {}
+        for symbol, result in zip(symbols, results):
+            if isinstance(result, Exception):
+                logger.error(f"Feature store error for {symbol}: {result}")
+            else:
+                entries[symbol.upper()] = result
+        return entries
+
+    async def live_history(self, symbol: str, days: Optional[int] = None) -> pd.DataFrame:
+        """
+        Today's closed bars plus the current live bar (days + 1 rows when
+        `days` is given); only the closed bars if the live bar is unavailable
+        """
+        frame = (await self.get(symbol)).history(days)
+        try:
+            live = await data_collector.fetch_historical_data(symbol.upper(), days=LIVE_DAYS)
+        except Exception as e:
+            logger.warning(f"Live bar unavailable for {symbol}: {e}")
+            return frame
+        if live.attrs.get('synthetic') or live.empty:
+            return frame
+
+        bar = live.iloc[[-1]].copy()
+        bar['date'] = pd.to_datetime(bar['date'])
+        if frame.empty or bar['date'].iloc[0] > frame['date'].iloc[-1]:
+            frame = pd.concat([frame, bar[[c for c in frame.columns if c in bar.columns]]], ignore_index=True)
+        return frame
+
+    async def latest_price(self, symbol: str) -> float:
+        """Current price: the live bar, else the last close"""
+        return float((await self.live_history(symbol, 1))['price'].iloc[-1])
+
+    def stats(self) -> Dict:
+        """Hit rate, build cost and per-symbol staleness"""
+        requests = self._hits + self._misses
+        return {
+            'feature_set_version': FEATURE_SET_VERSION,
+            'requests': requests,
+            'hits': self._hits,
+            'disk_hits': self._disk_hits,
+            'misses': self._misses,
+            'hit_rate': round(self._hits / requests, 4) if requests else None,
+            'avg_build_seconds': round(self._build_seconds / self._misses, 3) if self._misses else None,
+            'symbols': {symbol: entry.staleness() for symbol, entry in sorted(self._entries.items())},
+        }
+
+
+# Singleton instance
+feature_store = FeatureStore()
@@ -0,0 +1,222 @@
+"""
+Shared Headline Store
+SQLite store of ingested news headlines and their sentiment, shared by every worker process
+"""
+
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+STORE_PATH = os.path.join(os.path.dirname(__file__), '../cache/news/headlines.db')
+# Requests per provider per UTC day (free-tier quotas, with some headroom)
+PROVIDER_BUDGETS = {
+    'newsdata': 180,
+    'gnews': 90,
+    'worldnews': 45,
+}
+# Share of each budget kept for on-demand (sentiment request) fetches; scheduled ingestion stops short of it
+INTERACTIVE_RESERVE = 0.3
+# Headlines older than this are pruned on ingest
+RETENTION_DAYS = 120
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS headlines (
+    symbol TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    title TEXT NOT NULL,
+    source TEXT,
+    url TEXT,
+    description TEXT,
+    published_at REAL NOT NULL,
+    fetched_at REAL NOT NULL,
+    sentiment REAL,
+    PRIMARY KEY (symbol, content_hash)
+);
+CREATE INDEX IF NOT EXISTS idx_headlines_symbol_published ON headlines (symbol, published_at);
+CREATE TABLE IF NOT EXISTS symbol_state (
+    symbol TEXT PRIMARY KEY,
+    ingested_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS provider_budget (
+    provider TEXT PRIMARY KEY,
+    day TEXT NOT NULL,
+    used INTEGER NOT NULL
+);
+"""
+
+
+def content_hash(headline: Dict) -> str:
+    """Dedup key: the article URL, or its normalized title when there is none"""
+    key = (headline.get('url') or '').strip() or ' '.join((headline.get('title') or '').lower().split())
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+class HeadlineStore:
+    """
+    Headlines per symbol, deduplicated by URL/title hash
+
+    WAL mode lets every uvicorn worker and the ingester read and write the
+    same file concurrently; each thread keeps its own connection. Provider
+    request budgets live here too, so all processes draw on one quota.
+    """
+
+    def __init__(self, path: str = STORE_PATH, budgets: Optional[Dict[str, int]] = None):
+        self.path = path
+        self.budgets = budgets or PROVIDER_BUDGETS
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _write(self):
+        """One write transaction; IMMEDIATE takes the lock up front so concurrent writers queue instead of failing"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    # ------------------------------------------------------------------
+    # Headlines
+    # ------------------------------------------------------------------
+
+    def add(self, symbol: str, headlines: List[Dict], fetched_at: Optional[float] = None) -> int:
+        """
+        Insert new headlines for a symbol and mark it as freshly ingested
+
+        Headlines carry `hours_ago` (as parsed from the providers) and an
+        optional `sentiment` score. Returns the number of new rows.
+        """
+        fetched_at = fetched_at or time.time()
+        rows = [
+            (
+                symbol,
+                content_hash(h),
+                h['title'],
+                h.get('source'),
+                h.get('url'),
+                h.get('description'),
+                fetched_at - max(h.get('hours_ago') or 0, 0) * 3600,
+                fetched_at,
+                h.get('sentiment'),
+            )
+            for h in headlines if h.get('title')
+        ]
+        with self._write() as conn:
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO headlines VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            added = conn.total_changes - before
+            conn.execute(
+                "INSERT INTO symbol_state VALUES (?, ?) ON CONFLICT(symbol) DO UPDATE SET ingested_at = excluded.ingested_at",
+                (symbol, fetched_at)
+            )
+        return added
+
+    def recent(self, symbol: str, limit: int, max_age_hours: float = 72) -> List[Dict]:
+        """Newest headlines for a symbol, in the providers' dict format"""
+        now = time.time()
+        rows = self._connect().execute(
+            "SELECT title, source, url, description, published_at, sentiment FROM headlines "
+            "WHERE symbol = ? AND published_at >= ? ORDER BY published_at DESC LIMIT ?",
+            (symbol, now - max_age_hours * 3600, limit)
+        ).fetchall()
+        return [
+            {
+                'title': title,
+                'source': source,
+                'hours_ago': max(0, int((now - published_at) / 3600)),
+                'url': url or '',
+                'description': description or '',
+                'sentiment': sentiment,
+            }
+            for title, source, url, description, published_at, sentiment in rows
+        ]
+
+    def is_fresh(self, symbol: str, max_age_seconds: float) -> bool:
+        """Whether the symbol was ingested within the last max_age_seconds"""
+        row = self._connect().execute("SELECT ingested_at FROM symbol_state WHERE symbol = ?", (symbol,)).fetchone()
+        return row is not None and time.time() - row[0] < max_age_seconds
+
+    def daily_sentiment(self, symbol: str, days: int) -> List[Dict]:
+        """Mean stored headline sentiment per UTC day, oldest first (days without headlines omitted)"""
+        since = time.time() - days * 86400
+        rows = self._connect().execute(
+            "SELECT date(published_at, 'unixepoch') AS day, AVG(sentiment), COUNT(*) FROM headlines "
+            "WHERE symbol = ? AND published_at >= ? AND sentiment IS NOT NULL GROUP BY day ORDER BY day",
+            (symbol, since)
+        ).fetchall()
+        return [{'date': day, 'score': float(score), 'headline_count': count} for day, score, count in rows]
+
+    def prune(self, retention_days: int = RETENTION_DAYS) -> int:
+        """Delete headlines published before the retention window"""
+        with self._write() as conn:
+            cursor = conn.execute("DELETE FROM headlines WHERE published_at < ?", (time.time() - retention_days * 86400,))
+        return cursor.rowcount
+
+    # ------------------------------------------------------------------
+    # Provider budgets
+    # ------------------------------------------------------------------
+
+    def spend(self, provider: str, reserve: float = 0.0) -> bool:
+        """
+        Take one request from the provider's daily budget; False once it is
+        used up, or once only the `reserve` share of it is left
+        """
+        budget = self.budgets.get(provider)
+        if budget is None:
+            return True
+        budget = int(budget * (1 - reserve))
+        today = datetime.utcnow().date().isoformat()
+        with self._write() as conn:
+            row = conn.execute("SELECT day, used FROM provider_budget WHERE provider = ?", (provider,)).fetchone()
+            used = row[1] if row and row[0] == today else 0
+            if used >= budget:
+                return False
+            conn.execute(
+                "INSERT INTO provider_budget VALUES (?, ?, ?) "
+                "ON CONFLICT(provider) DO UPDATE SET day = excluded.day, used = excluded.used",
+                (provider, today, used + 1)
+            )
+        return True
+
+    def spend_scheduled(self, provider: str) -> bool:
+        """spend() for scheduled ingestion, which leaves INTERACTIVE_RESERVE of each budget untouched"""
+        return self.spend(provider, reserve=INTERACTIVE_RESERVE)
+
+    def scheduled_budgets(self) -> Dict[str, int]:
+        """Daily requests per provider that scheduled ingestion may use"""
+        return {provider: int(budget * (1 - INTERACTIVE_RESERVE)) for provider, budget in self.budgets.items()}
+
+    def budget_status(self) -> Dict[str, Dict]:
+        """Requests used and remaining today per provider"""
+        today = datetime.utcnow().date().isoformat()
+        used = {
+            provider: count
+            for provider, day, count in self._connect().execute("SELECT provider, day, used FROM provider_budget")
+            if day == today
+        }
+        return {
+            provider: {'used': used.get(provider, 0), 'remaining': max(budget - used.get(provider, 0), 0)}
+            for provider, budget in self.budgets.items()
+        }
+
+
+# Singleton instance
+headline_store = HeadlineStore()
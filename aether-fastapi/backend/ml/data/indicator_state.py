@@ -0,0 +1,378 @@
+"""
+Incremental Indicator State
+Streaming O(1)-per-bar versions of the LSTM feature indicators, persisted per symbol next to the price cache
+"""
+
+import os
+import copy
+import json
+import threading
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+import logging
+
+from ml.data.feature_engineering import FEATURE_COLUMNS, feature_engineer
+
+logger = logging.getLogger(__name__)
+
+STATE_VERSION = 1
+
+
+class EMAState:
+    """Exponential mean y = alpha * x + (1 - alpha) * y_prev, seeded with the first value"""
+
+    __slots__ = ('alpha', 'min_periods', 'value', 'count')
+
+    def __init__(self, alpha: float, min_periods: int, value: float = np.nan, count: int = 0):
+        self.alpha = alpha
+        self.min_periods = min_periods
+        self.value = value
+        self.count = count
+
+    @classmethod
+    def span(cls, window: int) -> 'EMAState':
+        return cls(2.0 / (window + 1), window)
+
+    def update(self, x: float) -> float:
+        self.value = x if self.count == 0 else self.alpha * x + (1 - self.alpha) * self.value
+        self.count += 1
+        return self.current()
+
+    def current(self) -> float:
+        return self.value if self.count >= self.min_periods else np.nan
+
+    def to_dict(self) -> Dict:
+        return {'alpha': self.alpha, 'min_periods': self.min_periods, 'value': self.value, 'count': self.count}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'EMAState':
+        return cls(data['alpha'], data['min_periods'], data['value'], data['count'])
+
+
+class RollingWindow:
+    """
+    Fixed-size ring buffer with running mean and sum of squared deviations
+    (sliding Welford updates). The running moments are recomputed exactly
+    from the buffer each time it wraps, so rounding never accumulates.
+    """
+
+    __slots__ = ('size', 'buffer', 'head', 'count', 'mean', 'm2')
+
+    def __init__(self, size: int):
+        self.size = size
+        self.buffer = np.zeros(size)
+        self.head = 0
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, x: float):
+        if self.count < self.size:
+            self.count += 1
+            delta = x - self.mean
+            self.mean += delta / self.count
+            self.m2 += delta * (x - self.mean)
+        else:
+            old = self.buffer[self.head]
+            old_mean = self.mean
+            self.mean += (x - old) / self.size
+            self.m2 += (x - old) * (x - self.mean + old - old_mean)
+
+        self.buffer[self.head] = x
+        self.head = (self.head + 1) % self.size
+        if self.head == 0 and self.count == self.size:
+            self.mean = float(self.buffer.mean())
+            self.m2 = float(((self.buffer - self.mean) ** 2).sum())
+
+    def full(self) -> bool:
+        return self.count >= self.size
+
+    def current_mean(self) -> float:
+        return self.mean if self.full() else np.nan
+
+    def current_std(self, ddof: int = 1) -> float:
+        if not self.full() or self.size - ddof <= 0:
+            return np.nan
+        return float(np.sqrt(max(self.m2, 0.0) / (self.size - ddof)))
+
+    def lag(self, periods: int) -> float:
+        """Value `periods` updates ago (0 = newest), NaN if not seen yet"""
+        if periods >= self.count:
+            return np.nan
+        return float(self.buffer[(self.head - 1 - periods) % self.size])
+
+    def to_dict(self) -> Dict:
+        return {'size': self.size, 'buffer': self.buffer.tolist(), 'head': self.head,
+                'count': self.count, 'mean': self.mean, 'm2': self.m2}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'RollingWindow':
+        window = cls(data['size'])
+        window.buffer = np.asarray(data['buffer'], dtype=np.float64)
+        window.head = data['head']
+        window.count = data['count']
+        window.mean = data['mean']
+        window.m2 = data['m2']
+        return window
+
+
+class SymbolIndicatorState:
+    """
+    All LSTM feature indicators for one symbol, advanced one daily bar at a
+    time in O(1). Produces the same values as CryptoFeatureEngineer's batch
+    kernels over the same bars, and keeps the newest feature rows (a ring
+    buffer, oldest row at rows_head once full) so an inference window is
+    available without recomputing the history.
+    """
+
+    def __init__(self, history: int = 120):
+        self.history = history
+        self.bars = 0
+        self.last_date: Optional[str] = None
+        self.last_price = np.nan
+
+        self.ema = {window: EMAState.span(window) for window in (7, 21, 50)}
+        self.macd_fast = EMAState.span(12)
+        self.macd_slow = EMAState.span(26)
+        self.macd_signal = EMAState.span(9)
+        # Wilder smoothing of gains/losses (alpha = 1/14)
+        self.rsi_gain = EMAState(1.0 / 14, 14)
+        self.rsi_loss = EMAState(1.0 / 14, 14)
+
+        self.prices = RollingWindow(20)    # Bollinger bands and price lags
+        self.volumes = RollingWindow(7)    # Volume SMA
+        self.rows = np.full((history, len(FEATURE_COLUMNS)), np.nan)
+        self.rows_head = 0
+
+    def update(self, date: str, price: float, volume: float) -> np.ndarray:
+        """Advance by one bar and return its feature row (FEATURE_COLUMNS order, NaN during warm-up)"""
+        previous = self.last_price if self.bars else price
+        delta = price - previous
+        gain = self.rsi_gain.update(max(delta, 0.0))
+        loss = self.rsi_loss.update(max(-delta, 0.0))
+        if np.isnan(gain) or np.isnan(loss):
+            rsi = np.nan
+        else:
+            rsi = 100.0 if loss == 0 else 100.0 - 100.0 / (1.0 + gain / loss)
+
+        fast = self.macd_fast.update(price)
+        slow = self.macd_slow.update(price)
+        macd_line = fast - slow
+        signal = self.macd_signal.update(macd_line) if not np.isnan(macd_line) else np.nan
+
+        self.prices.update(price)
+        self.volumes.update(volume)
+        bb_mid = self.prices.current_mean()
+        bb_dev = 2 * self.prices.current_std(ddof=0)
+        volume_sma = self.volumes.current_mean()
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            features = {
+                'price': price,
+                'volume': volume,
+                'rsi': rsi,
+                'macd': macd_line,
+                'macd_signal': signal,
+                'macd_diff': macd_line - signal,
+                'bb_high': bb_mid + bb_dev,
+                'bb_low': bb_mid - bb_dev,
+                'bb_mid': bb_mid,
+                'bb_width': (2 * bb_dev) / bb_mid,
+                'ema_7': self.ema[7].update(price),
+                'ema_21': self.ema[21].update(price),
+                'ema_50': self.ema[50].update(price),
+                'volume_sma_7': volume_sma,
+                'volume_ratio': np.float64(volume) / volume_sma,
+                'price_change_1d': np.float64(price) / self.prices.lag(1) - 1,
+                'price_change_7d': np.float64(price) / self.prices.lag(7) - 1,
+            }
+        row = np.array([features[name] for name in FEATURE_COLUMNS], dtype=np.float64)
+
+        self.rows[self.rows_head] = row
+        self.rows_head = (self.rows_head + 1) % self.history
+        self.bars += 1
+        self.last_date = date
+        self.last_price = price
+        return row
+
+    def window(self, length: int) -> Optional[np.ndarray]:
+        """Newest `length` feature rows, or None if not enough fully warmed-up rows"""
+        if length > min(self.bars, self.history):
+            return None
+        rows = self.rows[(self.rows_head - length + np.arange(length)) % self.history]
+        return None if np.isnan(rows).any() else rows
+
+    def ordered_rows(self) -> np.ndarray:
+        """All kept feature rows, oldest first"""
+        return np.roll(self.rows, -self.rows_head, axis=0)
+
+    def to_dict(self) -> Dict:
+        rows = self.ordered_rows()
+        return {
+            'version': STATE_VERSION,
+            'history': self.history,
+            'bars': self.bars,
+            'last_date': self.last_date,
+            'last_price': self.last_price,
+            'ema': {str(window): state.to_dict() for window, state in self.ema.items()},
+            'macd_fast': self.macd_fast.to_dict(),
+            'macd_slow': self.macd_slow.to_dict(),
+            'macd_signal': self.macd_signal.to_dict(),
+            'rsi_gain': self.rsi_gain.to_dict(),
+            'rsi_loss': self.rsi_loss.to_dict(),
+            'prices': self.prices.to_dict(),
+            'volumes': self.volumes.to_dict(),
+            # Oldest first, so a loaded state's ring starts at index 0
+            'rows': np.where(np.isnan(rows), None, rows).tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'SymbolIndicatorState':
+        if data.get('version') != STATE_VERSION:
+            raise ValueError(f"Unsupported indicator state version {data.get('version')}")
+        state = cls(data['history'])
+        state.bars = data['bars']
+        state.last_date = data['last_date']
+        state.last_price = data['last_price']
+        state.ema = {int(window): EMAState.from_dict(ema) for window, ema in data['ema'].items()}
+        for name in ('macd_fast', 'macd_slow', 'macd_signal', 'rsi_gain', 'rsi_loss'):
+            setattr(state, name, EMAState.from_dict(data[name]))
+        state.prices = RollingWindow.from_dict(data['prices'])
+        state.volumes = RollingWindow.from_dict(data['volumes'])
+        state.rows = np.array(data['rows'], dtype=np.float64)
+        return state
+
+
+def _bar_dates(df: pd.DataFrame) -> List[str]:
+    return [date.isoformat() for date in pd.to_datetime(df['date'])]
+
+
+class IndicatorStateStore:
+    """
+    Per-symbol SymbolIndicatorState, cached in memory and saved as JSON in
+    the data collector's cache directory.
+
+    The newest bar of a CoinGecko daily series is the live, still-changing
+    price, so the saved state only covers closed bars; the live bar is
+    applied to a throwaway copy when features are requested. When a fetch
+    extends the series, only the new bars are fed in; if the stored last
+    bar is missing or its price was revised, the state is rebuilt (but never
+    from a shorter series than it already covers, e.g. a 7-day window).
+    """
+
+    def __init__(self, state_dir: Optional[str] = None, history: int = 120):
+        self.state_dir = state_dir or os.path.join(os.path.dirname(__file__), '../cache')
+        self.history = history
+        self._states: Dict[str, SymbolIndicatorState] = {}
+        self._lock = threading.Lock()
+
+    def _state_path(self, symbol: str) -> str:
+        return os.path.join(self.state_dir, f"{symbol.lower()}_indicator_state.json")
+
+    def _load(self, symbol: str) -> Optional[SymbolIndicatorState]:
+        state = self._states.get(symbol)
+        if state is not None:
+            return state
+        try:
+            with open(self._state_path(symbol), 'r') as f:
+                state = SymbolIndicatorState.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError):
+            return None
+        self._states[symbol] = state
+        return state
+
+    def _save(self, symbol: str, state: SymbolIndicatorState):
+        self._states[symbol] = state
+        os.makedirs(self.state_dir, exist_ok=True)
+        path = self._state_path(symbol)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    def advance(self, symbol: str, df: pd.DataFrame) -> Optional[SymbolIndicatorState]:
+        """
+        Bring the symbol's state up to the newest closed bar of df (all rows
+        but the last) and return it; None if df has no closed bars
+        """
+        symbol = symbol.upper()
+        if len(df) < 2:
+            return self._load(symbol)
+
+        # Already at df's newest closed bar (the common case on cache hits)
+        last_closed = df.iloc[-2]
+        state = self._states.get(symbol)
+        if (
+            state is not None
+            and state.last_date == pd.Timestamp(last_closed['date']).isoformat()
+            and np.isclose(float(pd.to_numeric(last_closed['price'], errors='coerce')), state.last_price, rtol=1e-9, atol=0.0)
+        ):
+            return state
+
+        closed = df.iloc[:-1]
+        dates = _bar_dates(closed)
+        prices = pd.to_numeric(closed['price'], errors='coerce').to_numpy(dtype=np.float64)
+        volumes = pd.to_numeric(closed['volume'], errors='coerce').to_numpy(dtype=np.float64)
+
+        with self._lock:
+            state = self._load(symbol)
+            start = None
+            if state is not None and state.last_date in dates:
+                position = dates.index(state.last_date)
+                if np.isclose(prices[position], state.last_price, rtol=1e-9, atol=0.0):
+                    start = position + 1
+            if start is None:
+                if state is not None and len(dates) < state.bars:
+                    return state
+                state = SymbolIndicatorState(self.history)
+                start = 0
+            if start == len(dates):
+                return state
+
+            for i in range(start, len(dates)):
+                state.update(dates[i], prices[i], volumes[i])
+            self._save(symbol, state)
+            return state
+
+    def feature_window(self, symbol: str, df: pd.DataFrame, length: int) -> Optional[np.ndarray]:
+        """
+        Raw features (FEATURE_COLUMNS order) for the newest `length` bars of
+        df, including its live last bar; None if the history is too short
+        """
+        state = self.advance(symbol, df)
+        if state is None:
+            return None
+
+        live = copy.deepcopy(state)
+        last = df.iloc[-1]
+        live.update(
+            pd.Timestamp(last['date']).isoformat(),
+            float(pd.to_numeric(last['price'], errors='coerce')),
+            float(pd.to_numeric(last['volume'], errors='coerce'))
+        )
+        return live.window(length)
+
+    def inference_window(
+        self,
+        symbol: str,
+        df: pd.DataFrame,
+        scaler,
+        feature_columns: List[str],
+        sequence_length: int = 60
+    ) -> np.ndarray:
+        """
+        Scaled inference window for a trained model, from the incremental
+        state when possible, else by recomputing indicators over df
+        """
+        window = None
+        if list(feature_columns) == FEATURE_COLUMNS:
+            window = self.feature_window(symbol, df, sequence_length)
+        if window is None:
+            features = feature_engineer.add_technical_indicators(df)
+            return feature_engineer.prepare_inference_window(features, scaler, feature_columns, sequence_length)
+        return scaler.transform(window).astype(np.float32)
+
+
+# Singleton instance
+indicator_states = IndicatorStateStore()
@@ -0,0 +1,210 @@
+"""
+Technical Indicator Kernels
+Vectorized NumPy implementations of the indicators used across the ML modules
+
+Every function takes a 1-D series or a 2-D (n_series, n_days) array with
+time on the last axis, so many symbols are processed in one call, and
+returns float64 arrays of the same shape. Warm-up positions are NaN, as in
+`ta` with fillna=False. Rows may be front-padded with NaN (series of
+different lengths): each row's warm-up starts at its first valid value.
+Interior NaNs are carried forward.
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import lfilter
+from typing import Optional, Tuple
+
+
+def _as_2d(x) -> Tuple[np.ndarray, bool]:
+    """float64 copy as (n_series, n_days), plus whether the input was 1-D"""
+    array = np.array(x, dtype=np.float64)
+    if array.ndim == 1:
+        return array[np.newaxis, :], True
+    if array.ndim != 2:
+        raise ValueError(f"Expected a 1-D or 2-D array, got {array.ndim} dimensions")
+    return array, False
+
+
+def _restore(array: np.ndarray, squeeze: bool) -> np.ndarray:
+    return array[0] if squeeze else array
+
+
+def _first_valid(x: np.ndarray) -> np.ndarray:
+    """Index of each row's first non-NaN value (n_days for all-NaN rows)"""
+    valid = ~np.isnan(x)
+    return np.where(valid.any(axis=1), valid.argmax(axis=1), x.shape[1])
+
+
+def _fill_gaps(x: np.ndarray) -> np.ndarray:
+    """Forward-fill NaNs, then back-fill each row's leading NaNs with its first value"""
+    n_days = x.shape[1]
+    positions = np.where(~np.isnan(x), np.arange(n_days), 0)
+    np.maximum.accumulate(positions, axis=1, out=positions)
+    filled = np.take_along_axis(x, positions, axis=1)
+
+    first = _first_valid(x)
+    has_data = first < n_days
+    leading = np.arange(n_days) < first[:, np.newaxis]
+    first_values = np.where(has_data, x[np.arange(len(x)), np.minimum(first, n_days - 1)], np.nan)
+    return np.where(leading, first_values[:, np.newaxis], filled)
+
+
+def _warmup_mask(x: np.ndarray, min_periods: int) -> np.ndarray:
+    """True where fewer than min_periods values have been seen since the row's first valid one"""
+    first = _first_valid(x)
+    return np.arange(x.shape[1]) < (first + min_periods - 1)[:, np.newaxis]
+
+
+def _ewm(x: np.ndarray, alpha: float, min_periods: int) -> np.ndarray:
+    """
+    Recursive exponential mean y[t] = alpha * x[t] + (1 - alpha) * y[t-1],
+    seeded with each row's first value (pandas ewm(adjust=False))
+    """
+    filled = _fill_gaps(x)
+    if filled.shape[1] == 0:
+        return filled
+    seed = np.nan_to_num(filled[:, :1]) * (1 - alpha)
+    result, _ = lfilter([alpha], [1.0, alpha - 1.0], np.nan_to_num(filled), axis=1, zi=seed)
+    result[_warmup_mask(x, min_periods) | np.isnan(filled)] = np.nan
+    return result
+
+
+def _windows(x: np.ndarray, window: int) -> np.ndarray:
+    """(n_series, n_days, window) trailing windows, NaN-padded at the start"""
+    padded = np.concatenate([np.full((x.shape[0], window - 1), np.nan), x], axis=1)
+    return sliding_window_view(padded, window, axis=1)
+
+
+# ---------------------------------------------------------------------------
+# Kernels
+# ---------------------------------------------------------------------------
+
+def pct_change(x, periods: int = 1) -> np.ndarray:
+    """Fractional change over `periods` steps (pandas pct_change)"""
+    x, squeeze = _as_2d(x)
+    result = np.full_like(x, np.nan)
+    if periods < x.shape[1]:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result[:, periods:] = x[:, periods:] / x[:, :-periods] - 1
+    return _restore(result, squeeze)
+
+
+def sma(x, window: int, min_periods: Optional[int] = None) -> np.ndarray:
+    """Simple moving average over the trailing window (NaN until min_periods values, default window)"""
+    x, squeeze = _as_2d(x)
+    min_periods = window if min_periods is None else min_periods
+    windows = _windows(x, window)
+    counts = (~np.isnan(windows)).sum(axis=2)
+    with np.errstate(invalid='ignore'):
+        result = np.nansum(windows, axis=2) / counts
+    result[counts < max(min_periods, 1)] = np.nan
+    return _restore(result, squeeze)
+
+
+def rolling_std(x, window: int, ddof: int = 1, min_periods: Optional[int] = None) -> np.ndarray:
+    """Rolling standard deviation (two-pass per window, so large prices don't lose precision)"""
+    x, squeeze = _as_2d(x)
+    min_periods = window if min_periods is None else min_periods
+    windows = _windows(x, window)
+    counts = (~np.isnan(windows)).sum(axis=2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.nansum(windows, axis=2) / counts
+        squares = np.nansum((windows - means[..., np.newaxis]) ** 2, axis=2)
+        result = np.sqrt(squares / (counts - ddof))
+    result[(counts < max(min_periods, 1)) | (counts - ddof <= 0)] = np.nan
+    return _restore(result, squeeze)
+
+
+def rolling_max(x, window: int, min_periods: Optional[int] = None) -> np.ndarray:
+    """Maximum over the trailing window (NaN until min_periods values, default window)"""
+    x, squeeze = _as_2d(x)
+    min_periods = window if min_periods is None else min_periods
+    windows = _windows(x, window)
+    counts = (~np.isnan(windows)).sum(axis=2)
+    result = np.fmax.reduce(windows, axis=2)
+    result[counts < max(min_periods, 1)] = np.nan
+    return _restore(result, squeeze)
+
+
+def ema(x, window: int, min_periods: Optional[int] = None) -> np.ndarray:
+    """Exponential moving average with span `window` (ta EMAIndicator)"""
+    x, squeeze = _as_2d(x)
+    min_periods = window if min_periods is None else min_periods
+    return _restore(_ewm(x, 2.0 / (window + 1), min_periods), squeeze)
+
+
+def rsi(x, window: int = 14, smoothing: str = 'wilder', min_periods: Optional[int] = None) -> np.ndarray:
+    """
+    Relative Strength Index
+
+    Args:
+        x: Close prices
+        window: Lookback
+        smoothing: 'wilder' (exponential, alpha = 1/window; ta RSIIndicator)
+            or 'sma' (simple average of gains and losses)
+        min_periods: Values needed before a result (default window)
+
+    Returns:
+        RSI in [0, 100]; 100 where there were no losses
+    """
+    x, squeeze = _as_2d(x)
+    min_periods = window if min_periods is None else min_periods
+
+    filled = _fill_gaps(x)
+    delta = np.zeros_like(filled)
+    delta[:, 1:] = np.diff(filled, axis=1)
+    # Differences count from each row's first value (the first one is 0)
+    leading = np.arange(x.shape[1]) < _first_valid(x)[:, np.newaxis]
+    gains = np.where(leading, np.nan, np.maximum(delta, 0.0))
+    losses = np.where(leading, np.nan, np.maximum(-delta, 0.0))
+
+    if smoothing == 'wilder':
+        avg_gain = _ewm(gains, 1.0 / window, min_periods)
+        avg_loss = _ewm(losses, 1.0 / window, min_periods)
+    elif smoothing == 'sma':
+        avg_gain = sma(gains, window, min_periods)
+        avg_loss = sma(losses, window, min_periods)
+    else:
+        raise ValueError(f"Unknown RSI smoothing '{smoothing}'")
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = np.where(avg_loss == 0, 100.0, 100.0 - 100.0 / (1.0 + avg_gain / avg_loss))
+    result[np.isnan(avg_gain) | np.isnan(avg_loss)] = np.nan
+    return _restore(result, squeeze)
+
+
+def macd(x, fast: int = 12, slow: int = 26, signal: int = 9) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """MACD line, signal line and histogram (ta MACD)"""
+    x, squeeze = _as_2d(x)
+    line = _ewm(x, 2.0 / (fast + 1), fast) - _ewm(x, 2.0 / (slow + 1), slow)
+    signal_line = _ewm(line, 2.0 / (signal + 1), signal)
+    return _restore(line, squeeze), _restore(signal_line, squeeze), _restore(line - signal_line, squeeze)
+
+
+def bollinger(x, window: int = 20, n_std: float = 2.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Bollinger high band, middle band (SMA) and low band, population std (ta BollingerBands)"""
+    mid = sma(x, window)
+    deviation = n_std * rolling_std(x, window, ddof=0)
+    return mid + deviation, mid, mid - deviation
+
+
+def rolling_volatility(x, window: int = 30, periods_per_year: Optional[float] = None, ddof: int = 1) -> np.ndarray:
+    """Rolling standard deviation of simple returns, annualized if periods_per_year is given"""
+    volatility = rolling_std(pct_change(x), window, ddof=ddof)
+    return volatility * np.sqrt(periods_per_year) if periods_per_year else volatility
+
+
+def drawdown(x) -> np.ndarray:
+    """Fractional distance below the running peak (0 at new highs, negative below)"""
+    x, squeeze = _as_2d(x)
+    peaks = np.fmax.accumulate(x, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = x / peaks - 1
+    return _restore(result, squeeze)
+
+
+def max_drawdown(x) -> np.ndarray:
+    """Largest peak-to-trough decline as a positive fraction, per series"""
+    with np.errstate(invalid='ignore'):
+        return -np.nanmin(drawdown(x), axis=-1)
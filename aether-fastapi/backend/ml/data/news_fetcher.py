@@ -1,15 +1,24 @@
 """
 Real News Fetcher
-Fetches cryptocurrency news from multiple APIs with fallback logic
+Serves cryptocurrency news from the shared headline store, refreshed by racing multiple APIs, with mock fallback
 """
 
 import os
-import requests
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
-import time
+from typing import List, Dict
 from functools import lru_cache
 
+from ml.data.news_providers import news_provider_pool, NewsRequest
+from ml.data.headline_store import headline_store
+from ml.nlp.sentiment_analyzer import crypto_sentiment_analyzer
+
+CRYPTO_NAMES = {
+    'BTC': 'Bitcoin',
+    'ETH': 'Ethereum',
+    'SOL': 'Solana',
+    'ADA': 'Cardano'
+}
+
 
 class NewsAPIFetcher:
     """Fetches cryptocurrency news from multiple news APIs"""
@@ -20,154 +29,116 @@ class NewsAPIFetcher:
         self.gnews_key = os.getenv('GNEWS_API_KEY')
         self.worldnews_key = os.getenv('WORLD_NEWS_API_KEY')
         
-        # Cache for news results (symbol -> (headlines, timestamp))
-        self._cache = {}
-        self._cache_duration = 300  # 5 minutes in seconds
+        # Seconds before a symbol's stored headlines are refreshed on demand
+        self._refresh_after = 300  # 5 minutes
     
     def get_crypto_news(self, symbol: str, max_articles: int = 10) -> List[Dict]:
         """
-        Fetch cryptocurrency news with multi-API fallback
-        
+        Cryptocurrency news from the shared headline store, refreshed from the
+        news APIs when stale
+
         Args:
             symbol: Crypto symbol (e.g., BTC, ETH)
             max_articles: Maximum number of articles to return
-            
+
         Returns:
             List of news articles with title, source, time, etc.
         """
-        # Check cache first
-        cached = self._get_from_cache(symbol)
-        if cached:
-            return cached
-        
-        # Try APIs in order of preference
-        headlines = None
-        
-        # 1. Try NewsData.io (most reliable for crypto)
-        if self.newsdata_key and not headlines:
-            headlines = self._fetch_newsdata(symbol, max_articles)
-        
-        # 2. Try GNews (good alternative)
-        if self.gnews_key and not headlines:
-            headlines = self._fetch_gnews(symbol, max_articles)
-        
-        # 3. Try World News API (last resort)
-        if self.worldnews_key and not headlines:
-            headlines = self._fetch_worldnews(symbol, max_articles)
-        
-        # 4. Fallback to mock data if all APIs fail
+        if not headline_store.is_fresh(self.store_key(symbol), self._refresh_after):
+            self.refresh_news(symbol, max_articles)
+
+        headlines = headline_store.recent(self.store_key(symbol), max_articles, max_age_hours=24 * 7)
+
+        # Fallback to mock data if all APIs fail
         if not headlines:
             print(f"Warning: All news APIs failed for {symbol}, using mock data")
             headlines = self._generate_mock_headlines(symbol)
-        
-        # Cache the results
-        self._save_to_cache(symbol, headlines)
-        
+
         return headlines
-    
-    def _fetch_newsdata(self, symbol: str, max_articles: int) -> Optional[List[Dict]]:
-        """Fetch from NewsData.io API"""
-        try:
-            # Build search query
-            crypto_names = {
-                'BTC': 'Bitcoin',
-                'ETH': 'Ethereum',
-                'SOL': 'Solana',
-                'ADA': 'Cardano'
-            }
-            crypto_name = crypto_names.get(symbol, symbol)
-            
-            url = "https://newsdata.io/api/1/news"
-            params = {
+
+    def refresh_news(self, symbol: str, max_articles: int = 10, scheduled: bool = False) -> int:
+        """
+        Race every configured API for a symbol, score the headlines and add
+        them to the shared store
+
+        Args:
+            symbol: Crypto symbol
+            max_articles: Headlines to fetch
+            scheduled: Background ingestion, which leaves the interactive
+                reserve of each provider budget alone
+
+        Returns:
+            Number of new headlines
+        """
+        # Providers in order of preference (NewsData is most reliable for crypto);
+        # the pool reorders them by observed latency and skips circuit-open ones
+        provider_requests = []
+        if self.newsdata_key:
+            provider_requests.append(self._newsdata_request(symbol, max_articles))
+        if self.gnews_key:
+            provider_requests.append(self._gnews_request(symbol, max_articles))
+        if self.worldnews_key:
+            provider_requests.append(self._worldnews_request(symbol, max_articles))
+
+        admit = headline_store.spend_scheduled if scheduled else headline_store.spend
+        headlines = news_provider_pool.fetch(provider_requests, min_articles=max_articles, admit=admit)
+        analyses = crypto_sentiment_analyzer.analyze_batch([h['title'] for h in headlines])
+        for headline, analysis in zip(headlines, analyses):
+            headline['sentiment'] = analysis['compound']
+
+        # Stored even when empty, so a failing symbol isn't re-fetched on every request
+        return headline_store.add(self.store_key(symbol), headlines)
+
+    @staticmethod
+    def store_key(symbol: str) -> str:
+        """Headline store key for a crypto symbol"""
+        return f"crypto:{symbol.upper()}"
+
+    def _newsdata_request(self, symbol: str, max_articles: int) -> NewsRequest:
+        """NewsData.io search request"""
+        crypto_name = CRYPTO_NAMES.get(symbol, symbol)
+        return NewsRequest(
+            provider='newsdata',
+            url="https://newsdata.io/api/1/news",
+            params={
                 'apikey': self.newsdata_key,
                 'q': f'{crypto_name} OR {symbol} OR cryptocurrency',
                 'language': 'en',
                 'size': max_articles
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                articles = data.get('results', [])
-                
-                return self._parse_newsdata_articles(articles)
-            else:
-                print(f"NewsData.io error: {response.status_code}")
-                return None
-                
-        except Exception as e:
-            print(f"NewsData.io exception: {str(e)}")
-            return None
-    
-    def _fetch_gnews(self, symbol: str, max_articles: int) -> Optional[List[Dict]]:
-        """Fetch from GNews API"""
-        try:
-            crypto_names = {
-                'BTC': 'Bitcoin',
-                'ETH': 'Ethereum',
-                'SOL': 'Solana',
-                'ADA': 'Cardano'
-            }
-            crypto_name = crypto_names.get(symbol, symbol)
-            
-            url = "https://gnews.io/api/v4/search"
-            params = {
+            },
+            parse=lambda data: self._parse_newsdata_articles(data.get('results', []))
+        )
+
+    def _gnews_request(self, symbol: str, max_articles: int) -> NewsRequest:
+        """GNews search request"""
+        crypto_name = CRYPTO_NAMES.get(symbol, symbol)
+        return NewsRequest(
+            provider='gnews',
+            url="https://gnews.io/api/v4/search",
+            params={
                 'apikey': self.gnews_key,
                 'q': f'{crypto_name} cryptocurrency',
                 'lang': 'en',
                 'max': max_articles
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                articles = data.get('articles', [])
-                
-                return self._parse_gnews_articles(articles)
-            else:
-                print(f"GNews error: {response.status_code}")
-                return None
-                
-        except Exception as e:
-            print(f"GNews exception: {str(e)}")
-            return None
-    
-    def _fetch_worldnews(self, symbol: str, max_articles: int) -> Optional[List[Dict]]:
-        """Fetch from World News API"""
-        try:
-            crypto_names = {
-                'BTC': 'Bitcoin',
-                'ETH': 'Ethereum',
-                'SOL': 'Solana',
-                'ADA': 'Cardano'
-            }
-            crypto_name = crypto_names.get(symbol, symbol)
-            
-            url = "https://api.worldnewsapi.com/search-news"
-            params = {
+            },
+            parse=lambda data: self._parse_gnews_articles(data.get('articles', []))
+        )
+
+    def _worldnews_request(self, symbol: str, max_articles: int) -> NewsRequest:
+        """World News API search request"""
+        crypto_name = CRYPTO_NAMES.get(symbol, symbol)
+        return NewsRequest(
+            provider='worldnews',
+            url="https://api.worldnewsapi.com/search-news",
+            params={
                 'api-key': self.worldnews_key,
                 'text': f'{crypto_name} OR {symbol}',
                 'language': 'en',
                 'number': max_articles
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                articles = data.get('news', [])
-                
-                return self._parse_worldnews_articles(articles)
-            else:
-                print(f"World News API error: {response.status_code}")
-                return None
-                
-        except Exception as e:
-            print(f"World News API exception: {str(e)}")
-            return None
-    
+            },
+            parse=lambda data: self._parse_worldnews_articles(data.get('news', []))
+        )
+
     def _parse_newsdata_articles(self, articles: List) -> List[Dict]:
         """Parse NewsData.io article format"""
         parsed = []
@@ -249,21 +220,6 @@ class NewsAPIFetcher:
         except:
             return 2
     
-    def _get_from_cache(self, symbol: str) -> Optional[List[Dict]]:
-        """Get news from cache if not expired"""
-        if symbol in self._cache:
-            headlines, timestamp = self._cache[symbol]
-            
-            # Check if cache is still valid (5 minutes)
-            if time.time() - timestamp < self._cache_duration:
-                return headlines
-        
-        return None
-    
-    def _save_to_cache(self, symbol: str, headlines: List[Dict]):
-        """Save news to cache"""
-        self._cache[symbol] = (headlines, time.time())
-    
     def _generate_mock_headlines(self, symbol: str) -> List[Dict]:
         """Fallback mock headlines if all APIs fail"""
         mock_headlines = [
@@ -0,0 +1,105 @@
+"""
+News Ingester
+Pulls headlines for a set of stocks and coins into the shared headline store on a schedule
+"""
+
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from ml.data.headline_store import headline_store
+from ml.data.news_fetcher import news_fetcher
+from ml.shares.sentiment_analyzer import stock_sentiment_analyzer
+
+logger = logging.getLogger(__name__)
+
+# Minimum seconds between scheduled refreshes of one symbol (stretched to fit the provider budgets)
+INGEST_INTERVAL = 900
+# Symbols refreshed at once (each refresh already races its providers)
+INGEST_CONCURRENCY = 4
+
+
+class NewsIngester:
+    """
+    Refreshes the headline store for every held ticker and coin
+
+    Symbols refreshed within the interval (by an earlier run or on demand
+    by a sentiment request in any worker) are skipped, and every provider
+    request is drawn from the store's shared daily budget, so running this
+    alongside the API never exceeds the providers' quotas.
+
+    The interval grows with the number of symbols so that refreshing each
+    of them (worst case: one request per provider) fits in the scheduled
+    share of the smallest provider budget over a day, and the interactive
+    reserve stays available to sentiment requests.
+    """
+
+    def __init__(self, interval: int = INGEST_INTERVAL, concurrency: int = INGEST_CONCURRENCY):
+        self.interval = interval
+        self.concurrency = concurrency
+
+    def run(self, stocks: Optional[Dict[str, Optional[str]]] = None, coins: Optional[List[str]] = None) -> Dict:
+        """
+        One ingestion pass
+
+        Args:
+            stocks: Ticker -> company name (None: looked up / ticker used as query)
+            coins: Crypto symbols
+
+        Returns:
+            Counts of refreshed and skipped symbols, new headlines, and the
+            providers' remaining budgets
+        """
+        started = time.perf_counter()
+        interval = self.effective_interval(len(stocks or {}) + len(coins or []))
+        jobs = []
+        skipped = 0
+        for ticker, company in (stocks or {}).items():
+            ticker = ticker.upper()
+            if headline_store.is_fresh(f"stock:{ticker}", interval):
+                skipped += 1
+                continue
+            jobs.append((ticker, lambda t=ticker, c=company: stock_sentiment_analyzer.refresh_news(t, c, scheduled=True)))
+        for symbol in coins or []:
+            symbol = symbol.upper()
+            if headline_store.is_fresh(news_fetcher.store_key(symbol), interval):
+                skipped += 1
+                continue
+            jobs.append((symbol, lambda s=symbol: news_fetcher.refresh_news(s, scheduled=True)))
+
+        def refresh(job) -> int:
+            symbol, fetch = job
+            try:
+                return fetch()
+            except Exception as e:
+                logger.warning(f"News ingestion failed for {symbol}: {str(e)}")
+                return 0
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            added = list(executor.map(refresh, jobs))
+        pruned = headline_store.prune()
+
+        return {
+            "refreshed": len(jobs),
+            "skipped_fresh": skipped,
+            "new_headlines": sum(added),
+            "pruned": pruned,
+            "interval_seconds": interval,
+            "budgets": headline_store.budget_status(),
+            "elapsed_seconds": round(time.perf_counter() - started, 1),
+        }
+
+    def effective_interval(self, n_symbols: int) -> int:
+        """Seconds between refreshes of one symbol that keep n_symbols within every scheduled budget"""
+        # Providers with no scheduled budget are never called by ingestion
+        budgets = [budget for budget in headline_store.scheduled_budgets().values() if budget > 0]
+        if not n_symbols or not budgets:
+            return self.interval
+        # Each refresh may call every provider, so the tightest budget sets the pace
+        refreshes_per_day = min(budgets) / n_symbols
+        return max(self.interval, int(86400 / refreshes_per_day))
+
+
+# Singleton instance
+news_ingester = NewsIngester()
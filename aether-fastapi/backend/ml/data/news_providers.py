@@ -0,0 +1,275 @@
+"""
+News Provider Racing
+Fetches headlines from several news APIs concurrently over one connection pool, with hedged launches and per-provider circuit breakers
+"""
+
+import asyncio
+import atexit
+import threading
+import time
+import logging
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# Worst-case wall time of one fetch, however many providers are tried
+FETCH_TIMEOUT = 8.0
+# Consecutive failures that open a provider's circuit, and how long it stays open
+FAILURE_THRESHOLD = 3
+OPEN_SECONDS = 120.0
+# Weight of the newest sample in each provider's latency average
+LATENCY_ALPHA = 0.3
+# Latency assumed for a provider that has never answered
+DEFAULT_LATENCY = 1.5
+# Bounds on how long to wait for the running providers before launching the next one
+MIN_HEDGE_DELAY, MAX_HEDGE_DELAY = 0.3, 2.5
+
+
+@dataclass
+class NewsRequest:
+    """One provider's HTTP request and the parser for its JSON body"""
+    provider: str
+    url: str
+    params: Dict
+    parse: Callable[[Dict], List[Dict]]
+
+
+@dataclass
+class ProviderHealth:
+    """Circuit breaker and latency average for one provider"""
+    latency: float = DEFAULT_LATENCY
+    failures: int = 0
+    opened_at: Optional[float] = None
+    probing: bool = False
+    samples: int = 0
+
+    def available(self, now: float) -> bool:
+        """Closed, or open long enough that one probe request may go through"""
+        if self.opened_at is None:
+            return True
+        return not self.probing and now - self.opened_at >= OPEN_SECONDS
+
+    def record_latency(self, seconds: float):
+        self.latency = seconds if self.samples == 0 else (1 - LATENCY_ALPHA) * self.latency + LATENCY_ALPHA * seconds
+        self.samples += 1
+
+    def record_success(self, seconds: float):
+        self.record_latency(seconds)
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self, now: float):
+        self.failures += 1
+        # A failed probe re-opens the circuit for another full period
+        if self.probing or self.failures >= FAILURE_THRESHOLD:
+            self.opened_at = now
+        self.probing = False
+
+
+class NewsProviderPool:
+    """
+    Races news providers on a background event loop
+
+    Providers are launched fastest-first by their latency average; the next
+    one starts when a running one fails or has not answered within a hedge
+    delay derived from that average. Once enough headlines have arrived the
+    remaining requests are cancelled, and the whole race is bounded by one
+    timeout. All requests share one aiohttp session so connections are
+    reused across calls.
+
+    Callers are plain functions (the analyzers run in worker threads), so
+    the loop lives in its own daemon thread and fetch() blocks on it.
+    """
+
+    def __init__(self, timeout: float = FETCH_TIMEOUT):
+        self.timeout = timeout
+        self.health: Dict[str, ProviderHealth] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def fetch(
+        self,
+        requests: List[NewsRequest],
+        min_articles: int,
+        admit: Optional[Callable[[str], bool]] = None
+    ) -> List[Dict]:
+        """
+        Race the given provider requests and merge their headlines
+
+        Args:
+            requests: One request per configured provider, in preference order
+            min_articles: Headlines after which the remaining providers are cancelled
+            admit: Called (in a worker thread) with a provider's name right
+                before its request is sent; returning False skips it (e.g. its
+                rate budget is spent)
+
+        Returns:
+            Headlines (deduplicated by title) in arrival order; empty if every
+            provider failed, timed out or is circuit-open
+        """
+        if not requests:
+            return []
+        future = asyncio.run_coroutine_threadsafe(self._race(requests, min_articles, admit), self._get_loop())
+        try:
+            # The race enforces its own deadline; this only guards a wedged loop
+            return future.result(self.timeout + 2)
+        except Exception as e:
+            future.cancel()
+            logger.warning(f"News provider race failed: {str(e)}")
+            return []
+
+    def status(self) -> Dict[str, Dict]:
+        """Breaker state and latency average per provider"""
+        now = time.monotonic()
+        return {
+            name: {
+                "state": "closed" if h.opened_at is None else ("half_open" if h.available(now) else "open"),
+                "consecutive_failures": h.failures,
+                "latency_ms": round(h.latency * 1000, 1),
+            }
+            for name, h in self.health.items()
+        }
+
+    def close(self):
+        """Close the shared session and stop the loop (called automatically at interpreter exit)"""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        if self._session is not None:
+            asyncio.run_coroutine_threadsafe(self._session.close(), loop).result(5)
+            self._session = None
+        loop.call_soon_threadsafe(loop.stop)
+
+    # ------------------------------------------------------------------
+    # Race
+    # ------------------------------------------------------------------
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="news-providers", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Only touched from the loop thread
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=20, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    def _ordered(self, requests: List[NewsRequest], now: float) -> List[NewsRequest]:
+        """Available providers, fastest first (stable, so ties keep preference order)"""
+        available = []
+        for request in requests:
+            health = self.health.setdefault(request.provider, ProviderHealth())
+            if health.available(now):
+                available.append(request)
+        return sorted(available, key=lambda r: self.health[r.provider].latency)
+
+    async def _call(self, request: NewsRequest) -> List[Dict]:
+        async with self._get_session().get(request.url, params=request.params) as response:
+            if response.status != 200:
+                raise RuntimeError(f"HTTP {response.status}")
+            data = await response.json(content_type=None)
+        return request.parse(data)
+
+    async def _race(
+        self,
+        requests: List[NewsRequest],
+        min_articles: int,
+        admit: Optional[Callable[[str], bool]]
+    ) -> List[Dict]:
+        started = time.monotonic()
+        deadline = started + self.timeout
+        pending_requests = self._ordered(requests, started)
+        running: Dict[asyncio.Task, NewsRequest] = {}
+        launched_at: Dict[asyncio.Task, float] = {}
+        headlines: List[Dict] = []
+        seen_titles = set()
+
+        async def launch() -> bool:
+            """Start the next admitted provider; False if none is left"""
+            while pending_requests:
+                request = pending_requests.pop(0)
+                # admit may block (budgets are SQLite writes), so keep it off the loop thread
+                if admit is not None and not await asyncio.to_thread(admit, request.provider):
+                    continue
+                health = self.health[request.provider]
+                if health.opened_at is not None:
+                    health.probing = True
+                task = asyncio.ensure_future(self._call(request))
+                running[task] = request
+                launched_at[task] = time.monotonic()
+                return True
+            return False
+
+        try:
+            while (running or pending_requests) and len(headlines) < min_articles:
+                if not running and not await launch():
+                    break
+                now = time.monotonic()
+                if now >= deadline:
+                    break
+                wait = deadline - now
+                if pending_requests:
+                    # Hedge: give the running providers about their usual latency, then add the next
+                    fastest = min(self.health[r.provider].latency for r in running.values())
+                    wait = min(wait, min(max(fastest * 1.5, MIN_HEDGE_DELAY), MAX_HEDGE_DELAY))
+
+                done, _ = await asyncio.wait(list(running), timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+                now = time.monotonic()
+                for task in done:
+                    request = running.pop(task)
+                    health = self.health[request.provider]
+                    try:
+                        articles = task.result()
+                    except Exception as e:
+                        health.record_failure(now)
+                        logger.info(f"{request.provider} failed: {str(e) or type(e).__name__}")
+                        continue
+                    # An empty answer is healthy, just not useful
+                    health.record_success(now - launched_at[task])
+                    for article in articles:
+                        title = (article.get('title') or '').strip()
+                        if title and title.lower() not in seen_titles:
+                            seen_titles.add(title.lower())
+                            headlines.append(article)
+
+                # Still short after a provider answered or the hedge delay expired: add the next one
+                if pending_requests and len(headlines) < min_articles and now < deadline:
+                    await launch()
+        finally:
+            now = time.monotonic()
+            for task, request in running.items():
+                task.cancel()
+                health = self.health[request.provider]
+                if now >= deadline:
+                    health.record_failure(now)
+                else:
+                    # Lost the race: it took at least this long, so only let it push the average up
+                    elapsed = now - launched_at[task]
+                    if elapsed > health.latency:
+                        health.record_latency(elapsed)
+                    health.probing = False
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+        return headlines
+
+
+# Singleton instance
+news_provider_pool = NewsProviderPool()
+atexit.register(news_provider_pool.close)
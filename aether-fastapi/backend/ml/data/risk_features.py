@@ -5,10 +5,21 @@ Calculates risk-specific features for XGBoost risk classification
 
 import pandas as pd
 import numpy as np
-from typing import Dict, List
+from typing import Dict, List, Optional
 import warnings
 warnings.filterwarnings('ignore')
 
+from ml.data import indicators
+
+# Feature order produced by engineer_features and engineer_feature_matrix
+RISK_FEATURE_NAMES = [
+    'historical_volatility', 'ewm_volatility', 'volatility_ratio',
+    'volume_volatility', 'volume_trend', 'volume_spike',
+    'max_drawdown', 'sharp_moves_pct', 'price_acceleration',
+    'btc_correlation', 'beta_coefficient', 'correlation_strength'
+]
+NEUTRAL_CORRELATION = (0.5, 1.0, 0.5)
+
 
 class RiskFeatureEngineer:
     """Engineer risk features from cryptocurrency price/volume data"""
@@ -211,6 +222,133 @@ class RiskFeatureEngineer:
         
         return features
     
+    def engineer_feature_matrix(
+        self,
+        prices: np.ndarray,
+        volumes: Optional[np.ndarray] = None,
+        btc_prices: Optional[np.ndarray] = None,
+        benchmark_rows: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Risk features for many assets in one vectorized pass
+        
+        Matches engineer_features row by row. Series of different lengths are
+        front-padded with NaN; the newest values line up in the last column.
+        
+        Args:
+            prices: (n_assets, n_days) prices
+            volumes: Volumes shaped like prices (None for neutral volume features)
+            btc_prices: (n_days_btc,) benchmark prices shared by every asset,
+                aligned on the newest day (None for neutral correlation features)
+            benchmark_rows: Boolean mask of rows that are the benchmark itself,
+                which get neutral correlation features
+        
+        Returns:
+            (n_assets, len(RISK_FEATURE_NAMES)) feature matrix
+        """
+        prices = np.atleast_2d(np.asarray(prices, dtype=np.float64))
+        n_assets = prices.shape[0]
+        returns = indicators.pct_change(prices)
+        observations = (~np.isnan(prices)).sum(axis=1)
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Volatility features
+            hist_vol = indicators.rolling_std(returns, 30) * np.sqrt(365) * 100
+            current_hist_vol = hist_vol[:, -1]
+            ewm_vol = self._last_ewm_std(returns, span=30) * np.sqrt(365) * 100
+            avg_vol = indicators.sma(hist_vol, 90)[:, -1]
+            vol_ratio = np.where(avg_vol > 0, current_hist_vol / avg_vol, 1.0)
+            
+            # Volume features
+            if volumes is None:
+                volume_features = [np.zeros(n_assets), np.ones(n_assets), np.ones(n_assets)]
+            else:
+                volumes = np.atleast_2d(np.asarray(volumes, dtype=np.float64))
+                vol_volatility = indicators.rolling_std(indicators.pct_change(volumes), 30)[:, -1] * 100
+                vol_7d = indicators.sma(volumes, 7)[:, -1]
+                vol_30d = indicators.sma(volumes, 30)[:, -1]
+                volume_features = [
+                    vol_volatility,
+                    np.where(vol_30d > 0, vol_7d / vol_30d, 1.0),
+                    np.where(vol_30d > 0, volumes[:, -1] / vol_30d, 1.0)
+                ]
+            
+            # Price features
+            rolling_max = indicators.rolling_max(prices, 30, min_periods=1)
+            drawdown = (prices - rolling_max) / rolling_max * 100
+            max_drawdown = np.abs(np.nanmin(drawdown, axis=1))
+            sharp = (np.abs(np.nan_to_num(returns[:, -30:])) > 0.05).sum(axis=1)
+            sharp_moves_pct = np.where(observations >= 30, sharp / 30 * 100, np.nan)
+            acceleration = np.full(n_assets, np.nan)
+            if prices.shape[1] >= 3:
+                acceleration = np.abs(np.diff(prices[:, -3:], n=2, axis=1)[:, 0])
+        
+        correlation = self._correlation_matrix(returns, btc_prices, benchmark_rows)
+        
+        return np.column_stack([
+            current_hist_vol, ewm_vol, vol_ratio,
+            *volume_features,
+            max_drawdown, sharp_moves_pct, acceleration,
+            *correlation
+        ])
+    
+    def _last_ewm_std(self, x: np.ndarray, span: int) -> np.ndarray:
+        """Newest value of pandas ewm(span).std() (adjust=True, bias-corrected) per row"""
+        alpha = 2.0 / (span + 1)
+        valid = ~np.isnan(x)
+        weights = np.where(valid, (1 - alpha) ** np.arange(x.shape[1] - 1, -1, -1), 0.0)
+        values = np.nan_to_num(x)
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            total = weights.sum(axis=1)
+            mean = (weights * values).sum(axis=1) / total
+            biased = (weights * (values - mean[:, np.newaxis]) ** 2).sum(axis=1) / total
+            correction = total ** 2 / (total ** 2 - (weights ** 2).sum(axis=1))
+            result = np.sqrt(biased * correction)
+        return np.where(valid.sum(axis=1) >= 2, result, np.nan)
+    
+    def _correlation_matrix(
+        self,
+        returns: np.ndarray,
+        btc_prices: Optional[np.ndarray],
+        benchmark_rows: Optional[np.ndarray]
+    ) -> List[np.ndarray]:
+        """btc_correlation, beta_coefficient and correlation_strength columns"""
+        n_assets = returns.shape[0]
+        neutral = [np.full(n_assets, value) for value in NEUTRAL_CORRELATION]
+        if btc_prices is None or np.count_nonzero(~np.isnan(btc_prices)) < 30:
+            return neutral
+        
+        # Align on the newest day, like calculate_correlation_features
+        btc_returns = indicators.pct_change(np.asarray(btc_prices, dtype=np.float64))
+        length = min(returns.shape[1], len(btc_returns))
+        asset = returns[:, -length:]
+        market = np.broadcast_to(btc_returns[-length:], asset.shape)
+        
+        pairs = ~np.isnan(asset) & ~np.isnan(market)
+        counts = pairs.sum(axis=1)
+        asset = np.where(pairs, asset, 0.0)
+        market = np.where(pairs, market, 0.0)
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            asset_dev = np.where(pairs, asset - asset.sum(axis=1, keepdims=True) / counts[:, np.newaxis], 0.0)
+            market_dev = np.where(pairs, market - market.sum(axis=1, keepdims=True) / counts[:, np.newaxis], 0.0)
+            covariance = (asset_dev * market_dev).sum(axis=1) / (counts - 1)
+            asset_var = (asset_dev ** 2).sum(axis=1) / (counts - 1)
+            market_var = (market_dev ** 2).sum(axis=1) / (counts - 1)
+            correlation = covariance / np.sqrt(asset_var * market_var)
+            beta = np.where(market_var > 0, covariance / market_var, 1.0)
+        
+        # Too few overlapping returns, or the benchmark against itself
+        use_neutral = counts < 10
+        if benchmark_rows is not None:
+            use_neutral |= np.asarray(benchmark_rows, dtype=bool)
+        return [
+            np.where(use_neutral, neutral[0], correlation),
+            np.where(use_neutral, neutral[1], beta),
+            np.where(use_neutral, neutral[2], np.abs(correlation))
+        ]
+    
     def get_feature_vector(self, features: Dict[str, float]) -> np.ndarray:
         """Convert feature dict to numpy array (for model input)"""
         return np.array([features[name] for name in self.feature_names]).reshape(1, -1)
@@ -0,0 +1,394 @@
+"""
+Hyperparameter Search
+Parallel random search for the LSTM and XGBoost price models, pruning unpromising trials early
+
+Usage:
+    python ml/hparam_search.py BTC ETH --model lstm --trials 24
+    python ml/hparam_search.py --model xgboost --trials 40     # every symbol
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import json
+import math
+import shutil
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import multiprocessing
+
+HPARAMS_DIR = os.path.join(os.path.dirname(__file__), 'models', 'hparams')
+TRIALS_DIR = os.path.join(os.path.dirname(__file__), 'cache', 'hparam_trials')
+
+# Search spaces: ('choice', options) | ('uniform', low, high) | ('loguniform', low, high)
+LSTM_SPACE = {
+    'hidden_size_1': ('choice', [64, 128, 192, 256]),
+    'hidden_size_2': ('choice', [32, 64, 96, 128]),
+    'dropout': ('uniform', 0.0, 0.4),
+    'learning_rate': ('loguniform', 3e-4, 5e-3),
+    'batch_size': ('choice', [16, 32, 64]),
+}
+
+XGBOOST_SPACE = {
+    'max_depth': ('choice', [3, 4, 5, 6, 7, 8]),
+    'learning_rate': ('loguniform', 0.01, 0.3),
+    'subsample': ('uniform', 0.6, 1.0),
+    'colsample_bytree': ('uniform', 0.5, 1.0),
+    'min_child_weight': ('choice', [1, 2, 4, 8]),
+    'reg_lambda': ('loguniform', 0.1, 10.0),
+}
+
+# Parameters ml/train_xgboost.py has always used (the fallback for untuned symbols)
+XGBOOST_DEFAULTS = {
+    'n_estimators': 200,
+    'max_depth': 6,
+    'learning_rate': 0.1,
+    'subsample': 0.8,
+    'colsample_bytree': 0.8,
+}
+XGBOOST_MAX_ROUNDS = 1000
+XGBOOST_EARLY_STOPPING_ROUNDS = 30
+
+# Newest share of an LSTM trial's training range used for early stopping; trials are
+# pruned and ranked on the held-out 20% after it, which stopping never sees
+LSTM_STOPPING_FRACTION = 0.125
+
+# Which LSTM parameters shape the network vs. the training loop
+LSTM_MODEL_KEYS = ('hidden_size_1', 'hidden_size_2', 'dropout')
+LSTM_TRAIN_KEYS = ('learning_rate', 'batch_size')
+
+SPACES = {'lstm': LSTM_SPACE, 'xgboost': XGBOOST_SPACE}
+
+
+def sample_params(space: Dict, rng: np.random.Generator) -> Dict:
+    """Draw one configuration from a search space"""
+    params = {}
+    for name, spec in space.items():
+        kind = spec[0]
+        if kind == 'choice':
+            params[name] = spec[1][int(rng.integers(len(spec[1])))]
+        elif kind == 'uniform':
+            params[name] = float(rng.uniform(spec[1], spec[2]))
+        elif kind == 'loguniform':
+            params[name] = float(math.exp(rng.uniform(math.log(spec[1]), math.log(spec[2]))))
+        else:
+            raise ValueError(f"Unknown search space kind '{kind}' for {name}")
+    return params
+
+
+def split_lstm_params(params: Dict) -> Tuple[Dict, Dict]:
+    """Split tuned LSTM parameters into (LSTMPriceModel kwargs, train kwargs)"""
+    model_params = {k: params[k] for k in LSTM_MODEL_KEYS if k in params}
+    train_kwargs = {k: params[k] for k in LSTM_TRAIN_KEYS if k in params}
+    return model_params, train_kwargs
+
+
+# ---------------------------------------------------------------------------
+# Best-configuration store (one JSON file per symbol)
+# ---------------------------------------------------------------------------
+
+def _hparams_path(symbol: str, hparams_dir: str = HPARAMS_DIR) -> str:
+    return os.path.join(hparams_dir, f"{symbol.upper()}.json")
+
+
+def _load_hparams_file(symbol: str, hparams_dir: str = HPARAMS_DIR) -> Dict:
+    try:
+        with open(_hparams_path(symbol, hparams_dir), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def load_best_params(symbol: str, model: str, hparams_dir: str = HPARAMS_DIR) -> Optional[Dict]:
+    """A symbol's best configuration for a model ('lstm' or 'xgboost'), or None if never searched"""
+    entry = _load_hparams_file(symbol, hparams_dir).get(model)
+    return dict(entry['params']) if entry else None
+
+
+def save_best_params(symbol: str, model: str, entry: Dict, hparams_dir: str = HPARAMS_DIR):
+    """Atomically record a model's search result in the symbol's file"""
+    os.makedirs(hparams_dir, exist_ok=True)
+    data = _load_hparams_file(symbol, hparams_dir)
+    data[model] = entry
+
+    path = _hparams_path(symbol, hparams_dir)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+# ---------------------------------------------------------------------------
+# Pruning
+# ---------------------------------------------------------------------------
+
+class TrialPruned(Exception):
+    """Raised from a trial's progress callback to stop it early"""
+
+
+class MedianStoppingRule:
+    """
+    Median stopping across concurrently running trials.
+
+    Each trial appends its best-so-far validation loss to a small JSON file
+    in the run directory after every epoch. Past the warmup, a trial stops
+    once its best-so-far loss is worse than the median of the other trials'
+    curves at the same epoch (needs at least min_trials to compare against).
+    """
+
+    def __init__(self, run_dir: str, trial_id: int, warmup_epochs: int = 5, min_trials: int = 3):
+        self.run_dir = run_dir
+        self.trial_id = trial_id
+        self.warmup_epochs = warmup_epochs
+        self.min_trials = min_trials
+        self.curve: List[float] = []
+
+    def _curve_path(self, trial_id: int) -> str:
+        return os.path.join(self.run_dir, f"trial_{trial_id}.json")
+
+    def report(self, epoch: int, val_loss: float):
+        best = min(val_loss, self.curve[-1]) if self.curve else val_loss
+        self.curve.append(best)
+
+        path = self._curve_path(self.trial_id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.curve, f)
+        os.replace(tmp_path, path)
+
+        if epoch < self.warmup_epochs:
+            return
+
+        others = []
+        for name in os.listdir(self.run_dir):
+            if not name.endswith('.json') or name == os.path.basename(path):
+                continue
+            try:
+                with open(os.path.join(self.run_dir, name), 'r') as f:
+                    curve = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if len(curve) >= epoch:
+                others.append(curve[epoch - 1])
+
+        if len(others) >= self.min_trials and best > float(np.median(others)):
+            raise TrialPruned(f"pruned at epoch {epoch}")
+
+
+# ---------------------------------------------------------------------------
+# Trials (run in the search's process pool)
+# ---------------------------------------------------------------------------
+
+def _lstm_trial(symbol: str, features_path: str, params: Dict, run_dir: str, trial_id: int, max_epochs: int) -> Dict:
+    """
+    Train one LSTM configuration with early stopping on the newest slice of
+    the training range; the score (used for pruning and ranking) is the MSE
+    (scaled) on the held-out split after it
+    """
+    import torch
+    from ml.data.feature_engineering import feature_engineer
+    from ml.predictors.lstm_price_predictor import LSTMPricePredictor
+    from ml.predictors.lstm_training import LSTM_DIRECT_HORIZONS
+    from ml.train_pipeline import load_feature_cache
+
+    seq_data = feature_engineer.prepare_lstm_sequences(
+        load_feature_cache(features_path), 60, 'price', LSTM_DIRECT_HORIZONS
+    )
+    X, y = seq_data['X'], seq_data['y']
+    split_idx = int(len(X) * 0.8)
+    stop_idx = int(split_idx * (1 - LSTM_STOPPING_FRACTION))
+
+    rule = MedianStoppingRule(run_dir, trial_id)
+    model_params, train_kwargs = split_lstm_params(params)
+    trainer = LSTMPricePredictor(horizons=LSTM_DIRECT_HORIZONS, model_params=model_params)
+    X_holdout = trainer._to_tensor(X[split_idx:])
+    y_holdout = trainer._to_tensor(y[split_idx:]).reshape(len(X) - split_idx, -1)
+
+    def holdout_loss() -> float:
+        trainer.model.eval()
+        with torch.no_grad():
+            return float(torch.nn.functional.mse_loss(trainer.model(X_holdout), y_holdout))
+
+    status = 'completed'
+    try:
+        history = trainer.train(
+            X[:stop_idx], y[:stop_idx],
+            X[stop_idx:split_idx], y[stop_idx:split_idx],
+            epochs=max_epochs,
+            seed=trial_id,
+            progress_callback=lambda progress: rule.report(progress['epoch'], holdout_loss()),
+            **train_kwargs
+        )
+        epochs_run = len(history['train_loss'])
+        # The restored best-stopping weights, scored on data stopping never saw
+        score = holdout_loss()
+    except TrialPruned:
+        status = 'pruned'
+        epochs_run = len(rule.curve)
+        score = rule.curve[-1]
+
+    return {'status': status, 'score': score, 'epochs': epochs_run, 'params': params}
+
+
+def _xgboost_trial(symbol: str, features_path: str, params: Dict, run_dir: str, trial_id: int, max_epochs: int) -> Dict:
+    """
+    Fit one XGBoost configuration with early stopping on the validation RMSE
+    (the newest slice of the training range; the test split is never seen);
+    the tuned n_estimators is the best iteration count
+    """
+    import xgboost as xgb
+    from ml.train_pipeline import xgboost_dataset
+
+    data = xgboost_dataset(features_path)
+    model = xgb.XGBRegressor(
+        **params,
+        n_estimators=XGBOOST_MAX_ROUNDS,
+        early_stopping_rounds=XGBOOST_EARLY_STOPPING_ROUNDS,
+        eval_metric='rmse',
+        random_state=42,
+        n_jobs=int(os.environ.get('OMP_NUM_THREADS', 1))
+    )
+    model.fit(data['X_fit'], data['y_fit'], eval_set=[(data['X_val'], data['y_val'])], verbose=False)
+
+    n_estimators = int(model.best_iteration) + 1
+    return {
+        'status': 'completed',
+        'score': float(model.best_score),
+        'epochs': n_estimators,
+        'params': {**params, 'n_estimators': n_estimators}
+    }
+
+
+TRIALS = {
+    'lstm': _lstm_trial,
+    'xgboost': _xgboost_trial,
+}
+
+
+# ---------------------------------------------------------------------------
+# Search
+# ---------------------------------------------------------------------------
+
+def search(
+    symbol: str,
+    model: str,
+    features_path: str,
+    n_trials: int = 20,
+    workers: Optional[int] = None,
+    seed: int = 0,
+    max_epochs: int = 50
+) -> Dict:
+    """
+    Run n_trials random configurations concurrently and persist the best one.
+
+    Args:
+        symbol: Crypto symbol
+        model: 'lstm' or 'xgboost'
+        features_path: The symbol's cached indicator frame (see train_pipeline)
+        n_trials: Configurations to try
+        workers: Worker processes (default: cores / 2)
+        seed: Seed for sampling configurations
+        max_epochs: LSTM epoch budget per trial
+
+    Returns:
+        Search summary with the best entry and per-trial outcomes
+    """
+    from ml.train_pipeline import _init_worker, partition_cpus
+
+    symbol = symbol.upper()
+    rng = np.random.default_rng(seed)
+    configs = [sample_params(SPACES[model], rng) for _ in range(n_trials)]
+
+    run_dir = os.path.join(TRIALS_DIR, f"{symbol}_{model}_{datetime.now().strftime('%Y%m%dT%H%M%S%f')}")
+    os.makedirs(run_dir)
+    cpus = partition_cpus(workers, n_trials)
+
+    trials = []
+    try:
+        with ProcessPoolExecutor(
+            max_workers=cpus['workers'],
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(cpus['threads'],)
+        ) as executor:
+            futures = {
+                executor.submit(TRIALS[model], symbol, features_path, params, run_dir, trial_id, max_epochs): trial_id
+                for trial_id, params in enumerate(configs)
+            }
+            for future in as_completed(futures):
+                trial_id = futures[future]
+                try:
+                    trial = future.result()
+                except Exception as e:
+                    trial = {'status': 'failed', 'error': str(e), 'params': configs[trial_id]}
+                trial['trial'] = trial_id
+                trials.append(trial)
+                print(f"  {symbol:<6} {model:<8} trial {trial_id:>3}: {trial['status']:<9} "
+                      f"score={trial.get('score', float('nan')):.6f}")
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+    completed = [t for t in trials if t['status'] == 'completed']
+    summary = {
+        'trials': len(trials),
+        'completed': len(completed),
+        'pruned': sum(t['status'] == 'pruned' for t in trials),
+        'failed': sum(t['status'] == 'failed' for t in trials),
+        'best': None
+    }
+    if completed:
+        best = min(completed, key=lambda t: t['score'])
+        summary['best'] = {
+            'params': best['params'],
+            'score': best['score'],
+            'metric': 'holdout_mse' if model == 'lstm' else 'val_rmse',
+            'trials': len(trials),
+            'searched_at': datetime.now().isoformat()
+        }
+        save_best_params(symbol, model, summary['best'])
+    return summary
+
+
+def main():
+    from ml.data.data_collector import CryptoDataCollector
+    from ml.train_pipeline import build_feature_cache, fetch_histories
+
+    parser = argparse.ArgumentParser(description="Hyperparameter search for the price models")
+    parser.add_argument('symbols', nargs='*', help="Symbols to tune (default: every symbol in the data collector)")
+    parser.add_argument('--model', choices=['lstm', 'xgboost', 'all'], default='all')
+    parser.add_argument('--trials', type=int, default=20, help="Configurations per symbol and model")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: cores / 2)")
+    parser.add_argument('--max-epochs', type=int, default=50, help="LSTM epoch budget per trial")
+    parser.add_argument('--days', type=int, default=365, help="Days of history to tune on")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    symbols = [s.upper() for s in args.symbols] or list(CryptoDataCollector.SYMBOL_MAP)
+    models = list(TRIALS) if args.model == 'all' else [args.model]
+
+    print("\n" + "=" * 60)
+    print(f"HYPERPARAMETER SEARCH: {', '.join(models)} x {len(symbols)} symbols, {args.trials} trials each")
+    print("=" * 60)
+
+    histories = asyncio.run(fetch_histories(symbols, args.days))
+    for symbol, history in histories.items():
+        if len(history) < 100:
+            print(f"  {symbol:<6} skipped: insufficient historical data")
+            continue
+        features_path = build_feature_cache(symbol, history)
+        for model in models:
+            summary = search(symbol, model, features_path, args.trials, args.workers, args.seed, args.max_epochs)
+            best = summary['best']
+            print(f"  {symbol:<6} {model:<8} best {best['metric']}={best['score']:.6f} "
+                  f"({summary['pruned']} pruned, {summary['failed']} failed)" if best else
+                  f"  {symbol:<6} {model:<8} no completed trials")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,6 +8,7 @@ import numpy as np
 from ml.nlp.sentiment_analyzer import crypto_sentiment_analyzer
 from ml.data.sentiment_generator import sentiment_generator
 from ml.data.news_fetcher import news_fetcher  # NEW: Real news API
+from ml.data.headline_store import headline_store
 
 
 class SentimentAggregator:
@@ -161,7 +162,11 @@ class SentimentAggregator:
         days: int = 30
     ) -> List[Dict]:
         """
-        Generate mock sentiment history for charting
+        Daily news sentiment history from the headline store for charting
+        
+        Days without headlines carry the previous day's score forward
+        (headline_count 0). Falls back to a random walk from the current
+        sentiment when nothing has been stored for the symbol yet.
         
         Args:
             symbol: Crypto symbol
@@ -172,6 +177,35 @@ class SentimentAggregator:
         """
         from datetime import datetime, timedelta
         
+        # Make sure today's headlines are in the store
+        self.news_fetcher.get_crypto_news(symbol)
+        stored = {
+            d['date']: d
+            for d in headline_store.daily_sentiment(self.news_fetcher.store_key(symbol), days)
+        }
+        if not stored:
+            return self._mock_history(symbol, days)
+        
+        history = []
+        for i in range(days + 1):
+            date = (datetime.utcnow() - timedelta(days=days - i)).strftime('%Y-%m-%d')
+            day = stored.get(date)
+            if day is None and not history:
+                continue
+            score = day['score'] if day else history[-1]['score']
+            history.append({
+                'date': date,
+                'score': round(score, 3),
+                'classification': self.analyzer.classify_sentiment(score),
+                'headline_count': day['headline_count'] if day else 0
+            })
+        
+        return history
+    
+    def _mock_history(self, symbol: str, days: int) -> List[Dict]:
+        """Random-walk history from the current sentiment (no stored headlines yet)"""
+        from datetime import datetime, timedelta
+        
         history = []
         
         # Start from current sentiment
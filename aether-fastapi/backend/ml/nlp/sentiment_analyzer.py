@@ -1,81 +1,20 @@
 """
 VADER Sentiment Analyzer for Cryptocurrency Text
-Wrapper around vaderSentiment with crypto-specific lexicon additions
+Crypto text preprocessing and classification on the shared VADER scorer
 """
 
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 from typing import Dict, List
 import re
 
+from ml.nlp.sentiment_scorer import sentiment_scorer
+
 
 class CryptoSentimentAnalyzer:
     """Sentiment analyzer optimized for cryptocurrency content"""
     
     def __init__(self):
-        self.analyzer = SentimentIntensityAnalyzer()
-        self._add_crypto_lexicon()
-    
-    def _add_crypto_lexicon(self):
-        """Add cryptocurrency-specific words to VADER lexicon"""
-        
-        # Positive crypto terms
-        crypto_positive = {
-            'moon': 3.5,
-            'mooning': 3.5,
-            'lambo': 3.0,
-            'hodl': 2.5,
-            'bullish': 3.0,
-            'pump': 25,
-            'rally': 2.8,
-            'breakout': 2.7,
-            'ath': 2.5,  # All-time high
-            'gem': 2.8,
-            'diamond': 2.5,
-            'stack': 2.0,
-            'accumulate': 2.2,
-            'adoption': 2.5,
-            'winner': 2.7,
-            'strong': 2.3
-        }
-        
-        # Negative crypto terms
-        crypto_negative = {
-            'rekt': -3.5,
-            'dump': -3.0,
-            'crash': -3.2,
-            'rugpull': -4.0,
-            'scam': -3.8,
-            'bearish': -2.8,
-            'fud': -2.5,  # Fear, Uncertainty, Doubt
-            'capitulation': -3.0,
-            'dead': -3.5,
-            'failed': -3.0,
-            'hack': -3.5,
-            'exploit': -3.3,
-            'concern': -2.0,
-            'panic': -2.8,
-            'selloff': -2.7
-        }
-        
-        # Neutral/context-dependent
-        crypto_neutral = {
-            'volatile': -0.5,  # Slightly negative
-            'dip': -1.5,  # Often seen as buying opportunity
-            'correction': -1.0,
-            'consolidation': 0.0,
-            'sideways': 0.0,
-            'range': 0.0
-        }
-        
-        # Combine all lexicons
-        crypto_lexicon = {
-            **crypto_positive,
-            **crypto_negative,
-            **crypto_neutral
-        }
-        
-        # Update VADER lexicon
-        self.analyzer.lexicon.update(crypto_lexicon)
+        # Shared process-wide analyzer (finance + crypto lexicon) with memoized scores
+        self.scorer = sentiment_scorer
     
     def analyze_text(self, text: str) -> Dict:
         """
@@ -87,19 +26,31 @@ class CryptoSentimentAnalyzer:
         Returns:
             Dict with compound, pos, neu, neg scores
         """
-        # Preprocess text
-        text = self._preprocess (text)
-        
-        # Get VADER scores
-        scores = self.analyzer.polarity_scores(text)
+        return self.analyze_batch([text])[0]
+    
+    def analyze_batch(self, texts: List[str]) -> List[Dict]:
+        """
+        Analyze many texts in one memoized batch
         
-        return {
-            'compound': scores['compound'],  # Overall sentiment [-1, 1]
-            'positive': scores['pos'],
-            'neutral': scores['neu'],
-            'negative': scores['neg'],
-            'classification': self.classify_sentiment(scores['compound'])
-        }
+        Args:
+            texts: Input texts
+            
+        Returns:
+            One analyze_text() dict per text, in order
+        """
+        # Preprocess, then get VADER scores (already-seen texts are memo lookups)
+        all_scores = self.scorer.polarity_batch([self._preprocess(text) for text in texts])
+        
+        return [
+            {
+                'compound': scores['compound'],  # Overall sentiment [-1, 1]
+                'positive': scores['pos'],
+                'neutral': scores['neu'],
+                'negative': scores['neg'],
+                'classification': self.classify_sentiment(scores['compound'])
+            }
+            for scores in all_scores
+        ]
     
     def _preprocess(self, text: str) -> str:
         """Preprocess text for better sentiment analysis"""
@@ -162,8 +113,8 @@ class CryptoSentimentAnalyzer:
                 'individual_scores': []
             }
         
-        # Analyze each text
-        results = [self.analyze_text(text) for text in texts]
+        # Analyze all texts in one batch
+        results = self.analyze_batch(texts)
         
         # Calculate averages
         avg_compound = sum(r['compound'] for r in results) / len(results)
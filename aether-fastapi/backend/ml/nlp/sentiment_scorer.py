@@ -0,0 +1,220 @@
+"""
+Shared Sentiment Scorer
+One VADER analyzer per process with the merged finance + crypto lexicon, and memoized batch scoring
+"""
+
+import os
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List
+
+try:
+    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+except ImportError:
+    SentimentIntensityAnalyzer = None
+
+MEMO_PATH = os.path.join(os.path.dirname(__file__), '../cache/news/sentiment_scores.db')
+# In-memory memo entries per process (~200 bytes each)
+MEMO_SIZE = 50000
+# Hashes per SQL lookup (SQLite's bound-parameter limit is 999 on older builds)
+LOOKUP_CHUNK = 500
+
+# Stock-market terms
+FINANCE_LEXICON = {
+    'bullish': 2.5, 'bearish': -2.5, 'rally': 2.0, 'crash': -3.0,
+    'surge': 2.5, 'plunge': -2.8, 'beat': 1.5, 'miss': -1.5,
+    'upgrade': 2.0, 'downgrade': -2.0, 'outperform': 1.8,
+    'underperform': -1.8, 'buy': 1.5, 'sell': -1.5, 'hold': 0.2,
+    'breakout': 2.0, 'breakdown': -2.0, 'overweight': 1.5,
+    'underweight': -1.5, 'recession': -2.5, 'growth': 1.5,
+    'layoffs': -2.0, 'hiring': 1.3, 'dividend': 1.0,
+    'bankruptcy': -3.5, 'acquisition': 1.2, 'lawsuit': -1.5,
+    'innovation': 1.5, 'disruption': 1.0, 'regulation': -0.8,
+}
+
+# Crypto slang (generic market words such as 'bullish' and 'rally' use the finance values)
+CRYPTO_LEXICON = {
+    # Positive
+    'moon': 3.5, 'mooning': 3.5, 'lambo': 3.0, 'hodl': 2.5, 'pump': 2.5,
+    'ath': 2.5,  # All-time high
+    'gem': 2.8, 'diamond': 2.5, 'stack': 2.0, 'accumulate': 2.2,
+    'adoption': 2.5, 'winner': 2.7, 'strong': 2.3,
+    # Negative
+    'rekt': -3.5, 'dump': -3.0, 'rugpull': -4.0, 'scam': -3.8,
+    'fud': -2.5,  # Fear, Uncertainty, Doubt
+    'capitulation': -3.0, 'dead': -3.5, 'failed': -3.0, 'hack': -3.5,
+    'exploit': -3.3, 'concern': -2.0, 'panic': -2.8, 'selloff': -2.7,
+    # Neutral/context-dependent
+    'volatile': -0.5, 'dip': -1.5, 'correction': -1.0,
+    'consolidation': 0.0, 'sideways': 0.0, 'range': 0.0,
+}
+
+LEXICON = {**CRYPTO_LEXICON, **FINANCE_LEXICON}
+# Part of every memo key, so editing the lexicon invalidates stored scores
+LEXICON_VERSION = hashlib.sha1(repr(sorted(LEXICON.items())).encode('utf-8')).hexdigest()[:12]
+
+NEUTRAL = {'neg': 0.0, 'neu': 1.0, 'pos': 0.0, 'compound': 0.0}
+
+
+class SentimentScorer:
+    """
+    VADER polarity scores memoized by content hash
+
+    Lookups go to a bounded in-process LRU first, then to a SQLite memo
+    shared by every worker; only texts neither has seen are scored, in one
+    batch, and written back to both. The analyzer (and its ~7,500-word
+    lexicon) is built once per process on first use.
+    """
+
+    def __init__(self, memo_path: str = MEMO_PATH, memo_size: int = MEMO_SIZE):
+        self.memo_path = memo_path
+        self.memo_size = memo_size
+        self._memo: "OrderedDict[str, Dict[str, float]]" = OrderedDict()
+        self._memo_lock = threading.Lock()
+        self._analyzer = None
+        self._analyzer_lock = threading.Lock()
+        self._local = threading.local()
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    @property
+    def analyzer(self):
+        """The process-wide VADER analyzer (None when vaderSentiment is not installed)"""
+        if self._analyzer is None and SentimentIntensityAnalyzer is not None:
+            with self._analyzer_lock:
+                if self._analyzer is None:
+                    analyzer = SentimentIntensityAnalyzer()
+                    analyzer.lexicon.update(LEXICON)
+                    self._analyzer = analyzer
+        return self._analyzer
+
+    def polarity(self, text: str) -> Dict[str, float]:
+        """VADER scores (neg, neu, pos, compound) for one text"""
+        return self.polarity_batch([text])[0]
+
+    def compound(self, text: str) -> float:
+        """VADER compound score [-1, 1] for one text"""
+        return self.polarity(text)['compound']
+
+    def compound_batch(self, texts: List[str]) -> List[float]:
+        """Compound scores for many texts, in order"""
+        return [scores['compound'] for scores in self.polarity_batch(texts)]
+
+    def polarity_batch(self, texts: List[str]) -> List[Dict[str, float]]:
+        """
+        VADER scores for many texts, in order
+
+        Duplicates are scored once; empty texts are neutral.
+        """
+        keys = [self._key(text) if text else None for text in texts]
+        found = self._memo_get({k for k in keys if k is not None})
+
+        missing = {k: t for k, t in zip(keys, texts) if k is not None and k not in found}
+        if missing:
+            stored = self._stored_get(list(missing))
+            found.update(stored)
+            new = {k: self._score(t) for k, t in missing.items() if k not in stored}
+            if new:
+                found.update(new)
+                self._stored_put(new)
+            self._memo_put({k: found[k] for k in missing})
+
+        return [dict(found[k]) if k is not None else dict(NEUTRAL) for k in keys]
+
+    def stats(self) -> Dict:
+        """Memo sizes and the lexicon version"""
+        try:
+            stored = self._connect().execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+        except sqlite3.Error:
+            stored = None
+        return {
+            "memory_entries": len(self._memo),
+            "stored_entries": stored,
+            "lexicon_version": LEXICON_VERSION,
+            "lexicon_size": len(self.analyzer.lexicon) if self.analyzer else 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Scoring and memo layers
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return hashlib.sha1(f"{LEXICON_VERSION}\0{text}".encode('utf-8')).hexdigest()
+
+    def _score(self, text: str) -> Dict[str, float]:
+        if self.analyzer is None:
+            return dict(NEUTRAL)
+        return self.analyzer.polarity_scores(text)
+
+    def _memo_get(self, keys) -> Dict[str, Dict[str, float]]:
+        found = {}
+        with self._memo_lock:
+            for key in keys:
+                scores = self._memo.get(key)
+                if scores is not None:
+                    self._memo.move_to_end(key)
+                    found[key] = scores
+        return found
+
+    def _memo_put(self, entries: Dict[str, Dict[str, float]]):
+        with self._memo_lock:
+            self._memo.update(entries)
+            for key in entries:
+                self._memo.move_to_end(key)
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.memo_path), exist_ok=True)
+            conn = sqlite3.connect(self.memo_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS scores ("
+                "key TEXT PRIMARY KEY, neg REAL, neu REAL, pos REAL, compound REAL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def _stored_get(self, keys: List[str]) -> Dict[str, Dict[str, float]]:
+        # The persistent memo is an optimization; a locked or unwritable file just means rescoring
+        found = {}
+        try:
+            conn = self._connect()
+            for start in range(0, len(keys), LOOKUP_CHUNK):
+                chunk = keys[start:start + LOOKUP_CHUNK]
+                rows = conn.execute(
+                    f"SELECT key, neg, neu, pos, compound FROM scores WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk
+                )
+                for key, neg, neu, pos, compound in rows:
+                    found[key] = {'neg': neg, 'neu': neu, 'pos': pos, 'compound': compound}
+        except (sqlite3.Error, OSError):
+            pass
+        return found
+
+    def _stored_put(self, entries: Dict[str, Dict[str, float]]):
+        try:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT OR IGNORE INTO scores VALUES (?, ?, ?, ?, ?)",
+                [(k, s['neg'], s['neu'], s['pos'], s['compound']) for k, s in entries.items()]
+            )
+            conn.execute("COMMIT")
+        except (sqlite3.Error, OSError):
+            try:
+                self._connect().execute("ROLLBACK")
+            except (sqlite3.Error, OSError):
+                pass
+
+
+# Singleton instance
+sentiment_scorer = SentimentScorer()
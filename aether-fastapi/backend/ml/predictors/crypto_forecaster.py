@@ -4,18 +4,59 @@ Time-series prediction for cryptocurrency prices with confidence intervals
 """
 
 from prophet import Prophet
+from prophet.serialize import model_to_json, model_from_json
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 import logging
 import asyncio
 
 from ml.data.data_collector import data_collector
+from ml.process_pool import get_process_pool
 
 logger = logging.getLogger(__name__)
 
 
+def _build_prophet_model() -> Prophet:
+    """Prophet configured with the tuned settings for realistic crypto predictions"""
+    model = Prophet(
+        yearly_seasonality=False,  # Crypto doesn't follow yearly patterns
+        weekly_seasonality=True,   # Crypto has weekly trading patterns
+        daily_seasonality=False,   # Too noisy for daily
+        changepoint_prior_scale=0.15,  # More responsive to recent trend changes (was 0.03)
+        seasonality_prior_scale=5.0,   # Allow moderate seasonality influence
+        interval_width=0.95,           # 95% confidence interval
+        changepoint_range=0.9,         # Allow changepoints in more recent data
+        mcmc_samples=0  # Faster inference
+    )
+    
+    # Add custom monthly seasonality for crypto market cycles
+    model.add_seasonality(name='monthly', period=30.5, fourier_order=3)
+    return model
+
+
+def _forecast_endpoints(model: Prophet, horizons: List[int]) -> Dict[int, Tuple[float, float, float]]:
+    """(yhat, lower, upper) at each horizon from a single forecast over the longest one"""
+    max_horizon = max(horizons)
+    forecast = model.predict(model.make_future_dataframe(periods=max_horizon))
+    endpoints = {}
+    for days in horizons:
+        row = forecast.iloc[len(forecast) - 1 - (max_horizon - days)]
+        endpoints[days] = (float(row["yhat"]), float(row["yhat_lower"]), float(row["yhat_upper"]))
+    return endpoints
+
+
+def _fit_and_forecast(prophet_df: pd.DataFrame, horizons: List[int]) -> Dict:
+    """Fit Prophet and forecast every horizon (runs in a pool worker)"""
+    model = _build_prophet_model()
+    model.fit(prophet_df)
+    return {
+        "model_json": model_to_json(model),
+        "endpoints": _forecast_endpoints(model, horizons)
+    }
+
+
 class CryptoPriceForecaster:
     """
     ML-based cryptocurrency price forecaster using Facebook Prophet.
@@ -31,6 +72,10 @@ class CryptoPriceForecaster:
         self.models: Dict[str, Prophet] = {}
         self.last_trained: Dict[str, datetime] = {}
         self.cache_duration_hours = 6  # Retrain if older than this
+        self._train_locks: Dict[str, asyncio.Lock] = {}
+        # Portfolio predictions: {(user, days_ahead, data_version): (timestamp, predictions)}
+        self._portfolio_cache: Dict[Tuple, Tuple[datetime, List[Dict]]] = {}
+        self.portfolio_cache_minutes = 5  # Matches the 7-day price data cache
     
     def _needs_retraining(self, symbol: str) -> bool:
         """Check if model needs retraining based on cache duration"""
@@ -39,6 +84,21 @@ class CryptoPriceForecaster:
         elapsed = datetime.now() - self.last_trained[symbol]
         return elapsed.total_seconds() > (self.cache_duration_hours * 3600)
     
+    async def _ensure_model(self, symbol: str, force_retrain: bool = False) -> bool:
+        """
+        Train the symbol's model if it is missing or stale. Concurrent callers
+        for the same symbol wait on one training run instead of each fitting.
+        """
+        if not force_retrain and not self._needs_retraining(symbol):
+            return True
+        
+        lock = self._train_locks.setdefault(symbol, asyncio.Lock())
+        async with lock:
+            # Another request may have finished training while we waited
+            if not force_retrain and not self._needs_retraining(symbol):
+                return True
+            return await self.train_model(symbol)
+    
     def _prepare_prophet_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Convert historical data to Prophet format
@@ -75,24 +135,11 @@ class CryptoPriceForecaster:
         # Prepare data for Prophet
         prophet_df = self._prepare_prophet_data(df)
         
-        # Initialize Prophet with tuned settings for realistic crypto predictions
-        model = Prophet(
-            yearly_seasonality=False,  # Crypto doesn't follow yearly patterns
-            weekly_seasonality=True,   # Crypto has weekly trading patterns
-            daily_seasonality=False,   # Too noisy for daily
-            changepoint_prior_scale=0.15,  # More responsive to recent trend changes (was 0.03)
-            seasonality_prior_scale=5.0,   # Allow moderate seasonality influence
-            interval_width=0.95,           # 95% confidence interval
-            changepoint_range=0.9,         # Allow changepoints in more recent data
-            mcmc_samples=0  # Faster inference
-        )
-        
-        # Add custom monthly seasonality for crypto market cycles
-        model.add_seasonality(name='monthly', period=30.5, fourier_order=3)
+        model = _build_prophet_model()
         
         try:
-            # Train the model (suppress Prophet's verbose output)
-            model.fit(prophet_df)
+            # Train the model off the event loop (fitting takes seconds)
+            await asyncio.to_thread(model.fit, prophet_df)
             
             # Store model
             self.models[symbol] = model
@@ -104,21 +151,88 @@ class CryptoPriceForecaster:
         except Exception as e:
             logger.error(f"Training failed for {symbol}: {str(e)}")
             return False
+    
+    def _summarize_prediction(
+        self,
+        symbol: str,
+        days_ahead: int,
+        actual_current_price: float,
+        predicted_price: float,
+        confidence_lower: float,
+        confidence_upper: float
+    ) -> Dict:
+        """
+        Turn a raw Prophet forecast into the API prediction: blend toward the
+        current price, cap extreme moves and classify the trend
+        """
+        # Mean-reversion blending: prevent extreme extrapolation for longer horizons
+        # Short-term: trust model more; Long-term: blend toward current price
+        if days_ahead <= 3:
+            model_weight = 0.85
+        elif days_ahead <= 7:
+            model_weight = 0.70
+        elif days_ahead <= 14:
+            model_weight = 0.60
+        else:
+            model_weight = 0.50  # 30-day predictions blend 50/50 with current price
+        
+        # Blend prediction with current price for stability
+        blended_price = (model_weight * predicted_price) + ((1 - model_weight) * actual_current_price)
+        
+        # Also blend confidence bounds
+        blended_lower = (model_weight * confidence_lower) + ((1 - model_weight) * actual_current_price)
+        blended_upper = (model_weight * confidence_upper) + ((1 - model_weight) * actual_current_price)
+        
+        predicted_price = blended_price
+        confidence_lower = blended_lower
+        confidence_upper = blended_upper
+        
+        # Calculate metrics using actual current price
+        absolute_change = predicted_price - actual_current_price
+        percent_change = (absolute_change / actual_current_price) * 100 if actual_current_price > 0 else 0
+        
+        # Validation: cap extreme predictions (±30% max per horizon)
+        max_change = min(30, days_ahead * 2)  # Scale cap with horizon
+        if abs(percent_change) > max_change:
+            logger.warning(f"Extreme prediction detected for {symbol}: {percent_change:.1f}%, capping to ±{max_change}%")
+            percent_change = np.clip(percent_change, -max_change, max_change)
+            predicted_price = actual_current_price * (1 + percent_change/100)
+            # Recalculate confidence bounds
+            range_width = confidence_upper - confidence_lower
+            confidence_lower = predicted_price - range_width/2
+            confidence_upper = predicted_price + range_width/2
+        
+        # Determine trend
+        if percent_change > 5:
+            trend = "bullish"
+            trend_confidence = min(85, 50 + abs(percent_change))
+        elif percent_change < -5:
+            trend = "bearish"
+            trend_confidence = min(85, 50 + abs(percent_change))
+        else:
+            trend = "neutral"
+            trend_confidence = 60
+        
+        # Calculate volatility from prediction interval
+        prediction_range = confidence_upper - confidence_lower
+        volatility_score = (prediction_range / predicted_price) * 100 if predicted_price > 0 else 0
         
-        try:
-            # Train the model (suppress Prophet's verbose output)
-            model.fit(prophet_df)
-            
-            # Store model
-            self.models[symbol] = model
-            self.last_trained[symbol] = datetime.now()
-            
-            logger.info(f"Successfully trained model for {symbol}")
-            return True
-        
-        except Exception as e:
-            logger.error(f"Training failed for {symbol}: {str(e)}")
-            return False
+        return {
+            "symbol": symbol,
+            "current_price": round(actual_current_price, 2),
+            "predicted_price": round(predicted_price, 2),
+            "confidence_lower": round(confidence_lower, 2),
+            "confidence_upper": round(confidence_upper, 2),
+            "absolute_change": round(absolute_change, 2),
+            "percent_change": round(percent_change, 2),
+            "prediction_date": (datetime.now() + timedelta(days=days_ahead)).strftime("%Y-%m-%d"),
+            "days_ahead": days_ahead,
+            "trend": trend,
+            "trend_confidence": round(trend_confidence, 1),
+            "volatility_score": round(volatility_score, 2),
+            "model_trained_at": self.last_trained.get(symbol, datetime.now()).isoformat(),
+            "confidence_interval": 95  # 95% CI
+        }
     
     async def predict(
         self,
@@ -140,10 +254,8 @@ class CryptoPriceForecaster:
         symbol = symbol.upper().strip()
         
         # Check if we need to train/retrain
-        if force_retrain or self._needs_retraining(symbol):
-            success = await self.train_model(symbol)
-            if not success:
-                return None
+        if not await self._ensure_model(symbol, force_retrain):
+            return None
         
         model = self.models.get(symbol)
         if model is None:
@@ -156,85 +268,13 @@ class CryptoPriceForecaster:
                 return None
             actual_current_price = float(df['price'].iloc[-1])
             
-            # Create future dataframe
-            future = model.make_future_dataframe(periods=days_ahead)
-            forecast = model.predict(future)
-            
-            # Get predicted value (last row is the furthest prediction)
-            predicted_row = forecast.iloc[-1]
+            endpoints = await asyncio.to_thread(_forecast_endpoints, model, [days_ahead])
+            predicted_price, confidence_lower, confidence_upper = endpoints[days_ahead]
             
-            predicted_price = float(predicted_row["yhat"])
-            confidence_lower = float(predicted_row["yhat_lower"])
-            confidence_upper = float(predicted_row["yhat_upper"])
-            
-            # Mean-reversion blending: prevent extreme extrapolation for longer horizons
-            # Short-term: trust model more; Long-term: blend toward current price
-            if days_ahead <= 3:
-                model_weight = 0.85
-            elif days_ahead <= 7:
-                model_weight = 0.70
-            elif days_ahead <= 14:
-                model_weight = 0.60
-            else:
-                model_weight = 0.50  # 30-day predictions blend 50/50 with current price
-            
-            # Blend prediction with current price for stability
-            blended_price = (model_weight * predicted_price) + ((1 - model_weight) * actual_current_price)
-            
-            # Also blend confidence bounds
-            blended_lower = (model_weight * confidence_lower) + ((1 - model_weight) * actual_current_price)
-            blended_upper = (model_weight * confidence_upper) + ((1 - model_weight) * actual_current_price)
-            
-            predicted_price = blended_price
-            confidence_lower = blended_lower
-            confidence_upper = blended_upper
-            
-            # Calculate metrics using actual current price
-            absolute_change = predicted_price - actual_current_price
-            percent_change = (absolute_change / actual_current_price) * 100 if actual_current_price > 0 else 0
-            
-            # Validation: cap extreme predictions (±30% max per horizon)
-            max_change = min(30, days_ahead * 2)  # Scale cap with horizon
-            if abs(percent_change) > max_change:
-                logger.warning(f"Extreme prediction detected for {symbol}: {percent_change:.1f}%, capping to ±{max_change}%")
-                percent_change = np.clip(percent_change, -max_change, max_change)
-                predicted_price = actual_current_price * (1 + percent_change/100)
-                # Recalculate confidence bounds
-                range_width = confidence_upper - confidence_lower
-                confidence_lower = predicted_price - range_width/2
-                confidence_upper = predicted_price + range_width/2
-            
-            # Determine trend
-            if percent_change > 5:
-                trend = "bullish"
-                trend_confidence = min(85, 50 + abs(percent_change))
-            elif percent_change < -5:
-                trend = "bearish"
-                trend_confidence = min(85, 50 + abs(percent_change))
-            else:
-                trend = "neutral"
-                trend_confidence = 60
-            
-            # Calculate volatility from prediction interval
-            prediction_range = confidence_upper - confidence_lower
-            volatility_score = (prediction_range / predicted_price) * 100 if predicted_price > 0 else 0
-            
-            return {
-                "symbol": symbol,
-                "current_price": round(actual_current_price, 2),
-                "predicted_price": round(predicted_price, 2),
-                "confidence_lower": round(confidence_lower, 2),
-                "confidence_upper": round(confidence_upper, 2),
-                "absolute_change": round(absolute_change, 2),
-                "percent_change": round(percent_change, 2),
-                "prediction_date": (datetime.now() + timedelta(days=days_ahead)).strftime("%Y-%m-%d"),
-                "days_ahead": days_ahead,
-                "trend": trend,
-                "trend_confidence": round(trend_confidence, 1),
-                "volatility_score": round(volatility_score, 2),
-                "model_trained_at": self.last_trained.get(symbol, datetime.now()).isoformat(),
-                "confidence_interval": 95  # 95% CI
-            }
+            return self._summarize_prediction(
+                symbol, days_ahead, actual_current_price,
+                predicted_price, confidence_lower, confidence_upper
+            )
         
         except Exception as e:
             logger.error(f"Prediction failed for {symbol}: {str(e)}")
@@ -282,10 +322,8 @@ class CryptoPriceForecaster:
         symbol = symbol.upper().strip()
         
         # Ensure model is trained
-        if self._needs_retraining(symbol):
-            success = await self.train_model(symbol)
-            if not success:
-                return []
+        if not await self._ensure_model(symbol):
+            return []
         
         model = self.models.get(symbol)
         if model is None:
@@ -373,42 +411,157 @@ class CryptoPriceForecaster:
             "days_ahead": days_ahead
         }
 
+    def _portfolio_data_version(self, holdings: List[Dict]) -> Optional[Tuple]:
+        """
+        Version of the inputs behind a portfolio prediction: the holdings and
+        the training time of each symbol's model. None if any model is stale.
+        """
+        version = []
+        for holding in sorted(holdings, key=lambda h: h.get("symbol", "").upper()):
+            symbol = holding.get("symbol", "").upper()
+            if self._needs_retraining(symbol):
+                return None
+            version.append((symbol, float(holding.get("quantity", 0)), self.last_trained[symbol].isoformat()))
+        return tuple(version)
+    
     async def get_portfolio_predictions(
         self,
         holdings: List[Dict],
-        days_ahead: int = 30
+        days_ahead: int = 30,
+        user_id: Optional[str] = None
     ) -> List[Dict]:
         """
         Generate predictions for a user's crypto portfolio
         
+        Holdings are predicted concurrently. When user_id is given, the result
+        is cached per (user, horizon, data version) for a few minutes.
+        
         Args:
             holdings: List of holdings with 'symbol' and 'quantity' keys
             days_ahead: Forecast horizon
+            user_id: Cache results for this user (optional)
         
         Returns:
             List of predictions with portfolio context
         """
-        predictions = []
+        if user_id is not None:
+            version = self._portfolio_data_version(holdings)
+            if version is not None:
+                cached = self._portfolio_cache.get((user_id, days_ahead, version))
+                if cached and (datetime.now() - cached[0]).total_seconds() < self.portfolio_cache_minutes * 60:
+                    return [dict(p) for p in cached[1]]
+        
+        results = await asyncio.gather(*(
+            self.predict(holding.get("symbol", "").upper(), days_ahead=days_ahead)
+            for holding in holdings
+        ))
         
-        for holding in holdings:
-            symbol = holding.get("symbol", "").upper()
+        predictions = []
+        for holding, prediction in zip(holdings, results):
+            if not prediction:
+                continue
             quantity = float(holding.get("quantity", 0))
             
-            prediction = await self.predict(symbol, days_ahead=days_ahead)
+            # Add portfolio context
+            current_value = prediction["current_price"] * quantity
+            predicted_value = prediction["predicted_price"] * quantity
             
-            if prediction:
-                # Add portfolio context
-                current_value = prediction["current_price"] * quantity
-                predicted_value = prediction["predicted_price"] * quantity
-                
-                prediction["quantity"] = quantity
-                prediction["current_value"] = round(current_value, 2)
-                prediction["predicted_value"] = round(predicted_value, 2)
-                prediction["value_change"] = round(predicted_value - current_value, 2)
-                
-                predictions.append(prediction)
-        
-        return predictions
+            prediction["quantity"] = quantity
+            prediction["current_value"] = round(current_value, 2)
+            prediction["predicted_value"] = round(predicted_value, 2)
+            prediction["value_change"] = round(predicted_value - current_value, 2)
+            
+            predictions.append(prediction)
+        
+        if user_id is not None:
+            # Models trained during this call change the version, so key on the post-call state
+            version = self._portfolio_data_version(holdings)
+            if version is not None:
+                self._portfolio_cache = {
+                    key: entry for key, entry in self._portfolio_cache.items() if key[0] != user_id or key[1] != days_ahead
+                }
+                self._portfolio_cache[(user_id, days_ahead, version)] = (datetime.now(), predictions)
+        
+        return [dict(p) for p in predictions]
+    
+    async def predict_batch(
+        self,
+        symbols: List[str],
+        horizons: Optional[List[int]] = None
+    ) -> AsyncIterator[Dict]:
+        """
+        Predict many symbols at several horizons, yielding each symbol's
+        results as soon as its model is ready.
+        
+        Histories are fetched concurrently; symbols without a fresh model are
+        fitted in the shared process pool (one fit covers every horizon) and
+        the fitted models are kept for later single-symbol requests.
+        
+        Args:
+            symbols: Crypto symbols (e.g. ["BTC", "ETH"])
+            horizons: Forecast horizons in days (default: [30])
+        
+        Yields:
+            Dicts with 'symbol', 'days_ahead', 'status' and either 'data'
+            (same shape as predict()) or 'detail' on failure
+        """
+        symbols = list(dict.fromkeys(s.upper().strip() for s in symbols if s.strip()))
+        horizons = sorted(set(horizons or [30]))
+        
+        histories, recent = await asyncio.gather(
+            asyncio.gather(*(data_collector.fetch_historical_data(s, days=365) for s in symbols)),
+            asyncio.gather(*(data_collector.fetch_historical_data(s, days=7) for s in symbols))
+        )
+        
+        def lines(symbol, current_price, endpoints):
+            return [
+                {
+                    "symbol": symbol,
+                    "days_ahead": days,
+                    "status": "success",
+                    "data": self._summarize_prediction(symbol, days, current_price, *endpoints[days])
+                }
+                for days in horizons
+            ]
+        
+        def errors(symbol, detail):
+            return [
+                {"symbol": symbol, "days_ahead": days, "status": "error", "detail": detail}
+                for days in horizons
+            ]
+        
+        async def fit_in_pool(symbol, prophet_df, current_price):
+            loop = asyncio.get_running_loop()
+            try:
+                result = await loop.run_in_executor(get_process_pool(), _fit_and_forecast, prophet_df, horizons)
+            except Exception as e:
+                logger.error(f"Batch training failed for {symbol}: {str(e)}")
+                return errors(symbol, f"Training failed for {symbol}")
+            
+            # Deserializing rebuilds the Stan backend; keep it off the event loop
+            self.models[symbol] = await asyncio.to_thread(model_from_json, result["model_json"])
+            self.last_trained[symbol] = datetime.now()
+            return lines(symbol, current_price, result["endpoints"])
+        
+        pending = []
+        for symbol, df, recent_df in zip(symbols, histories, recent):
+            if df is None or len(df) < 30 or recent_df is None or len(recent_df) == 0:
+                for line in errors(symbol, f"Insufficient data for {symbol}"):
+                    yield line
+                continue
+            
+            current_price = float(recent_df['price'].iloc[-1])
+            model = self.models.get(symbol)
+            if model is not None and not self._needs_retraining(symbol):
+                endpoints = await asyncio.to_thread(_forecast_endpoints, model, horizons)
+                for line in lines(symbol, current_price, endpoints):
+                    yield line
+            else:
+                pending.append(fit_in_pool(symbol, self._prepare_prophet_data(df), current_price))
+        
+        for finished in asyncio.as_completed(pending):
+            for line in await finished:
+                yield line
 
 
 # Singleton instance
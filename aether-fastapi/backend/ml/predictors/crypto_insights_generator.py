@@ -4,7 +4,6 @@ Generates actionable portfolio insights for cryptocurrency holdings
 """
 
 from google import genai
-import pandas as pd
 import numpy as np
 import os
 import json
@@ -13,7 +12,8 @@ import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 
-from ml.data.data_collector import data_collector
+from ml.data import indicators
+from ml.data.feature_store import feature_store
 
 logger = logging.getLogger(__name__)
 
@@ -44,11 +44,14 @@ class CryptoInsightsGenerator:
             Dict mapping symbol to metrics (price, momentum, volatility, etc.)
         """
         context = {}
+        entries = await feature_store.get_many(symbols)
 
         for symbol in symbols:
             try:
-                df = await data_collector.fetch_historical_data(symbol, days=90)
-                if df is None or len(df) < 7:
+                if symbol.upper() not in entries:
+                    continue
+                df = await feature_store.live_history(symbol, 90)
+                if len(df) < 7:
                     continue
 
                 prices = df['price'].values
@@ -62,19 +65,15 @@ class CryptoInsightsGenerator:
                 month_change = ((current_price - month_ago) / month_ago) * 100
 
                 # Volatility (annualized)
-                daily_returns = pd.Series(prices).pct_change().dropna()
-                volatility = float(daily_returns.std() * np.sqrt(365) * 100)
+                daily_returns = indicators.pct_change(prices)[1:]
+                volatility = float(np.std(daily_returns, ddof=1) * np.sqrt(365) * 100)
 
                 # Moving averages
-                sma_7 = float(pd.Series(prices).rolling(7, min_periods=1).mean().iloc[-1])
-                sma_30 = float(pd.Series(prices).rolling(30, min_periods=1).mean().iloc[-1])
+                sma_7 = float(indicators.sma(prices, 7, min_periods=1)[-1])
+                sma_30 = float(indicators.sma(prices, 30, min_periods=1)[-1])
 
                 # RSI (14-day)
-                delta = pd.Series(prices).diff()
-                gain = delta.where(delta > 0, 0).rolling(14, min_periods=1).mean()
-                loss = (-delta.where(delta < 0, 0)).rolling(14, min_periods=1).mean()
-                rs = gain / loss.replace(0, 1e-10)
-                rsi = float((100 - (100 / (1 + rs))).iloc[-1])
+                rsi = float(indicators.rsi(prices, 14, smoothing='sma', min_periods=1)[-1])
 
                 # 90-day high/low
                 high_90d = float(max(prices))
@@ -388,7 +388,8 @@ async def generate_on_chain_insights(
 
 async def generate_all_insights(
     holdings: List[Dict],
-    days_ahead: int = 30
+    days_ahead: int = 30,
+    predictions: Optional[List[Dict]] = None
 ) -> List[Dict]:
     """
     Generate all AI insights for a user's portfolio
@@ -396,6 +397,7 @@ async def generate_all_insights(
     Args:
         holdings: User's crypto holdings with symbol, quantity, purchase_price_avg, current_price
         days_ahead: Forecast horizon for predictions
+        predictions: Portfolio predictions already computed by the caller (fetched if omitted)
     
     Returns:
         Sorted list of insights (highest priority first)
@@ -403,7 +405,8 @@ async def generate_all_insights(
     all_insights = []
     
     # Get ML predictions for holdings
-    predictions = await crypto_forecaster.get_portfolio_predictions(holdings, days_ahead)
+    if predictions is None:
+        predictions = await crypto_forecaster.get_portfolio_predictions(holdings, days_ahead)
     
     # Generate different types of insights
     price_insights = await generate_price_prediction_insights(predictions)
@@ -0,0 +1,235 @@
+"""
+LSTM Model Pool
+Loads each symbol's LSTM once and shares it across requests, with LRU eviction and hot reload
+"""
+
+import os
+import time
+import threading
+import numpy as np
+import torch
+from typing import Dict, List, Optional
+import logging
+
+from ml.predictors.lstm_price_predictor import LSTMPriceModel, build_model, bundle_mtime, load_bundle, predict_horizons
+from ml.predictors.lstm_runtime import compiled_artifact_path, configure_inference_threads, load_compiled
+
+logger = logging.getLogger(__name__)
+
+
+def artifact_mtime(symbol: str) -> float:
+    """Newest modification time across a symbol's active bundle and compiled model"""
+    mtime = bundle_mtime(symbol)
+    if mtime is None:
+        raise FileNotFoundError(f"No LSTM artifact for {symbol}")
+    compiled_path = compiled_artifact_path(symbol)
+    if os.path.exists(compiled_path):
+        mtime = max(mtime, os.path.getmtime(compiled_path))
+    return mtime
+
+
+class LSTMInferenceModel:
+    """
+    Read-only inference bundle for one symbol: weights, scaler and feature
+    layout travel together, so a request can never mix two symbols' state.
+    """
+
+    __slots__ = ('symbol', 'model', 'scaler', 'feature_columns', 'sequence_length', 'horizons',
+                 'device', 'trained_at', 'artifact_mtime', 'nbytes', 'runtime')
+
+    def __init__(self, symbol: str, model: LSTMPriceModel, scaler, feature_columns: List[str],
+                 sequence_length: int, horizons: Optional[List[int]], device: torch.device,
+                 trained_at: str, artifact_mtime: float, nbytes: int, runtime: str = 'eager'):
+        model.eval()
+        for name, value in (
+            ('symbol', symbol),
+            ('model', model),
+            ('scaler', scaler),
+            ('feature_columns', tuple(feature_columns)),
+            ('sequence_length', sequence_length),
+            ('horizons', tuple(horizons) if horizons else None),
+            ('device', device),
+            ('trained_at', trained_at),
+            ('artifact_mtime', artifact_mtime),
+            ('nbytes', nbytes),
+            ('runtime', runtime),
+        ):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    @classmethod
+    def load(cls, symbol: str, device: torch.device) -> Optional['LSTMInferenceModel']:
+        """
+        Load the saved bundle for a symbol, or None if it has not been trained.
+
+        On CPU the compiled (quantized TorchScript) model is preferred when an
+        up-to-date one has been exported; the bundle still supplies the scaler
+        and feature layout.
+        """
+        model_data = load_bundle(symbol)
+        if model_data is None or not model_data.get('model_state'):
+            return None
+        mtime = artifact_mtime(symbol)
+
+        horizons = model_data.get('horizons')
+        model = load_compiled(symbol) if device.type == 'cpu' else None
+        if model is not None:
+            runtime = 'torchscript'
+            nbytes = os.path.getsize(compiled_artifact_path(symbol))
+        else:
+            runtime = 'eager'
+            model = build_model(model_data)
+            # assign=True keeps the memory-mapped weights instead of copying them
+            model.load_state_dict(model_data['model_state'], assign=device.type == 'cpu')
+            model.to(device)
+            nbytes = sum(t.numel() * t.element_size() for t in model.state_dict().values())
+
+        return cls(
+            symbol=symbol,
+            model=model,
+            scaler=model_data['scaler'],
+            feature_columns=model_data['feature_columns'],
+            sequence_length=model_data['sequence_length'],
+            horizons=horizons,
+            device=device,
+            trained_at=model_data.get('timestamp'),
+            artifact_mtime=mtime,
+            nbytes=nbytes,
+            runtime=runtime
+        )
+
+    def predict_multi_horizon(self, last_sequence: np.ndarray, horizons: List[int]) -> Dict:
+        """Multi-horizon forecast in the scaled feature space (see LSTMPricePredictor)"""
+        return predict_horizons(self.model, last_sequence, horizons, self.device, self.horizons)
+
+    def inverse_transform_price(self, scaled_price: float) -> float:
+        """Map a scaled price (feature column 0) back to USD"""
+        dummy_features = np.zeros(len(self.feature_columns))
+        dummy_features[0] = scaled_price
+        return float(self.scaler.inverse_transform([dummy_features])[0][0])
+
+
+class LSTMModelPool:
+    """
+    Per-symbol LRU of LSTMInferenceModel objects.
+
+    Reads are lock-free: the symbol -> model mapping is an immutable snapshot
+    that writers replace wholesale under a lock (copy-on-write). Models are
+    evicted least-recently-used first once their weights exceed the memory
+    budget, and a model is reloaded in the background when a newer artifact
+    appears on disk (e.g. written by a training job in another process).
+    Cold loads are single-flight per symbol and read from disk outside the
+    write lock, so loading one symbol never stalls requests for others.
+    """
+
+    def __init__(self, max_memory_mb: Optional[float] = None, reload_check_seconds: int = 30):
+        self.max_bytes = int((max_memory_mb or float(os.getenv('LSTM_POOL_MAX_MB', 256))) * 1024 * 1024)
+        self.reload_check_seconds = reload_check_seconds
+        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        if self.device.type == 'cpu':
+            configure_inference_threads()
+
+        self._models: Dict[str, LSTMInferenceModel] = {}
+        self._last_used: Dict[str, float] = {}
+        self._last_checked: Dict[str, float] = {}
+        self._reloading = set()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._write_lock = threading.Lock()
+
+    def get(self, symbol: str) -> Optional[LSTMInferenceModel]:
+        """Return the symbol's model, loading it on first use (None if never trained)"""
+        symbol = symbol.upper()
+        model = self._models.get(symbol)
+        if model is not None:
+            self._last_used[symbol] = time.monotonic()
+            self._maybe_reload(symbol, model)
+            return model
+
+        with self._write_lock:
+            load_lock = self._load_locks.setdefault(symbol, threading.Lock())
+        with load_lock:
+            # Another thread may have loaded it while we waited
+            model = self._models.get(symbol)
+            if model is not None:
+                return model
+            model = LSTMInferenceModel.load(symbol, self.device)
+            if model is not None:
+                with self._write_lock:
+                    self._install(symbol, model)
+            return model
+
+    def reload(self, symbol: str) -> Optional[LSTMInferenceModel]:
+        """Load the symbol's artifact from disk now and publish it (call after saving a retrained model)"""
+        symbol = symbol.upper()
+        model = LSTMInferenceModel.load(symbol, self.device)
+        if model is not None:
+            with self._write_lock:
+                self._install(symbol, model)
+        return model
+
+    def _install(self, symbol: str, model: LSTMInferenceModel):
+        """Publish a new snapshot containing the model (caller holds the write lock)"""
+        models = dict(self._models)
+        models[symbol] = model
+        now = time.monotonic()
+        self._last_used[symbol] = now
+        self._last_checked[symbol] = now
+
+        # Evict least recently used models over budget, always keeping the new one
+        total = sum(m.nbytes for m in models.values())
+        for victim in sorted(models, key=lambda s: self._last_used.get(s, 0.0)):
+            if total <= self.max_bytes:
+                break
+            if victim == symbol:
+                continue
+            total -= models.pop(victim).nbytes
+            self._last_used.pop(victim, None)
+            logger.info(f"Evicted LSTM model for {victim} from pool")
+
+        self._models = models
+
+    def _maybe_reload(self, symbol: str, model: LSTMInferenceModel):
+        """Start a background reload if the artifact changed since the model was loaded"""
+        now = time.monotonic()
+        if now - self._last_checked.get(symbol, 0.0) < self.reload_check_seconds:
+            return
+        self._last_checked[symbol] = now
+
+        try:
+            mtime = artifact_mtime(symbol)
+        except OSError:
+            return
+        if mtime <= model.artifact_mtime:
+            return
+
+        with self._write_lock:
+            if symbol in self._reloading:
+                return
+            self._reloading.add(symbol)
+        threading.Thread(target=self._background_reload, args=(symbol,), daemon=True).start()
+
+    def _background_reload(self, symbol: str):
+        try:
+            self.reload(symbol)
+            logger.info(f"Reloaded LSTM model for {symbol} from newer artifact")
+        except Exception as e:
+            logger.warning(f"Background reload failed for {symbol}: {e}")
+        finally:
+            with self._write_lock:
+                self._reloading.discard(symbol)
+
+    def stats(self) -> Dict:
+        """Pool contents and memory usage"""
+        models = self._models
+        return {
+            'symbols': sorted(models),
+            'runtimes': {symbol: m.runtime for symbol, m in models.items()},
+            'memory_bytes': sum(m.nbytes for m in models.values()),
+            'max_memory_bytes': self.max_bytes
+        }
+
+
+# Singleton instance
+lstm_model_pool = LSTMModelPool()
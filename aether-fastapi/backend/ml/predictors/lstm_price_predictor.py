@@ -5,13 +5,97 @@ Deep learning model for cryptocurrency price forecasting
 
 import torch
 import torch.nn as nn
+from torch.utils.data import BatchSampler, DataLoader, Dataset, RandomSampler, SequentialSampler
 import numpy as np
 import pandas as pd
-from typing import Dict, Optional, Tuple
+from typing import Callable, Dict, Optional, Tuple
 from datetime import datetime, timedelta
 import os
+import time
 import pickle
 
+from ml.artifacts import artifact_store, hash_arrays, scaler_from_arrays, scaler_to_arrays
+
+MODELS_DIR = os.path.join(os.path.dirname(__file__), '../models')
+LSTM_ARTIFACT_KIND = 'lstm'
+
+
+def artifact_path(symbol: str, models_dir: str = MODELS_DIR) -> str:
+    """Path of the legacy pickled model bundle for a symbol"""
+    return os.path.join(models_dir, f'lstm_{symbol.lower()}.pkl')
+
+
+def bundle_mtime(symbol: str) -> Optional[float]:
+    """When the symbol's active model last changed (None if it has none)"""
+    mtime = artifact_store.current_mtime(LSTM_ARTIFACT_KIND, symbol.upper())
+    if mtime is not None:
+        return mtime
+    legacy_path = artifact_path(symbol)
+    return os.path.getmtime(legacy_path) if os.path.exists(legacy_path) else None
+
+
+def load_bundle(symbol: str) -> Optional[Dict]:
+    """
+    Load a symbol's model state, scaler and settings
+    
+    Prefers the versioned artifact, whose weights are memory-mapped rather
+    than unpickled; falls back to the legacy pickle.
+    
+    Returns:
+        Dict with model_state, scaler, feature_columns, sequence_length,
+        horizons, model_params, timestamp, version and mtime; None if the
+        symbol has no model
+    """
+    loaded = artifact_store.load_tensors(LSTM_ARTIFACT_KIND, symbol.upper())
+    if loaded is not None:
+        tensors, manifest = loaded
+        metadata = manifest['metadata']
+        return {
+            'model_state': {
+                name[len('model.'):]: torch.from_numpy(array)
+                for name, array in tensors.items() if name.startswith('model.')
+            },
+            'scaler': scaler_from_arrays(tensors, metadata['scaler']),
+            'feature_columns': metadata['feature_columns'],
+            'sequence_length': metadata['sequence_length'],
+            'horizons': metadata.get('horizons'),
+            'model_params': metadata.get('model_params', {}),
+            'timestamp': metadata.get('timestamp'),
+            'version': manifest['version'],
+            'dir': manifest['dir'],
+            'mtime': bundle_mtime(symbol)
+        }
+    
+    legacy_path = artifact_path(symbol)
+    if not os.path.exists(legacy_path):
+        return None
+    with open(legacy_path, 'rb') as f:
+        model_data = pickle.load(f)
+    model_data.setdefault('horizons', None)
+    model_data.setdefault('model_params', {})
+    model_data.update({'version': None, 'dir': None, 'mtime': os.path.getmtime(legacy_path)})
+    return model_data
+
+
+class WindowDataset(Dataset):
+    """
+    Training windows indexed by batches of sample indices (used with a
+    BatchSampler), so each batch is one fancy-indexed gather from the
+    window view instead of per-sample tensors collated together
+    """
+    
+    def __init__(self, X: np.ndarray, y: np.ndarray):
+        self.X = X
+        self.y = y.reshape(len(y), -1)
+    
+    def __len__(self) -> int:
+        return len(self.X)
+    
+    def __getitem__(self, indices) -> Tuple[torch.Tensor, torch.Tensor]:
+        batch_X = np.ascontiguousarray(self.X[indices], dtype=np.float32)
+        batch_y = np.ascontiguousarray(self.y[indices], dtype=np.float32)
+        return torch.from_numpy(batch_X), torch.from_numpy(batch_y)
+
 
 class LSTMPriceModel(nn.Module):
     """
@@ -20,10 +104,12 @@ class LSTMPriceModel(nn.Module):
     Architecture:
     - LSTM Layer 1: 128 units with dropout
     - LSTM Layer 2: 64 units with dropout
-    - Dense Output: 1 unit (price prediction)
+    - Dense Output: 1 unit (next-day price), or one unit per horizon for the
+      direct multi-horizon variant
     """
     
-    def __init__(self, input_size: int, hidden_size_1: int = 128, hidden_size_2: int = 64, dropout: float = 0.2):
+    def __init__(self, input_size: int, hidden_size_1: int = 128, hidden_size_2: int = 64, dropout: float = 0.2,
+                 output_size: int = 1):
         super(LSTMPriceModel, self).__init__()
         
         self.hidden_size_1 = hidden_size_1
@@ -54,7 +140,7 @@ class LSTMPriceModel(nn.Module):
         self.dropout2 = nn.Dropout(dropout)
         
         # Dense output layer
-        self.fc = nn.Linear(hidden_size_2, 1)
+        self.fc = nn.Linear(hidden_size_2, output_size)
     
     def forward(self, x):
         # LSTM Layer 1
@@ -74,6 +160,125 @@ class LSTMPriceModel(nn.Module):
         return predictions
 
 
+def build_model(model_data: Dict) -> 'LSTMPriceModel':
+    """Untrained LSTMPriceModel with the architecture recorded in a bundle (see load_bundle)"""
+    horizons = model_data.get('horizons')
+    return LSTMPriceModel(
+        input_size=len(model_data['feature_columns']),
+        output_size=len(horizons) if horizons else 1,
+        **(model_data.get('model_params') or {})
+    )
+
+
+def rollout_multi_horizon(
+    model: nn.Module,
+    last_sequence: np.ndarray,
+    horizons: list,
+    device: torch.device,
+    output_index: int = 0
+) -> Dict:
+    """
+    Autoregressive multi-horizon forecast from one input window
+    
+    All horizons share a single rollout of max(horizons) steps: every horizon
+    starts from the same window, so shorter horizons are prefixes of the
+    longest one. The window slides over a preallocated buffer on the model's
+    device instead of being rolled and re-uploaded each step.
+    
+    Args:
+        model: Trained LSTMPriceModel (in eval mode)
+        last_sequence: Last sequence of shape (sequence_length, features)
+        horizons: List of prediction horizons in days
+        device: Device the model lives on
+        output_index: Model output holding the next-day price
+    
+    Returns:
+        Dictionary with predictions for each horizon
+    """
+    sequence_length = last_sequence.shape[0]
+    steps = max(horizons)
+    
+    # Row t + L is the simulated day t: the row that slid out of the window
+    # with its price replaced by the prediction (same update as shifting the
+    # window and overwriting the wrapped-around row)
+    buffer = torch.empty((sequence_length + steps, last_sequence.shape[1]), dtype=torch.float32, device=device)
+    buffer[:sequence_length] = torch.as_tensor(last_sequence, dtype=torch.float32)
+    step_preds = torch.empty(steps, dtype=torch.float32, device=device)
+    
+    with torch.no_grad():
+        for t in range(steps):
+            next_pred = model(buffer[t:t + sequence_length].unsqueeze(0))[0, output_index]
+            step_preds[t] = next_pred
+            buffer[sequence_length + t] = buffer[t]
+            buffer[sequence_length + t, 0] = next_pred
+    
+    step_preds = step_preds.cpu().numpy()
+    return {
+        f'{horizon}_day': {
+            'prediction': step_preds[horizon - 1],  # Final prediction
+            'sequence': step_preds[:horizon].tolist()  # Full sequence
+        }
+        for horizon in horizons
+    }
+
+
+def direct_multi_horizon(
+    model: nn.Module,
+    last_sequence: np.ndarray,
+    horizons: list,
+    trained_horizons: list,
+    device: torch.device
+) -> Dict:
+    """
+    Multi-horizon forecast from a direct multi-output model in one forward pass
+    
+    Args:
+        model: LSTMPriceModel trained with one output per trained horizon
+        last_sequence: Last sequence of shape (sequence_length, features)
+        horizons: Requested horizons (each must be in trained_horizons)
+        trained_horizons: Horizons the model's outputs correspond to, in order
+        device: Device the model lives on
+    
+    Returns:
+        Dictionary with predictions for each horizon; 'sequence' holds the
+        model's outputs at every trained horizon up to the requested one
+    """
+    with torch.no_grad():
+        X = torch.as_tensor(last_sequence, dtype=torch.float32, device=device).unsqueeze(0)
+        outputs = model(X)[0].cpu().numpy()
+    
+    by_horizon = dict(zip(trained_horizons, outputs))
+    return {
+        f'{horizon}_day': {
+            'prediction': by_horizon[horizon],
+            'sequence': [float(by_horizon[h]) for h in trained_horizons if h <= horizon]
+        }
+        for horizon in horizons
+    }
+
+
+def predict_horizons(
+    model: nn.Module,
+    last_sequence: np.ndarray,
+    horizons: list,
+    device: torch.device,
+    trained_horizons: Optional[list] = None
+) -> Dict:
+    """
+    Forecast several horizons with whichever strategy the model supports
+    
+    Direct models answer their trained horizons in one pass; anything else
+    falls back to the autoregressive rollout on the next-day output.
+    """
+    if trained_horizons and all(h in trained_horizons for h in horizons):
+        return direct_multi_horizon(model, last_sequence, horizons, trained_horizons, device)
+    
+    if trained_horizons and 1 not in trained_horizons:
+        raise ValueError(f"Model only supports horizons {trained_horizons}")
+    output_index = list(trained_horizons).index(1) if trained_horizons else 0
+    return rollout_multi_horizon(model, last_sequence, horizons, device, output_index)
+
+
 class LSTMPricePredictor:
     """
     LSTM-based cryptocurrency price forecaster
@@ -81,27 +286,69 @@ class LSTMPricePredictor:
     Features:
     - Multi-variate input (price + technical indicators)
     - 2-layer LSTM architecture
-    - Early stopping and model checkpoints
-    - Multi-horizon predictions (1d, 7d, 30d)
+    - Shuffled mini-batches, early stopping with the best weights kept in memory
+    - Multi-horizon predictions (1d, 7d, 30d), either autoregressive or from
+      a direct multi-output head when constructed with horizons
     """
     
-    def __init__(self):
+    def __init__(self, horizons: Optional[list] = None, model_params: Optional[Dict] = None):
+        self.horizons = list(horizons) if horizons else None
+        # LSTMPriceModel architecture overrides (hidden_size_1, hidden_size_2, dropout)
+        self.model_params = dict(model_params or {})
+        self.training_data_hash = None
         self.model = None
         self.scaler = None
         self.feature_columns = None
         self.sequence_length = 60
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        self.models_dir = os.path.join(os.path.dirname(__file__), '../models')
+        self.models_dir = MODELS_DIR
         os.makedirs(self.models_dir, exist_ok=True)
         
         print(f"LSTM Predictor initialized on device: {self.device}")
     
     def _create_model(self, input_size: int) -> LSTMPriceModel:
         """Create a new LSTM model"""
-        model = LSTMPriceModel(input_size=input_size)
+        output_size = len(self.horizons) if self.horizons else 1
+        model = LSTMPriceModel(input_size=input_size, output_size=output_size, **self.model_params)
         model.to(self.device)
         return model
     
+    def _to_tensor(self, array: np.ndarray) -> torch.Tensor:
+        """Gather a (possibly strided, read-only) array into one float32 tensor on the device"""
+        batch = np.ascontiguousarray(array, dtype=np.float32)
+        if not batch.flags.writeable:
+            batch = batch.copy()
+        return torch.from_numpy(batch).to(self.device)
+    
+    def _window_loader(
+        self,
+        X: np.ndarray,
+        y: np.ndarray,
+        batch_size: int,
+        shuffle: bool,
+        seed: Optional[int] = None
+    ) -> DataLoader:
+        """
+        Mini-batches of (windows, targets), reshuffled every epoch when
+        shuffle is set. Each batch is gathered straight from the (possibly
+        strided) window view, and pinned when training on CUDA so the copy
+        to the device can overlap compute.
+        """
+        if shuffle:
+            generator = torch.Generator()
+            if seed is not None:
+                generator.manual_seed(seed)
+            sampler = RandomSampler(range(len(X)), generator=generator)
+        else:
+            sampler = SequentialSampler(range(len(X)))
+        
+        return DataLoader(
+            WindowDataset(X, y),
+            sampler=BatchSampler(sampler, batch_size=batch_size, drop_last=False),
+            batch_size=None,
+            pin_memory=self.device.type == 'cuda'
+        )
+    
     def train(
         self,
         X_train: np.ndarray,
@@ -111,35 +358,56 @@ class LSTMPricePredictor:
         epochs: int = 50,
         batch_size: int = 32,
         learning_rate: float = 0.001,
-        early_stopping_patience: int = 10
+        early_stopping_patience: int = 10,
+        accumulation_steps: int = 1,
+        shuffle: bool = True,
+        seed: Optional[int] = None,
+        num_threads: Optional[int] = None,
+        progress_callback: Optional[Callable[[Dict], None]] = None,
+        deadline: Optional[float] = None
     ) -> Dict:
         """
         Train the LSTM model
         
         Args:
             X_train: Training sequences (samples, sequence_length, features)
-            y_train: Training targets
+            y_train: Training targets (samples,) or (samples, len(horizons)) for a direct model
             X_val: Validation sequences (optional)
             y_val: Validation targets (optional)
             epochs: Number of training epochs
             batch_size: Batch size
             learning_rate: Learning rate for Adam optimizer
             early_stopping_patience: Epochs to wait before early stopping
+            accumulation_steps: Batches whose gradients are summed per optimizer
+                step (effective batch size = batch_size * accumulation_steps)
+            shuffle: Reshuffle the training windows every epoch
+            seed: Seed for the shuffle order
+            num_threads: torch intra-op threads for this process (None leaves
+                the current setting; see ml.predictors.lstm_training)
+            progress_callback: Called after every epoch with a progress dict
+            deadline: time.time() after which training stops at the end of
+                the current epoch (keeping the best weights so far)
         
         Returns:
             Training history dictionary
         """
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        accumulation_steps = max(1, accumulation_steps)
+        
+        # Fingerprint the training data (window starts, every window's last row, targets)
+        self.training_data_hash = hash_arrays(X_train[0], X_train[:, -1], y_train)
+        
         # Create model
         input_size = X_train.shape[2]  # Number of features
         self.model = self._create_model(input_size)
         
-        # Convert to PyTorch tensors
-        X_train_tensor = torch.FloatTensor(X_train).to(self.device)
-        y_train_tensor = torch.FloatTensor(y_train).reshape(-1, 1).to(self.device)
+        train_loader = self._window_loader(X_train, y_train, batch_size, shuffle, seed)
+        non_blocking = self.device.type == 'cuda'
         
         if X_val is not None and y_val is not None:
-            X_val_tensor = torch.FloatTensor(X_val).to(self.device)
-            y_val_tensor = torch.FloatTensor(y_val).reshape(-1, 1).to(self.device)
+            X_val_tensor = self._to_tensor(X_val)
+            y_val_tensor = self._to_tensor(y_val).reshape(len(y_val), -1)
         
         # Loss and optimizer
         criterion = nn.MSELoss()
@@ -148,38 +416,44 @@ class LSTMPricePredictor:
         # Training history
         history = {
             'train_loss': [],
-            'val_loss': []
+            'val_loss': [],
+            'best_epoch': None
         }
         
+        # Best weights are kept in memory: no shared checkpoint file for
+        # concurrent trainings to race on
         best_val_loss = float('inf')
+        best_state = None
         patience_counter = 0
+        num_batches = len(train_loader)
         
         # Training loop
         for epoch in range(epochs):
             self.model.train()
+            optimizer.zero_grad()
             
             # Mini-batch training
-            total_loss = 0
-            num_batches = 0
+            total_loss = 0.0
             
-            for i in range(0, len(X_train_tensor), batch_size):
-                batch_X = X_train_tensor[i:i + batch_size]
-                batch_y = y_train_tensor[i:i + batch_size]
+            for step, (batch_X, batch_y) in enumerate(train_loader, start=1):
+                batch_X = batch_X.to(self.device, non_blocking=non_blocking)
+                batch_y = batch_y.to(self.device, non_blocking=non_blocking)
                 
                 # Forward pass
                 outputs = self.model(batch_X)
                 loss = criterion(outputs, batch_y)
                 
-                # Backward pass
-                optimizer.zero_grad()
-                loss.backward()
-                optimizer.step()
+                # Backward pass, stepping once per accumulation window
+                (loss / accumulation_steps).backward()
+                if step % accumulation_steps == 0 or step == num_batches:
+                    optimizer.step()
+                    optimizer.zero_grad()
                 
                 total_loss += loss.item()
-                num_batches += 1
             
             avg_train_loss = total_loss / num_batches
             history['train_loss'].append(avg_train_loss)
+            val_loss = None
             
             # Validation
             if X_val is not None:
@@ -193,11 +467,25 @@ class LSTMPricePredictor:
                 if val_loss < best_val_loss:
                     best_val_loss = val_loss
                     patience_counter = 0
-                    # Save best model
-                    self._save_checkpoint('best_model.pth')
+                    history['best_epoch'] = epoch + 1
+                    best_state = {k: v.detach().clone() for k, v in self.model.state_dict().items()}
                 else:
                     patience_counter += 1
-                
+            
+            if progress_callback is not None:
+                progress_callback({
+                    'epoch': epoch + 1,
+                    'epochs': epochs,
+                    'train_loss': avg_train_loss,
+                    'val_loss': val_loss,
+                    'best_val_loss': best_val_loss if best_state is not None else None
+                })
+            
+            if deadline is not None and time.time() >= deadline:
+                print(f"Training deadline reached at epoch {epoch + 1}")
+                break
+            
+            if X_val is not None:
                 if patience_counter >= early_stopping_patience:
                     print(f"Early stopping at epoch {epoch + 1}")
                     break
@@ -208,9 +496,9 @@ class LSTMPricePredictor:
                 if (epoch + 1) % 10 == 0:
                     print(f"Epoch {epoch + 1}/{epochs} - Train Loss: {avg_train_loss:.6f}")
         
-        # Load best model
-        if X_val is not None:
-            self._load_checkpoint('best_model.pth')
+        # Restore the best weights
+        if best_state is not None:
+            self.model.load_state_dict(best_state)
         
         return history
     
@@ -234,7 +522,7 @@ class LSTMPricePredictor:
         
         self.model.eval()
         with torch.no_grad():
-            X_tensor = torch.FloatTensor(X).to(self.device)
+            X_tensor = self._to_tensor(X)
             predictions = self.model(X_tensor)
             predictions = predictions.cpu().numpy()
         
@@ -261,86 +549,70 @@ class LSTMPricePredictor:
         if self.model is None:
             raise ValueError("Model not trained or loaded")
         
-        predictions = {}
-        current_sequence = last_sequence.copy()
+        self.model.eval()
+        return predict_horizons(self.model, last_sequence, horizons, self.device, self.horizons)
+    
+    def save_model(self, symbol: str, publish: bool = True) -> str:
+        """
+        Save the model as a new artifact version (weights and scaler as
+        memory-mappable arrays, settings in the manifest)
         
-        for horizon in horizons:
-            horizon_preds = []
-            temp_sequence = current_sequence.copy()
-            
-            for _ in range(horizon):
-                # Predict next day
-                X = temp_sequence.reshape(1, self.sequence_length, -1)
-                next_pred = self.predict(X, return_sequences=False)
-                horizon_preds.append(next_pred[0])
-                
-                # Update sequence (simple: shift and append, maintain feature structure)
-                # In practice, you'd need to update all features, not just price
-                temp_sequence = np.roll(temp_sequence, -1, axis=0)
-                temp_sequence[-1, 0] = next_pred[0]  # Update price (column 0)
-            
-            predictions[f'{horizon}_day'] = {
-                'prediction': horizon_preds[-1],  # Final prediction
-                'sequence': horizon_preds  # Full sequence
-            }
+        Args:
+            symbol: Crypto symbol
+            publish: Make it the active version (served after hot reload)
         
-        return predictions
-    
-    def _save_checkpoint(self, filename: str):
-        """Save model checkpoint"""
-        filepath = os.path.join(self.models_dir, filename)
-        torch.save(self.model.state_dict(), filepath)
-    
-    def _load_checkpoint(self, filename: str):
-        """Load model checkpoint"""
-        filepath = os.path.join(self.models_dir, filename)
-        if os.path.exists(filepath):
-            self.model.load_state_dict(torch.load(filepath, map_location=self.device))
-            print(f"Loaded model from {filepath}")
-        else:
-            print(f"Checkpoint {filepath} not found")
-    
-    def save_model(self, symbol: str):
-        """Save complete model with metadata"""
-        model_data = {
-            'model_state': self.model.state_dict() if self.model else None,
-            'scaler': self.scaler,
-            'feature_columns': self.feature_columns,
-            'sequence_length': self.sequence_length,
-            'timestamp': datetime.now().isoformat()
-        }
+        Returns:
+            The artifact version id
+        """
+        if self.model is None:
+            raise ValueError("Model not trained or loaded")
         
-        filepath = os.path.join(self.models_dir, f'lstm_{symbol.lower()}.pkl')
-        with open(filepath, 'wb') as f:
-            pickle.dump(model_data, f)
+        tensors = {
+            f'model.{name}': tensor.detach().cpu().numpy()
+            for name, tensor in self.model.state_dict().items()
+        }
+        scaler_arrays, scaler_settings = scaler_to_arrays(self.scaler)
+        tensors.update(scaler_arrays)
+        
+        version = artifact_store.save(
+            LSTM_ARTIFACT_KIND,
+            symbol.upper(),
+            tensors=tensors,
+            metadata={
+                'feature_columns': list(self.feature_columns),
+                'sequence_length': self.sequence_length,
+                'horizons': self.horizons,
+                'model_params': self.model_params,
+                'scaler': scaler_settings,
+                'timestamp': datetime.now().isoformat()
+            },
+            training_data_hash=self.training_data_hash,
+            make_current=publish
+        )
         
-        print(f"Model saved to {filepath}")
+        print(f"Model saved for {symbol.upper()} (version {version})")
+        return version
     
     def load_model(self, symbol: str):
         """Load complete model with metadata"""
-        filepath = os.path.join(self.models_dir, f'lstm_{symbol.lower()}.pkl')
+        bundle = load_bundle(symbol)
         
-        if not os.path.exists(filepath):
+        if bundle is None:
             print(f"No saved model found for {symbol}")
             return False
         
-        with open(filepath, 'rb') as f:
-            model_data = pickle.load(f)
-        
-        self.scaler = model_data['scaler']
-        self.feature_columns = model_data['feature_columns']
-        self.sequence_length = model_data['sequence_length']
+        self.scaler = bundle['scaler']
+        self.feature_columns = bundle['feature_columns']
+        self.sequence_length = bundle['sequence_length']
+        self.horizons = bundle['horizons']
+        self.model_params = dict(bundle['model_params'])
         
-        if model_data['model_state']:
+        if bundle['model_state']:
             # Reconstruct model
             input_size = len(self.feature_columns)
             self.model = self._create_model(input_size)
-            self.model.load_state_dict(model_data['model_state'])
+            self.model.load_state_dict(bundle['model_state'])
             self.model.eval()
         
-        print(f"Model loaded from {filepath} (saved: {model_data['timestamp']})")
+        print(f"Model loaded for {symbol.upper()} (saved: {bundle['timestamp']})")
         return True
-
-
-# Singleton instance
-lstm_predictor = LSTMPricePredictor()
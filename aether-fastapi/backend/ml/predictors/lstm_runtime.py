@@ -0,0 +1,132 @@
+"""
+LSTM Inference Runtime
+Exports trained LSTMs to TorchScript and loads them under a fixed CPU thread budget
+"""
+
+import os
+import warnings
+import torch
+import torch.nn as nn
+from typing import Optional
+
+from ml.artifacts import artifact_store
+from ml.predictors.lstm_price_predictor import LSTM_ARTIFACT_KIND, MODELS_DIR, build_model, bundle_mtime, load_bundle
+
+COMPILED_FILE = 'model.ts'
+
+_threads_configured = False
+
+
+def compiled_artifact_path(symbol: str) -> str:
+    """
+    Path of the compiled TorchScript model for a symbol's active version
+    (inside the artifact version directory, or next to a legacy pickle)
+    """
+    version_dir = artifact_store.version_dir(LSTM_ARTIFACT_KIND, symbol.upper())
+    if version_dir is not None:
+        return os.path.join(version_dir, COMPILED_FILE)
+    return os.path.join(MODELS_DIR, f'lstm_{symbol.lower()}.ts')
+
+
+def configure_inference_threads(num_threads: Optional[int] = None) -> int:
+    """
+    Cap torch's intra-op thread pool for this process (first call wins).
+
+    The web process also runs Prophet fits and request handling, so by
+    default inference gets a quarter of the cores (LSTM_INFERENCE_THREADS
+    overrides). Small LSTMs gain little beyond 2-4 threads anyway.
+    """
+    global _threads_configured
+    if not _threads_configured:
+        if num_threads is None:
+            configured = os.getenv('LSTM_INFERENCE_THREADS')
+            num_threads = int(configured) if configured else max(1, (os.cpu_count() or 4) // 4)
+        torch.set_num_threads(num_threads)
+        _threads_configured = True
+    return torch.get_num_threads()
+
+
+def quantize_model(model: nn.Module) -> nn.Module:
+    """Dynamic int8 quantization of the LSTM and Linear layers (weights int8, activations float)"""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return torch.ao.quantization.quantize_dynamic(model, {nn.LSTM, nn.Linear}, dtype=torch.qint8)
+
+
+def load_eager_model(symbol: str) -> Optional[nn.Module]:
+    """Rebuild the eager CPU model from the saved bundle (None if not trained)"""
+    model_data = load_bundle(symbol)
+    if model_data is None or not model_data.get('model_state'):
+        return None
+
+    model = build_model(model_data)
+    model.load_state_dict(model_data['model_state'])
+    return model.cpu().eval()
+
+
+def export_compiled(symbol: str, quantize: bool = False) -> Optional[str]:
+    """
+    Compile a symbol's trained LSTM to TorchScript next to its bundle.
+
+    Args:
+        symbol: Crypto symbol with a saved LSTM
+        quantize: Apply dynamic int8 quantization before scripting (smaller,
+            but slower than fp32 for these small models; benchmark first with
+            ml/benchmarks/lstm_inference_benchmark.py)
+
+    Returns:
+        Path of the compiled artifact, or None if the symbol has no model
+    """
+    model = load_eager_model(symbol)
+    if model is None:
+        return None
+
+    if quantize:
+        model = quantize_model(model)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        scripted = torch.jit.script(model)
+
+    path = compiled_artifact_path(symbol)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    torch.jit.save(scripted, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_compiled(symbol: str) -> Optional[torch.jit.ScriptModule]:
+    """
+    Load the compiled model for the symbol's active version, if exported.
+
+    Versioned artifacts keep the compiled model inside the version
+    directory, so a retrain (new version) never picks up old weights. A
+    legacy pickle's compiled file is only used if it is at least as new.
+    """
+    path = compiled_artifact_path(symbol)
+    if not os.path.exists(path):
+        return None
+    if artifact_store.version_dir(LSTM_ARTIFACT_KIND, symbol.upper()) is None:
+        legacy_mtime = bundle_mtime(symbol)
+        if legacy_mtime is None or os.path.getmtime(path) < legacy_mtime:
+            return None
+
+    configure_inference_threads()
+    model = torch.jit.load(path, map_location='cpu')
+    model.eval()
+    return model
+
+
+if __name__ == "__main__":
+    import sys
+
+    args = sys.argv[1:]
+    quantize = '--int8' in args
+    symbols = [s.upper() for s in args if not s.startswith('--')]
+    if not symbols:
+        print("Usage: python -m ml.predictors.lstm_runtime [--int8] SYMBOL [SYMBOL ...]")
+        sys.exit(1)
+
+    for symbol in symbols:
+        path = export_compiled(symbol, quantize=quantize)
+        print(f"{symbol}: {path or 'no trained model'}")
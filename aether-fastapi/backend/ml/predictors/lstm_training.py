@@ -0,0 +1,279 @@
+"""
+LSTM Training Jobs
+Runs LSTM retraining in the ML process pool under its own thread budget and reports progress
+"""
+
+import os
+import json
+import uuid
+import threading
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from typing import Dict, List, Optional
+import logging
+
+from ml.process_pool import get_process_pool, pool_workers
+
+logger = logging.getLogger(__name__)
+
+JOBS_DIR = os.path.join(os.path.dirname(__file__), '../cache/training_jobs')
+
+# Horizons newly trained LSTMs predict directly (one forward pass for all of them)
+LSTM_DIRECT_HORIZONS = [1, 7, 14, 30]
+
+
+def training_threads() -> int:
+    """
+    torch intra-op threads for one training job.
+
+    Jobs run in the shared process pool, so torch.set_num_threads there never
+    touches the web process's inference threads; each job gets an equal share
+    of the cores the pool may use (LSTM_TRAIN_THREADS overrides).
+    """
+    configured = os.getenv('LSTM_TRAIN_THREADS')
+    if configured:
+        return max(1, int(configured))
+    return max(1, (os.cpu_count() or 2) // (2 * pool_workers()))
+
+
+def _progress_path(job_id: str, jobs_dir: str = JOBS_DIR) -> str:
+    return os.path.join(jobs_dir, f'{job_id}.json')
+
+
+def _write_progress(path: str, progress: Dict):
+    """Atomically replace a job's progress file (read by the web process)"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(progress, f)
+    os.replace(tmp_path, path)
+
+
+def train_symbol(
+    symbol: str,
+    df: pd.DataFrame,
+    progress_path: Optional[str] = None,
+    publish: bool = True,
+    **train_kwargs
+) -> Dict:
+    """
+    Build sequences from a symbol's indicator frame, train a direct
+    multi-horizon LSTM and save it as a new artifact version.
+
+    The symbol's tuned hyperparameters (ml/hparam_search.py) are used when
+    present; explicit train_kwargs take precedence.
+
+    Args:
+        symbol: Crypto symbol
+        df: Price history with technical indicators
+        progress_path: JSON file to receive per-epoch progress
+        publish: Make the new version active
+        **train_kwargs: Extra LSTMPricePredictor.train arguments
+
+    Returns:
+        Dict with the artifact version, epochs run and final RMSEs (scaled)
+    """
+    from ml.data.feature_engineering import feature_engineer
+    from ml.hparam_search import load_best_params, split_lstm_params
+    from ml.predictors.lstm_price_predictor import LSTMPricePredictor
+
+    model_params, tuned_train_kwargs = split_lstm_params(load_best_params(symbol, 'lstm') or {})
+    train_kwargs = {**tuned_train_kwargs, **train_kwargs}
+
+    seq_data = feature_engineer.prepare_lstm_sequences(df, 60, 'price', LSTM_DIRECT_HORIZONS)
+    X, y = seq_data['X'], seq_data['y']
+
+    # Split into train/validation (80/20)
+    split_idx = int(len(X) * 0.8)
+    X_train, X_val = X[:split_idx], X[split_idx:]
+    y_train, y_val = y[:split_idx], y[split_idx:]
+
+    if progress_path is not None:
+        train_kwargs['progress_callback'] = lambda progress: _write_progress(progress_path, progress)
+
+    trainer = LSTMPricePredictor(horizons=LSTM_DIRECT_HORIZONS, model_params=model_params)
+    history = trainer.train(X_train, y_train, X_val, y_val, **train_kwargs)
+
+    trainer.scaler = seq_data['scaler']
+    trainer.feature_columns = seq_data['feature_columns']
+    trainer.sequence_length = seq_data['sequence_length']
+    version = trainer.save_model(symbol, publish=publish)
+
+    best_epoch = history['best_epoch']
+    return {
+        'version': version,
+        'epochs_run': len(history['train_loss']),
+        'best_epoch': best_epoch,
+        'train_rmse': float(np.sqrt(history['train_loss'][-1])),
+        'val_rmse': float(np.sqrt(history['val_loss'][best_epoch - 1])) if best_epoch else None
+    }
+
+
+def _train_worker(
+    job_id: str,
+    symbol: str,
+    df: pd.DataFrame,
+    train_kwargs: Dict,
+    num_threads: int,
+    jobs_dir: str = JOBS_DIR
+) -> Dict:
+    """Process-pool worker for a retraining job (see train_symbol)"""
+    import torch
+
+    torch.set_num_threads(num_threads)
+    return train_symbol(symbol, df, progress_path=_progress_path(job_id, jobs_dir), **train_kwargs)
+
+
+class TrainingJobRegistry:
+    """
+    Background LSTM retraining jobs.
+
+    Jobs run in the shared process pool; the worker writes per-epoch progress
+    to a small JSON file that status reads merge in. One job per symbol runs
+    at a time (resubmitting returns the running job), and when a job finishes
+    the new artifact is published to the model pool.
+    """
+
+    def __init__(self, jobs_dir: str = JOBS_DIR, max_jobs: int = 50):
+        self.jobs_dir = jobs_dir
+        self.max_jobs = max_jobs
+        self._jobs: Dict[str, Dict] = {}
+        self._futures: Dict[str, object] = {}
+        self._done: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, symbol: str, df: pd.DataFrame, **train_kwargs) -> Dict:
+        """
+        Start retraining a symbol in the background.
+
+        Args:
+            symbol: Crypto symbol
+            df: Price history with technical indicators
+            **train_kwargs: Extra LSTMPricePredictor.train arguments
+
+        Returns:
+            The job's status dict
+        """
+        symbol = symbol.upper()
+        with self._lock:
+            for job in self._jobs.values():
+                if job['symbol'] == symbol and job['status'] in ('queued', 'running'):
+                    return self._snapshot(job)
+
+            os.makedirs(self.jobs_dir, exist_ok=True)
+            job_id = uuid.uuid4().hex
+            job = {
+                'job_id': job_id,
+                'symbol': symbol,
+                'status': 'queued',
+                'submitted_at': datetime.now().isoformat(),
+                'finished_at': None,
+                'result': None,
+                'error': None
+            }
+            self._jobs[job_id] = job
+            self._prune()
+
+            future = get_process_pool().submit(
+                _train_worker, job_id, symbol, df, train_kwargs, training_threads(), self.jobs_dir
+            )
+            self._futures[job_id] = future
+            self._done[job_id] = threading.Event()
+        future.add_done_callback(lambda f: self._on_done(job_id, f))
+        return self.get(job_id)
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Dict]:
+        """
+        Block until a job has finished and its model is published, then
+        return its status (call via asyncio.to_thread from request handlers)
+        """
+        done = self._done.get(job_id)
+        if done is not None:
+            done.wait(timeout)
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Job status with its latest epoch progress, or None if unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._snapshot(job) if job is not None else None
+
+    def list(self, symbol: Optional[str] = None) -> List[Dict]:
+        """All tracked jobs, newest first"""
+        with self._lock:
+            jobs = [
+                self._snapshot(job) for job in self._jobs.values()
+                if symbol is None or job['symbol'] == symbol.upper()
+            ]
+        return sorted(jobs, key=lambda job: job['submitted_at'], reverse=True)
+
+    def _snapshot(self, job: Dict) -> Dict:
+        """Copy of a job with progress from the worker's file (caller holds the lock)"""
+        snapshot = dict(job)
+        future = self._futures.get(job['job_id'])
+        if snapshot['status'] == 'queued' and future is not None and future.running():
+            snapshot['status'] = 'running'
+
+        try:
+            with open(_progress_path(job['job_id'], self.jobs_dir), 'r') as f:
+                snapshot['progress'] = json.load(f)
+            if snapshot['status'] == 'queued':
+                snapshot['status'] = 'running'
+        except (OSError, ValueError):
+            snapshot['progress'] = None
+        return snapshot
+
+    def _on_done(self, job_id: str, future):
+        """Record the outcome and publish the new model to the pool"""
+        from ml.predictors.lstm_model_pool import lstm_model_pool
+
+        error = None
+        result = None
+        try:
+            result = future.result()
+        except Exception as e:
+            error = str(e)
+            logger.warning(f"LSTM training job {job_id} failed: {e}")
+
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            symbol = job['symbol']
+
+        if result is not None:
+            try:
+                lstm_model_pool.reload(symbol)
+            except Exception as e:
+                logger.warning(f"Could not publish retrained LSTM for {symbol}: {e}")
+
+        with self._lock:
+            job.update({
+                'status': 'failed' if error else 'completed',
+                'finished_at': datetime.now().isoformat(),
+                'result': result,
+                'error': error
+            })
+            done = self._done.get(job_id)
+        if done is not None:
+            done.set()
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond max_jobs (caller holds the lock)"""
+        finished = sorted(
+            (job for job in self._jobs.values() if job['status'] in ('completed', 'failed')),
+            key=lambda job: job['submitted_at']
+        )
+        for job in finished[:max(0, len(self._jobs) - self.max_jobs)]:
+            job_id = job['job_id']
+            self._jobs.pop(job_id, None)
+            self._futures.pop(job_id, None)
+            self._done.pop(job_id, None)
+            try:
+                os.remove(_progress_path(job_id, self.jobs_dir))
+            except OSError:
+                pass
+
+
+# Singleton instance
+training_jobs = TrainingJobRegistry()
@@ -11,6 +11,12 @@ from typing import Dict, List, Optional
 import pickle
 import os
 
+from ml.artifacts import artifact_store
+
+PROPHET_ARTIFACT_KIND = 'property_prophet'
+PROPHET_MODEL_NAME = 'price_predictor_v1'
+MODEL_FILE = 'model.json'
+
 
 class PropertyPriceForecaster:
     """
@@ -167,15 +173,37 @@ class PropertyPriceForecaster:
         
         return results
     
-    def save_model(self):
-        """Save trained model to disk"""
+    def save_model(self) -> Optional[str]:
+        """
+        Save the trained model as a new artifact version (Prophet's JSON
+        serialization, which survives library upgrades unlike a pickle)
+        
+        Returns:
+            The artifact version id
+        """
         if self.model:
-            os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
-            with open(self.model_path, 'wb') as f:
-                pickle.dump(self.model, f)
+            from prophet.serialize import model_to_json
+            
+            def write_json(path):
+                with open(path, 'w') as f:
+                    f.write(model_to_json(self.model))
+            
+            return artifact_store.save(
+                PROPHET_ARTIFACT_KIND,
+                PROPHET_MODEL_NAME,
+                files={MODEL_FILE: write_json},
+                metadata={'trained_at': datetime.now().isoformat()}
+            )
+        return None
     
     def load_model(self):
-        """Load trained model from disk"""
-        if os.path.exists(self.model_path):
+        """Load trained model from disk (versioned artifact first, then the legacy pickle)"""
+        manifest = artifact_store.load_manifest(PROPHET_ARTIFACT_KIND, PROPHET_MODEL_NAME)
+        if manifest is not None:
+            from prophet.serialize import model_from_json
+            
+            with open(os.path.join(manifest['dir'], MODEL_FILE), 'r') as f:
+                self.model = model_from_json(f.read())
+        elif os.path.exists(self.model_path):
             with open(self.model_path, 'rb') as f:
                 self.model = pickle.load(f)
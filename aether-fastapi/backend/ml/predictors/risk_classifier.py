@@ -6,16 +6,32 @@ Predicts cryptocurrency risk level (Low/Medium/High) based on risk features
 import xgboost as xgb
 import numpy as np
 import pandas as pd
-from typing import Dict, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 from sklearn.preprocessing import StandardScaler
 import pickle
 import os
+import threading
 import warnings
 warnings.filterwarnings('ignore')
 
+from ml.artifacts import artifact_store, scaler_from_arrays, scaler_to_arrays
+
+RISK_ARTIFACT_KIND = 'risk_classifier'
+RISK_MODEL_NAME = 'risk_classifier'
+MODEL_FILE = 'model.ubj'
+RISK_LEVELS = ['Low', 'Medium', 'High']
+# Risk score (0-100) is the probability-weighted average of these
+RISK_LEVEL_SCORES = np.array([25.0, 55.0, 85.0])
+
 
 class CryptoRiskClassifier:
-    """XGBoost-based risk classifier for cryptocurrencies"""
+    """
+    XGBoost-based risk classifier for cryptocurrencies
+
+    Predictions pick up a newly published artifact (e.g. from the training
+    pipeline) without a restart; until one exists they use the volatility
+    threshold fallback.
+    """
     
     # Risk level thresholds (based on volatility %)
     LOW_RISK_THRESHOLD = 20.0
@@ -27,6 +43,9 @@ class CryptoRiskClassifier:
         self.model_dir = model_dir
         self.feature_names = []
         self.model_trained = False
+        self.version: Optional[str] = None
+        self._loaded_mtime: Optional[float] = None
+        self._reload_lock = threading.Lock()
         
         # XGBoost parameters
         self.params = {
@@ -115,6 +134,7 @@ class CryptoRiskClassifier:
         Returns:
             Dict with risk_level, risk_score, and probabilities
         """
+        self.refresh()
         if not self.model_trained:
             # If model not trained, use simple volatility-based classification
             return self._fallback_prediction(features)
@@ -125,21 +145,32 @@ class CryptoRiskClassifier:
         
         # Get predictions
         probabilities = self.model.predict_proba(X_scaled)[0]
-        prediction = self.model.predict(X_scaled)[0]
-        
-        # Map prediction to risk level
-        risk_levels = ['Low', 'Medium', 'High']
-        risk_level = risk_levels[prediction]
+        return self._prediction_from_probabilities(probabilities)
+    
+    def predict_batch(self, X: np.ndarray, feature_names: List[str]) -> List[Dict]:
+        """
+        Predict risk levels for many assets with one predict_proba call
         
-        # Calculate risk score (0-100)
-        # Weighted average: Low=25, Medium=50, High=85
-        risk_score = (probabilities[0] * 25 + 
-                     probabilities[1] * 55 + 
-                     probabilities[2] * 85)
+        Args:
+            X: Feature matrix (n_assets, n_features)
+            feature_names: Column names of X
+            
+        Returns:
+            One prediction dict per row, as returned by predict
+        """
+        self.refresh()
+        if not self.model_trained:
+            return [self._fallback_prediction(dict(zip(feature_names, row))) for row in X]
         
+        columns = [feature_names.index(name) for name in self.feature_names]
+        X_scaled = self.scaler.transform(np.asarray(X, dtype=np.float64)[:, columns])
+        return [self._prediction_from_probabilities(p) for p in self.model.predict_proba(X_scaled)]
+    
+    def _prediction_from_probabilities(self, probabilities: np.ndarray) -> Dict:
+        """Risk level (most likely class) and weighted risk score from class probabilities"""
         return {
-            'risk_level': risk_level,
-            'risk_score': float(risk_score),
+            'risk_level': RISK_LEVELS[int(np.argmax(probabilities))],
+            'risk_score': float(probabilities @ RISK_LEVEL_SCORES),
             'probabilities': {
                 'low': float(probabilities[0]),
                 'medium': float(probabilities[1]),
@@ -235,36 +266,77 @@ class CryptoRiskClassifier:
         
         return top_factors
     
-    def save_model(self, filename: str = 'risk_classifier.pkl'):
-        """Save trained model to disk"""
-        if not self.model_trained:
-            print("No trained model to save")
+    def refresh(self):
+        """Load the published artifact if it changed since the last load (one stat otherwise)"""
+        mtime = artifact_store.current_mtime(RISK_ARTIFACT_KIND, RISK_MODEL_NAME)
+        if mtime is None or mtime == self._loaded_mtime:
             return
+        with self._reload_lock:
+            if mtime != self._loaded_mtime:
+                self.load_model(f'{RISK_MODEL_NAME}.pkl')
+                self._loaded_mtime = mtime
+    
+    def save_model(
+        self,
+        filename: str = 'risk_classifier.pkl',
+        training_data_hash: Optional[str] = None,
+        make_current: bool = True
+    ) -> Optional[str]:
+        """
+        Save the trained model as a new artifact version: the booster in
+        XGBoost's native UBJSON format, the scaler as memory-mappable arrays
         
-        os.makedirs(self.model_dir, exist_ok=True)
-        filepath = os.path.join(self.model_dir, filename)
-        
-        model_data = {
-            'model': self.model,
-            'scaler': self.scaler,
-            'feature_names': self.feature_names,
-            'params': self.params
-        }
-        
-        with open(filepath, 'wb') as f:
-            pickle.dump(model_data, f)
+        Returns:
+            The artifact version id
+        """
+        if not self.model_trained:
+            print("No trained model to save")
+            return None
+        
+        scaler_arrays, scaler_settings = scaler_to_arrays(self.scaler)
+        version = artifact_store.save(
+            RISK_ARTIFACT_KIND,
+            os.path.splitext(filename)[0],
+            tensors=scaler_arrays,
+            files={MODEL_FILE: self.model.save_model},
+            metadata={
+                'feature_names': list(self.feature_names),
+                'params': self.params,
+                'scaler': scaler_settings
+            },
+            training_data_hash=training_data_hash,
+            make_current=make_current
+        )
         
-        print(f"Model saved to {filepath}")
+        print(f"Model saved as {RISK_ARTIFACT_KIND}/{os.path.splitext(filename)[0]} (version {version})")
+        return version
     
     def load_model(self, filename: str = 'risk_classifier.pkl') -> bool:
-        """Load trained model from disk"""
-        filepath = os.path.join(self.model_dir, filename)
-        
-        if not os.path.exists(filepath):
-            print(f"Model file not found: {filepath}")
-            return False
-        
+        """Load the trained model (versioned artifact first, then the legacy pickle)"""
         try:
+            loaded = artifact_store.load_tensors(RISK_ARTIFACT_KIND, os.path.splitext(filename)[0])
+            if loaded is not None:
+                tensors, manifest = loaded
+                metadata = manifest['metadata']
+                
+                model = xgb.XGBClassifier()
+                model.load_model(os.path.join(manifest['dir'], MODEL_FILE))
+                scaler = scaler_from_arrays(tensors, metadata['scaler'])
+                
+                self.model, self.scaler = model, scaler
+                self.feature_names = metadata['feature_names']
+                self.params = metadata['params']
+                self.version = manifest['version']
+                self.model_trained = True
+                
+                print(f"Model loaded from {manifest['dir']}")
+                return True
+            
+            filepath = os.path.join(self.model_dir, filename)
+            if not os.path.exists(filepath):
+                print(f"Model file not found: {filepath}")
+                return False
+            
             with open(filepath, 'rb') as f:
                 model_data = pickle.load(f)
             
@@ -279,3 +351,7 @@ class CryptoRiskClassifier:
         except Exception as e:
             print(f"Error loading model: {e}")
             return False
+
+
+# Singleton instance
+risk_classifier = CryptoRiskClassifier()
@@ -0,0 +1,237 @@
+"""
+Crypto Universe Risk Classification
+Scores every tracked symbol's risk in one batch and caches the results per day
+"""
+
+import os
+import glob
+import json
+import asyncio
+import time
+import numpy as np
+from datetime import datetime
+from typing import Dict, List, Optional
+import logging
+
+from ml.data.data_collector import CryptoDataCollector
+from ml.data.feature_store import feature_store, utc_today
+from ml.data.risk_features import RiskFeatureEngineer, RISK_FEATURE_NAMES
+from ml.predictors.risk_classifier import risk_classifier, RISK_LEVELS
+
+logger = logging.getLogger(__name__)
+
+UNIVERSE_DIR = os.path.join(os.path.dirname(__file__), '../cache/risk_universe')
+MIN_HISTORY = 100
+# Seconds a partial result (symbols missing or on synthetic data) is reused before rescoring
+PARTIAL_RETRY_SECONDS = 600
+
+
+def format_risk_result(symbol: str, prediction: Dict, features: Dict[str, float], top_factors: List[Dict]) -> Dict:
+    """Risk classification response for one symbol (without timestamp)"""
+    current_volatility = features.get('historical_volatility', 0)
+    ewm_volatility = features.get('ewm_volatility', 0)
+
+    # Simple forecast: blend current and EWM; longer-term tends toward EWM
+    forecast_7d = (current_volatility + ewm_volatility) / 2
+    forecast_30d = ewm_volatility
+
+    return {
+        "symbol": symbol,
+        "risk_level": prediction['risk_level'],
+        "risk_score": round(prediction['risk_score'], 1),
+        "probabilities": {
+            "low": round(prediction['probabilities']['low'], 3),
+            "medium": round(prediction['probabilities']['medium'], 3),
+            "high": round(prediction['probabilities']['high'], 3)
+        },
+        "volatility": {
+            "current": round(current_volatility, 2),
+            "forecast_7d": round(forecast_7d, 2),
+            "forecast_30d": round(forecast_30d, 2)
+        },
+        "top_risk_factors": [
+            {
+                "factor": f['factor'].replace('_', ' ').title(),
+                "value": round(f.get('value', 0), 2),
+                "impact": round(f['impact'], 3)
+            }
+            for f in top_factors
+        ],
+        "model_trained": prediction['model_trained']
+    }
+
+
+class RiskUniverseClassifier:
+    """
+    Batch risk classification for all tracked symbols
+
+    Risk features for the whole universe are computed as one matrix (BTC is
+    the shared correlation benchmark) and scored with a single
+    predict_proba call. Results are cached per UTC day in memory and on
+    disk, and portfolio risk is aggregated from that cache (rescored when a
+    new classifier version is published). Symbols whose features could not be
+    fetched or came from synthetic fallback data are skipped, and such a
+    partial result is only reused briefly, never persisted.
+    """
+
+    def __init__(self, symbols: Optional[List[str]] = None, cache_dir: str = UNIVERSE_DIR):
+        self.symbols = symbols or list(CryptoDataCollector.SYMBOL_MAP)
+        self.cache_dir = cache_dir
+        self.feature_engineer = RiskFeatureEngineer()
+        self._results: Dict[str, Dict] = {}
+        self._retry_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def _cache_path(self, as_of: str) -> str:
+        return os.path.join(self.cache_dir, f"{as_of}.json")
+
+    def _load_cached(self, as_of: str) -> Optional[Dict]:
+        path = self._cache_path(as_of)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable risk cache {path}: {e}")
+            return None
+
+    def _save_cached(self, as_of: str, results: Dict):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._cache_path(as_of)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(results, f)
+        os.replace(tmp_path, path)
+        for old_path in glob.glob(os.path.join(self.cache_dir, '*.json')):
+            if old_path != path:
+                os.remove(old_path)
+
+    def _score(self, entries: Dict, as_of: str) -> Dict:
+        """Feature matrix for every symbol with enough history, then one batch prediction"""
+        missing = [s for s in self.symbols if s not in entries]
+        synthetic = [s for s in self.symbols if s in entries and entries[s].synthetic]
+        symbols = [
+            s for s in self.symbols
+            if s in entries and s not in synthetic and len(entries[s]) >= MIN_HISTORY
+        ]
+        skipped = [s for s in self.symbols if s not in symbols]
+        results = {
+            'as_of': as_of,
+            'model_version': risk_classifier.version,
+            'generated_at': datetime.now().isoformat(),
+            'symbols': {},
+            'skipped': skipped,
+            'missing_skipped': missing,
+            'synthetic_skipped': synthetic
+        }
+        if not symbols:
+            return results
+
+        # Front-pad shorter histories so the newest day lines up
+        length = max(len(entries[s]) for s in symbols)
+        prices = np.full((len(symbols), length), np.nan)
+        volumes = np.full((len(symbols), length), np.nan)
+        for i, symbol in enumerate(symbols):
+            columns = entries[symbol].columns
+            prices[i, length - len(columns['price']):] = columns['price']
+            volumes[i, length - len(columns['volume']):] = columns['volume']
+
+        btc_prices = entries['BTC'].columns['price'] if 'BTC' in symbols else None
+        X = self.feature_engineer.engineer_feature_matrix(
+            prices, volumes, btc_prices,
+            benchmark_rows=np.array([s == 'BTC' for s in symbols])
+        )
+        predictions = risk_classifier.predict_batch(X, RISK_FEATURE_NAMES)
+
+        for symbol, row, prediction in zip(symbols, X, predictions):
+            features = dict(zip(RISK_FEATURE_NAMES, row.tolist()))
+            top_factors = risk_classifier.get_top_risk_factors(features, 5)
+            results['symbols'][symbol] = format_risk_result(symbol, prediction, features, top_factors)
+        return results
+
+    async def classify(self, as_of: Optional[str] = None) -> Dict:
+        """Risk classification for the whole universe, computed at most once per day"""
+        as_of = as_of or utc_today()
+        await asyncio.to_thread(risk_classifier.refresh)
+        if self._cached(as_of):
+            return self._results[as_of]
+
+        async with self._lock:
+            if self._cached(as_of):
+                return self._results[as_of]
+
+            results = await asyncio.to_thread(self._load_cached, as_of)
+            self._retry_at = None
+            if results is None or results.get('model_version') != risk_classifier.version:
+                entries = await feature_store.get_many(self.symbols, as_of)
+                results = await asyncio.to_thread(self._score, entries, as_of)
+                if results['missing_skipped'] or results['synthetic_skipped']:
+                    self._retry_at = time.time() + PARTIAL_RETRY_SECONDS
+                else:
+                    await asyncio.to_thread(self._save_cached, as_of, results)
+
+            self._results = {as_of: results}
+            return results
+
+    def _cached(self, as_of: str) -> bool:
+        return (
+            as_of in self._results
+            and self._results[as_of].get('model_version') == risk_classifier.version
+            and (self._retry_at is None or time.time() < self._retry_at)
+        )
+
+    async def portfolio(self, weights: Dict[str, float]) -> Dict:
+        """
+        Aggregate risk of a portfolio from the day's universe results
+
+        Args:
+            weights: Symbol to position weight (normalized to sum to 1)
+
+        Returns:
+            Weighted risk score, probabilities and volatility, plus each holding
+        """
+        universe = await self.classify()
+        missing = [s for s in weights if s not in universe['symbols']]
+        if missing:
+            raise ValueError(f"No risk classification for: {', '.join(missing)}")
+
+        total = sum(weights.values())
+        if total <= 0:
+            raise ValueError("Portfolio weights must sum to a positive value")
+
+        holdings = []
+        probabilities = np.zeros(len(RISK_LEVELS))
+        risk_score = 0.0
+        volatility = 0.0
+        for symbol, weight in weights.items():
+            result = universe['symbols'][symbol]
+            weight = weight / total
+            probabilities += weight * np.array([result['probabilities'][level.lower()] for level in RISK_LEVELS])
+            risk_score += weight * result['risk_score']
+            volatility += weight * result['volatility']['current']
+            holdings.append({
+                'symbol': symbol,
+                'weight': round(weight, 4),
+                'risk_level': result['risk_level'],
+                'risk_score': result['risk_score'],
+                'volatility': result['volatility']['current']
+            })
+
+        holdings.sort(key=lambda h: h['weight'] * h['risk_score'], reverse=True)
+        return {
+            'as_of': universe['as_of'],
+            'risk_level': RISK_LEVELS[int(np.argmax(probabilities))],
+            'risk_score': round(risk_score, 1),
+            'probabilities': {
+                level.lower(): round(float(p), 3) for level, p in zip(RISK_LEVELS, probabilities)
+            },
+            # Upper bound: ignores diversification between holdings
+            'weighted_volatility': round(volatility, 2),
+            'holdings': holdings,
+            'largest_risk_contributor': holdings[0]['symbol']
+        }
+
+
+# Singleton instance
+risk_universe = RiskUniverseClassifier()
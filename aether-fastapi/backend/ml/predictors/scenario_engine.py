@@ -1,85 +1,160 @@
 """
 Crypto Scenario Engine
-Simulates "What-If" scenarios for a portfolio based on historical correlations (Beta)
+Simulates "What-If" scenarios for a portfolio based on historical betas against the tracked universe
 """
 
+import asyncio
 import pandas as pd
 import numpy as np
 import logging
 from typing import Dict, List, Optional
 from datetime import datetime
 
-from services.coingecko_service import fetch_historical_prices
+from ml.data.cross_asset import align_prices, grid_returns, pairwise_covariance
+from services.coingecko_service import fetch_historical_prices, SYMBOL_TO_ID
 
 logger = logging.getLogger(__name__)
 
+STABLECOINS = ("USDT", "USDC", "DAI")
+# Sensitivity assumed for assets with no return history
+FALLBACK_BETA = 0.5
+# Concurrent CoinGecko requests (the free tier rate-limits bursts)
+FETCH_CONCURRENCY = 2
+# Minutes a matrix missing universe symbols (e.g. after 429s) is reused before refetching
+PARTIAL_CACHE_MINUTES = 15
+
+
+class MarketMatrix:
+    """
+    Daily returns and their covariance for the whole tracked universe
+
+    Built once; any portfolio's correlations and betas are slices of it.
+    Covariances use every overlapping pair of days, so one short series
+    doesn't truncate the rest.
+    """
+
+    def __init__(self, returns: pd.DataFrame, updated_at: datetime):
+        self.returns = returns
+        self.symbols = list(returns.columns)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.covariance = pairwise_covariance(returns.to_numpy().T)[0]
+        self.variance = np.diag(self.covariance)
+        self.updated_at = updated_at
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.index
+
+    def correlation(self, symbols: Optional[List[str]] = None) -> pd.DataFrame:
+        """Correlation matrix for a subset (default: the whole universe)"""
+        symbols = [s for s in (symbols or self.symbols) if s in self.index]
+        rows = [self.index[s] for s in symbols]
+        covariance = self.covariance[np.ix_(rows, rows)]
+        std = np.sqrt(np.diag(covariance))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            correlation = covariance / np.outer(std, std)
+        return pd.DataFrame(correlation, index=symbols, columns=symbols)
+
+    def betas(self, assets: List[str], targets: List[str]) -> np.ndarray:
+        """
+        (n_assets, n_targets) betas cov(asset, target) / var(target)
+
+        An asset's beta to itself is 1; stablecoins are 0; pairs without
+        history are FALLBACK_BETA.
+        """
+        betas = np.full((len(assets), len(targets)), FALLBACK_BETA)
+        asset_rows = np.array([self.index.get(a, -1) for a in assets])
+        target_cols = np.array([self.index.get(t, -1) for t in targets])
+        known_assets = asset_rows >= 0
+        known_targets = target_cols >= 0
+        if known_assets.any() and known_targets.any():
+            rows, cols = asset_rows[known_assets], target_cols[known_targets]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                block = self.covariance[np.ix_(rows, cols)] / self.variance[cols]
+            betas[np.ix_(known_assets, known_targets)] = np.where(np.isfinite(block), block, FALLBACK_BETA)
+
+        betas[np.array(assets)[:, np.newaxis] == np.array(targets)[np.newaxis, :]] = 1.0
+        betas[np.isin(assets, STABLECOINS)] = 0.0
+        return betas
+
+
 class ScenarioSimulator:
     """
     AI Engine for simulating market scenarios on a portfolio.
-    Uses historical correlation (Beta) to predict how assets react to shocks.
+    Uses historical betas (covariance / target variance) to predict how
+    assets react to shocks.
     """
 
-    def __init__(self):
-        # Cache for correlation matrices: { "BTC,ETH,SOL": {matrix: df, updated_at: datetime} }
-        self.correlation_cache = {}
+    def __init__(self, universe: Optional[List[str]] = None, days: int = 90):
+        self.universe = universe or [s for s in SYMBOL_TO_ID if s not in STABLECOINS]
+        self.days = days
         self.cache_duration_hours = 24
+        self._matrix: Optional[MarketMatrix] = None
+        self._lock = asyncio.Lock()
 
-    async def _get_correlation_matrix(self, symbols: List[str], days: int = 90) -> Optional[pd.DataFrame]:
+    async def _fetch_returns(self) -> pd.DataFrame:
+        """Daily simple returns for every universe symbol, one column each"""
+        semaphore = asyncio.Semaphore(FETCH_CONCURRENCY)
+
+        async def fetch(symbol: str) -> Optional[pd.DataFrame]:
+            async with semaphore:
+                return await fetch_historical_prices(symbol, days=self.days)
+
+        frames = await asyncio.gather(*(fetch(s) for s in self.universe))
+        prices = {
+            symbol: pd.Series(df['price'].to_numpy(dtype=np.float64), index=pd.to_datetime(df['date']))
+            for symbol, df in zip(self.universe, frames) if df is not None and not df.empty
+        }
+        if not prices:
+            return pd.DataFrame()
+        # One as-of price per day (the trailing "now" point is not a daily close)
+        grid, aligned = align_prices(prices, {symbol: None for symbol in prices})
+        return pd.DataFrame(grid_returns(aligned).T, index=grid[1:], columns=list(prices))
+
+    async def get_market_matrix(self) -> Optional[MarketMatrix]:
         """
-        Fetch historical data and compute correlation matrix for standard list of assets
+        The universe's return/covariance matrix, rebuilt at most once per cache period
+
+        A matrix missing symbols whose fetch failed is rebuilt after
+        PARTIAL_CACHE_MINUTES instead.
         """
-        # Sort symbols to create a stable cache key
-        symbols = sorted(list(set([s.upper() for s in symbols])))
-        cache_key = ",".join(symbols)
-
-        # Check cache
-        if cache_key in self.correlation_cache:
-            entry = self.correlation_cache[cache_key]
-            if (datetime.now() - entry["updated_at"]).total_seconds() < 3600 * self.cache_duration_hours:
-                return entry["matrix"]
-
-        # Fetch data for all symbols
-        price_data = {}
-        
-        # Always include BTC and ETH as benchmarks for correlation
-        fetch_symbols = set(symbols)
-        fetch_symbols.add("BTC")
-        fetch_symbols.add("ETH")
-
-        for symbol in fetch_symbols:
-            # We skip stablecoins for efficiency, assume 0 correlation later
-            if symbol in ["USDT", "USDC", "DAI"]:
-                continue
-                
-            df = await fetch_historical_prices(symbol, days=days)
-            if df is not None and not df.empty:
-                # Set index to date to align series
-                df['date'] = pd.to_datetime(df['date'])
-                df.set_index('date', inplace=True)
-                # Store percentage returns, not raw prices, for correlation
-                price_data[symbol] = df['price'].pct_change()
-
-        if not price_data:
-            return None
-
-        # Create combined dataframe
-        combined_df = pd.DataFrame(price_data)
-        
-        # Calculate Correlation Matrix
-        correlation_matrix = combined_df.corr()
-
-        # Update Cache
-        self.correlation_cache[cache_key] = {
-            "matrix": correlation_matrix,
-            "updated_at": datetime.now()
-        }
+        matrix = self._matrix
+        if self._fresh(matrix):
+            return matrix
+
+        async with self._lock:
+            matrix = self._matrix
+            if self._fresh(matrix):
+                return matrix
+
+            returns = await self._fetch_returns()
+            if returns.empty:
+                # Serve a stale matrix rather than nothing during an outage
+                return self._matrix
+            missing = [s for s in self.universe if s not in returns.columns]
+            if missing:
+                logger.warning(f"Market matrix missing {', '.join(missing)}; retrying in {PARTIAL_CACHE_MINUTES} min")
+            self._matrix = MarketMatrix(returns, datetime.now())
+            return self._matrix
 
-        return correlation_matrix
+    def _fresh(self, matrix: Optional[MarketMatrix]) -> bool:
+        """Within the cache period; a matrix missing universe symbols only briefly"""
+        if matrix is None:
+            return False
+        complete = all(s in matrix for s in self.universe)
+        ttl = 3600 * self.cache_duration_hours if complete else 60 * PARTIAL_CACHE_MINUTES
+        return (datetime.now() - matrix.updated_at).total_seconds() < ttl
+
+    async def _holding_betas(self, symbols: List[str], targets: List[str]) -> np.ndarray:
+        matrix = await self.get_market_matrix()
+        if matrix is None:
+            # No history at all: every pair gets the fallback beta
+            matrix = MarketMatrix(pd.DataFrame(), datetime.now())
+        return matrix.betas(symbols, targets)
 
     async def simulate_shock(
-        self, 
-        holdings: List[Dict], 
-        shock_target: str, 
+        self,
+        holdings: List[Dict],
+        shock_target: str,
         shock_percent: float
     ) -> Dict:
         """
@@ -94,56 +169,35 @@ class ScenarioSimulator:
             Dict containing simulated new values and delta
         """
         shock_target = shock_target.upper()
-        symbols = [h["symbol"] for h in holdings]
-        
-        # Get correlations
-        corr_matrix = await self._get_correlation_matrix(symbols)
-        
+        symbols = [h["symbol"].upper() for h in holdings]
+        betas = (await self._holding_betas(symbols, [shock_target]))[:, 0]
+
         simulated_holdings = []
         total_current_value = 0
         total_simulated_value = 0
 
-        for holding in holdings:
-            symbol = holding["symbol"].upper()
+        for holding, symbol, beta in zip(holdings, symbols, betas):
             curr_val = holding.get("current_value", 0)
             quantity = holding.get("quantity", 0)
-            
-            # Stablecoins stay stable (approx)
-            if symbol in ["USDT", "USDC", "DAI"]:
-                implied_change = 0
-            
-            # The target asset moves exactly by the shock amount
-            elif symbol == shock_target:
-                implied_change = shock_percent
-                
-            # Other assets move based on correlation (Beta approx)
-            elif corr_matrix is not None and symbol in corr_matrix.index and shock_target in corr_matrix.columns:
-                # Simple Beta Proxy: Correlation * Volatility_Ratio (Assuming 1:1 volatility for MVP simplification)
-                # Or just use raw correlation as a "direction multiplier"
-                correlation = corr_matrix.loc[symbol, shock_target]
-                
-                # Logic: If BTC drops 10%, and ETH corr is 0.8, ETH drops 8%
-                # This is a simplification. Real Beta requires variance ratio.
-                # For a consumer "Simulator", Correlation * Shock is a decent "sensitivity" metric.
-                implied_change = correlation * shock_percent
-            else:
-                # Fallback if no data: Assume high correlation for crypto (0.7) or 0? 
-                # Let's be conservative and assume 0.5 correlation with major moves
-                implied_change = 0.5 * shock_percent
+
+            # If BTC drops 10% and ETH's beta to BTC is 1.2, ETH drops 12%
+            # (an asset can't lose more than everything)
+            implied_change = max(float(beta) * shock_percent, -100.0)
 
             # Calculate new value
             change_amount = curr_val * (implied_change / 100)
             sim_val = curr_val + change_amount
-            
+
             simulated_holdings.append({
                 "symbol": symbol,
                 "quantity": quantity,
                 "current_value": curr_val,
                 "simulated_value": sim_val,
                 "change_percent": implied_change,
-                "change_value": change_amount
+                "change_value": change_amount,
+                "beta": round(float(beta), 3)
             })
-            
+
             total_current_value += curr_val
             total_simulated_value += sim_val
 
@@ -155,5 +209,61 @@ class ScenarioSimulator:
             "holdings": simulated_holdings
         }
 
+    async def simulate_grid(
+        self,
+        holdings: List[Dict],
+        shock_targets: List[str],
+        shock_percents: List[float]
+    ) -> Dict:
+        """
+        Stress surface: every shock target x magnitude, evaluated at once
+
+        Args:
+            holdings: List of dicts {symbol, quantity, current_value}
+            shock_targets: Symbols to shock (e.g. ["BTC", "ETH"])
+            shock_percents: Magnitudes (e.g. [-50, -20, -10, 10])
+
+        Returns:
+            Portfolio change (percent and value) for each (target, magnitude),
+            each holding's change per scenario, and the betas used
+        """
+        targets = [t.upper() for t in shock_targets]
+        symbols = [h["symbol"].upper() for h in holdings]
+        values = np.array([h.get("current_value", 0) for h in holdings], dtype=np.float64)
+        magnitudes = np.asarray(shock_percents, dtype=np.float64)
+
+        betas = await self._holding_betas(symbols, targets)
+        # (holdings, targets, magnitudes) percent moves, floored at a total loss
+        changes = np.maximum(betas[:, :, np.newaxis] * magnitudes, -100.0)
+        change_values = np.einsum('h,htm->tm', values, changes) / 100
+        total = values.sum()
+        total_change_percent = change_values / total * 100 if total else np.zeros_like(change_values)
+
+        worst = np.unravel_index(np.argmin(change_values), change_values.shape)
+        return {
+            "shock_targets": targets,
+            "shock_percents": magnitudes.tolist(),
+            "total_current_value": round(float(total), 2),
+            # [target][magnitude]
+            "total_change_percent": np.round(total_change_percent, 2).tolist(),
+            "total_change_value": np.round(change_values, 2).tolist(),
+            "worst_scenario": {
+                "shock_target": targets[worst[0]],
+                "shock_percent": float(magnitudes[worst[1]]),
+                "total_change_percent": round(float(total_change_percent[worst]), 2),
+                "total_change_value": round(float(change_values[worst]), 2)
+            },
+            "holdings": [
+                {
+                    "symbol": symbol,
+                    "current_value": float(value),
+                    "betas": dict(zip(targets, np.round(betas[i], 3).tolist())),
+                    # [target][magnitude]
+                    "change_percent": np.round(changes[i], 2).tolist()
+                }
+                for i, (symbol, value) in enumerate(zip(symbols, values))
+            ]
+        }
+
 # Singleton
 scenario_simulator = ScenarioSimulator()
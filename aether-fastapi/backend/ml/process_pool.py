@@ -0,0 +1,57 @@
+"""
+Shared Process Pool
+Lazily created worker pool for CPU-bound model fits that should not run in the web process
+"""
+
+import os
+import atexit
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _default_workers() -> int:
+    """Half the cores by default so the pool never starves the uvicorn workers"""
+    configured = os.getenv('ML_PROCESS_WORKERS')
+    if configured:
+        return max(1, int(configured))
+    return max(1, (os.cpu_count() or 2) // 2)
+
+
+def pool_workers() -> int:
+    """Number of worker processes the pool runs (or will run once created)"""
+    return _pool._max_workers if _pool is not None else _default_workers()
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Return the process-wide ML worker pool, creating it on first use.
+
+    Uses the 'spawn' start method: forking a process that already runs
+    uvicorn/asyncio threads is unsafe, and spawned workers import only what
+    the submitted task needs.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=_default_workers(),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _pool
+
+
+def shutdown_process_pool():
+    """Shut the pool down (called automatically at interpreter exit)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+atexit.register(shutdown_process_pool)
@@ -3,14 +3,33 @@ Anomaly Detection for Stock Portfolio
 Uses Isolation Forest + Z-score to detect unusual price/volume movements
 """
 
+import os
+import json
+import pickle
+import threading
 import numpy as np
+import pandas as pd
 import yfinance as yf
+from concurrent.futures import ThreadPoolExecutor
 from sklearn.ensemble import IsolationForest
 from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
 import logging
 
+from ml.artifacts import artifact_store
+
 logger = logging.getLogger(__name__)
 
+ANOMALY_ARTIFACT_KIND = 'share_anomaly'
+FOREST_FILE = 'forest.pkl'
+FEATURES = ['returns', 'volume_change', 'price_range', 'gap']
+HISTORY_DAYS = 180
+# Refit each ticker's forest (and reset its z-score baselines) this often
+REFIT_DAYS = 7
+# Don't ask yfinance for new bars more often than this
+RECHECK_MINUTES = 15
+MAX_WORKERS = 8
+
 
 def _safe_float(val):
     """Convert a value to a JSON-safe float (replace NaN/Inf with 0.0)."""
@@ -20,15 +39,106 @@ def _safe_float(val):
     return f
 
 
+def _download(ticker: str, start: datetime, end: datetime) -> pd.DataFrame:
+    """Daily OHLCV bars with flat column names"""
+    df = yf.download(ticker, start=start, end=end, progress=False)
+    if hasattr(df.columns, 'levels'):
+        df.columns = df.columns.get_level_values(0)
+    return df
+
+
+def _write_forest(forest: IsolationForest, path: str):
+    with open(path, 'wb') as f:
+        pickle.dump(forest, f)
+
+
+def _feature_frame(df: pd.DataFrame, prev_close: Optional[float] = None, prev_volume: Optional[float] = None) -> pd.DataFrame:
+    """
+    Anomaly features per bar; the previous close/volume (from the last
+    scored bar) lets the first new bar be scored too
+    """
+    close = df['Close'].astype(float)
+    volume = df['Volume'].astype(float)
+    prior_close = close.shift(1)
+    prior_volume = volume.shift(1)
+    if prev_close is not None and len(df):
+        prior_close.iloc[0] = prev_close
+        prior_volume.iloc[0] = prev_volume
+
+    features = pd.DataFrame({
+        'returns': close / prior_close - 1,
+        'volume_change': volume / prior_volume - 1,
+        'price_range': (df['High'] - df['Low']) / close,
+        'gap': (df['Open'] - prior_close) / prior_close,
+        'close': close,
+        'volume': volume,
+    }, index=df.index)
+    return features.dropna()
+
+
+class RunningMoments:
+    """Count, mean and sum of squared deviations, updated one value at a time (Welford)"""
+
+    def __init__(self, count: int = 0, mean: float = 0.0, m2: float = 0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def update(self, x: float):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+
+    def zscore(self, x: float) -> float:
+        """|x - mean| / sample std (NaN until two values)"""
+        if self.count < 2:
+            return np.nan
+        std = np.sqrt(self.m2 / (self.count - 1))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return float(np.abs((x - self.mean) / np.float64(std)))
+
+    def to_dict(self) -> Dict:
+        return {'count': self.count, 'mean': self.mean, 'm2': self.m2}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'RunningMoments':
+        return cls(data['count'], data['mean'], data['m2'])
+
+
 class AnomalyDetector:
-    """Detect anomalies in stock price and volume data using Isolation Forest."""
+    """
+    Detect anomalies in stock price and volume data using Isolation Forest.
 
-    def __init__(self, contamination: float = 0.05):
+    Each ticker's forest is persisted as an artifact and refit every
+    REFIT_DAYS on the last HISTORY_DAYS of bars. Between refits only bars
+    newer than the last scored one are downloaded and scored; the z-score
+    baselines are running moments and the detected events are stored with
+    the ticker's state. Today's still-open bar is scored on every check but
+    only committed once it has closed. Tickers are processed in parallel.
+    """
+
+    def __init__(
+        self,
+        contamination: float = 0.05,
+        state_dir: Optional[str] = None,
+        refit_days: int = REFIT_DAYS,
+        max_workers: int = MAX_WORKERS
+    ):
         """
         Args:
             contamination: Expected proportion of anomalies (default 5%)
+            state_dir: Where per-ticker scoring state is kept
+            refit_days: Refit a ticker's forest after this many days
+            max_workers: Tickers processed concurrently
         """
         self.contamination = contamination
+        self.state_dir = state_dir or os.path.join(os.path.dirname(__file__), '../cache/anomalies')
+        self.refit_days = refit_days
+        self.max_workers = max_workers
+        self._forests: Dict[str, Tuple[str, IsolationForest]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
 
     def detect(self, tickers: list) -> dict:
         """
@@ -43,9 +153,12 @@ class AnomalyDetector:
         all_events = []
         ticker_summaries = {}
 
-        for ticker in tickers:
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(tickers)))) as executor:
+            futures = {ticker: executor.submit(self._detect_for_ticker, ticker) for ticker in tickers}
+
+        for ticker, future in futures.items():
             try:
-                events, summary = self._detect_for_ticker(ticker)
+                events, summary = future.result()
                 all_events.extend(events)
                 ticker_summaries[ticker] = summary
             except Exception as e:
@@ -80,106 +193,246 @@ class AnomalyDetector:
             'generated_at': datetime.now().isoformat()
         }
 
+    # ------------------------------------------------------------------
+    # Per-ticker state
+    # ------------------------------------------------------------------
+
+    def _ticker_lock(self, ticker: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(ticker, threading.Lock())
+
+    def _state_path(self, ticker: str) -> str:
+        return os.path.join(self.state_dir, f"{ticker.upper()}.json")
+
+    def _read_state(self, ticker: str) -> Optional[Dict]:
+        try:
+            with open(self._state_path(ticker), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_state(self, ticker: str, state: Dict):
+        os.makedirs(self.state_dir, exist_ok=True)
+        path = self._state_path(ticker)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    def _load_forest(self, ticker: str, version: str) -> Optional[IsolationForest]:
+        cached = self._forests.get(ticker)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        directory = artifact_store.version_dir(ANOMALY_ARTIFACT_KIND, ticker, version)
+        if directory is None:
+            return None
+        with open(os.path.join(directory, FOREST_FILE), 'rb') as f:
+            forest = pickle.load(f)
+        self._forests[ticker] = (version, forest)
+        return forest
+
+    def _needs_refit(self, state: Optional[Dict]) -> bool:
+        if state is None or state.get('contamination') != self.contamination:
+            return True
+        fitted_on = datetime.fromisoformat(state['fitted_on'])
+        return datetime.now() - fitted_on >= timedelta(days=self.refit_days)
+
     def _detect_for_ticker(self, ticker: str) -> tuple:
         """Run anomaly detection for a single ticker."""
+        with self._ticker_lock(ticker):
+            state = self._read_state(ticker)
+            forest = None
+            if not self._needs_refit(state):
+                forest = self._load_forest(ticker, state['version'])
 
-        # Fetch 6 months of data
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=180)
-        df = yf.download(ticker, start=start_date, end=end_date, progress=False)
+            if forest is None:
+                state, forest = self._refit(ticker)
+            elif datetime.now() - datetime.fromisoformat(state['last_checked']) >= timedelta(minutes=RECHECK_MINUTES):
+                state = self._advance(ticker, state, forest)
+
+        events = state['events'] + state['live']['events']
+        points = state['score_count'] + state['live']['points']
+        score_sum = state['score_sum'] + state['live']['score_sum']
+        summary = {
+            'status': 'ok',
+            'anomalies_found': len(events),
+            'data_points_analyzed': points,
+            'avg_anomaly_score': round(_safe_float(score_sum / points), 4) if points else 0.0
+        }
+        return events, summary
 
+    def _refit(self, ticker: str) -> Tuple[Dict, IsolationForest]:
+        """Fit a new forest on the last HISTORY_DAYS of closed bars and rescore them"""
+        end_date = datetime.now()
+        df = _download(ticker, end_date - timedelta(days=HISTORY_DAYS), end_date)
         if df.empty or len(df) < 30:
             raise ValueError(f"Insufficient data for {ticker}")
 
-        # Flatten MultiIndex columns if present
-        if hasattr(df.columns, 'levels'):
-            df.columns = df.columns.get_level_values(0)
-
-        # Compute features
-        df['returns'] = df['Close'].pct_change()
-        df['volume_change'] = df['Volume'].pct_change()
-        df['price_range'] = (df['High'] - df['Low']) / df['Close']
-        df['gap'] = (df['Open'] - df['Close'].shift(1)) / df['Close'].shift(1)
-        df = df.dropna()
-
-        if len(df) < 20:
+        features = _feature_frame(df)
+        closed, live = self._split_live(features)
+        if len(closed) < 20:
             raise ValueError(f"Not enough data points for {ticker} after feature computation")
 
-        # Feature matrix for Isolation Forest
-        features = df[['returns', 'volume_change', 'price_range', 'gap']].values
-
-        # Run Isolation Forest
-        iso_forest = IsolationForest(
+        forest = IsolationForest(
             contamination=self.contamination,
             random_state=42,
             n_estimators=100
         )
-        anomaly_labels = iso_forest.fit_predict(features)
-        anomaly_scores = iso_forest.decision_function(features)
+        forest.fit(closed[FEATURES].values)
+        version = artifact_store.save(
+            ANOMALY_ARTIFACT_KIND,
+            ticker,
+            files={FOREST_FILE: lambda path: _write_forest(forest, path)},
+            metadata={'contamination': self.contamination, 'n_samples': len(closed)}
+        )
+        self._forests[ticker] = (version, forest)
+
+        # Baselines over the whole fit window, as the scores below assume
+        moments = {'returns': RunningMoments(), 'volume_change': RunningMoments()}
+        for name, baseline in moments.items():
+            for value in closed[name].values:
+                baseline.update(float(value))
+
+        state = {
+            'version': version,
+            'contamination': self.contamination,
+            'fitted_on': datetime.now().isoformat(),
+            'moments': {name: baseline.to_dict() for name, baseline in moments.items()},
+            'score_sum': 0.0,
+            'score_count': 0,
+            'events': [],
+        }
+        self._score_closed(ticker, state, forest, closed, moments, update_moments=False)
+        self._score_live(ticker, state, forest, live)
+        self._write_state(ticker, state)
+        return state, forest
+
+    def _advance(self, ticker: str, state: Dict, forest: IsolationForest) -> Dict:
+        """Score only the bars after the last committed one"""
+        last_date = datetime.fromisoformat(state['last_date'])
+        df = _download(ticker, last_date + timedelta(days=1), datetime.now())
+        closed = live = pd.DataFrame()
+        if not df.empty:
+            features = _feature_frame(df, state['last_close'], state['last_volume'])
+            closed, live = self._split_live(features[features.index > pd.Timestamp(last_date)])
+        moments = {name: RunningMoments.from_dict(m) for name, m in state['moments'].items()}
+        self._score_closed(ticker, state, forest, closed, moments, update_moments=True)
+        self._score_live(ticker, state, forest, live)
+        self._write_state(ticker, state)
+        return state
+
+    def _split_live(self, features: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Closed bars, and today's bar (still trading) if present"""
+        today = pd.Timestamp(datetime.now().date())
+        is_live = features.index >= today
+        return features[~is_live], features[is_live]
 
-        # Z-scores for interpretability
-        returns_zscore = np.abs((df['returns'] - df['returns'].mean()) / df['returns'].std())
-        volume_zscore = np.abs((df['volume_change'] - df['volume_change'].mean()) / df['volume_change'].std())
+    def _score_closed(
+        self,
+        ticker: str,
+        state: Dict,
+        forest: IsolationForest,
+        closed: pd.DataFrame,
+        moments: Dict[str, RunningMoments],
+        update_moments: bool
+    ):
+        """Score closed bars and commit them (events, score totals, baselines, last bar)"""
+        if len(closed):
+            events, scores = self._score(ticker, forest, closed, moments, update_moments)
+            state['events'].extend(events)
+            state['score_sum'] += float(np.sum(scores))
+            state['score_count'] += len(closed)
+            state['last_date'] = closed.index[-1].isoformat()
+            state['last_close'] = float(closed['close'].iloc[-1])
+            state['last_volume'] = float(closed['volume'].iloc[-1])
+
+        # Keep events from the analysis window only
+        cutoff = (datetime.fromisoformat(state['last_date']) - timedelta(days=HISTORY_DAYS)).strftime('%Y-%m-%d')
+        state['events'] = [e for e in state['events'] if e['date'] >= cutoff]
+        state['moments'] = {name: baseline.to_dict() for name, baseline in moments.items()}
+        state['last_checked'] = datetime.now().isoformat()
+
+    def _score_live(self, ticker: str, state: Dict, forest: IsolationForest, live: pd.DataFrame):
+        """Score today's bar against copies of the baselines; nothing is committed"""
+        moments = {name: RunningMoments.from_dict(m) for name, m in state['moments'].items()}
+        events, scores = self._score(ticker, forest, live, moments, update_moments=True) if len(live) else ([], [])
+        state['live'] = {'events': events, 'points': len(live), 'score_sum': float(np.sum(scores))}
+
+    def _score(
+        self,
+        ticker: str,
+        forest: IsolationForest,
+        features: pd.DataFrame,
+        moments: Dict[str, RunningMoments],
+        update_moments: bool
+    ) -> Tuple[List[Dict], np.ndarray]:
+        """Anomaly events and decision scores for a block of bars"""
+        X = features[FEATURES].values
+        anomaly_labels = forest.predict(X)
+        anomaly_scores = forest.decision_function(X)
 
-        # Collect anomaly events
         events = []
-        anomaly_indices = np.where(anomaly_labels == -1)[0]
-
-        for idx in anomaly_indices:
-            row = df.iloc[idx]
-            date_str = row.name.strftime('%Y-%m-%d')
-            r_z = _safe_float(returns_zscore.iloc[idx])
-            v_z = _safe_float(volume_zscore.iloc[idx])
-            ret = _safe_float(row['returns'])
-            vol_chg = _safe_float(row['volume_change'])
-            score = _safe_float(anomaly_scores[idx])
-
-            # Determine anomaly type and severity
-            if r_z > v_z:
-                anomaly_type = 'price'
-                detail_val = ret * 100
-                if abs(ret) > 0.05:
-                    severity = 'high'
-                    description = f"{ticker} had a {'surge' if ret > 0 else 'drop'} of {detail_val:+.1f}% — significantly outside normal range"
-                elif abs(ret) > 0.03:
-                    severity = 'medium'
-                    description = f"{ticker} moved {detail_val:+.1f}% — an unusual price swing"
-                else:
-                    severity = 'low'
-                    description = f"{ticker} showed abnormal price behavior ({detail_val:+.1f}%)"
+        for idx in range(len(features)):
+            row = features.iloc[idx]
+            if update_moments:
+                moments['returns'].update(float(row['returns']))
+                moments['volume_change'].update(float(row['volume_change']))
+            if anomaly_labels[idx] != -1:
+                continue
+
+            # Z-scores for interpretability
+            r_z = _safe_float(moments['returns'].zscore(row['returns']))
+            v_z = _safe_float(moments['volume_change'].zscore(row['volume_change']))
+            events.append(self._event(ticker, row, r_z, v_z, _safe_float(anomaly_scores[idx])))
+        return events, anomaly_scores
+
+    def _event(self, ticker: str, row: pd.Series, r_z: float, v_z: float, score: float) -> Dict:
+        """Describe one anomalous bar"""
+        date_str = row.name.strftime('%Y-%m-%d')
+        ret = _safe_float(row['returns'])
+        vol_chg = _safe_float(row['volume_change'])
+
+        # Determine anomaly type and severity
+        if r_z > v_z:
+            anomaly_type = 'price'
+            detail_val = ret * 100
+            if abs(ret) > 0.05:
+                severity = 'high'
+                description = f"{ticker} had a {'surge' if ret > 0 else 'drop'} of {detail_val:+.1f}% — significantly outside normal range"
+            elif abs(ret) > 0.03:
+                severity = 'medium'
+                description = f"{ticker} moved {detail_val:+.1f}% — an unusual price swing"
             else:
-                anomaly_type = 'volume'
-                vol_multiple = abs(vol_chg) + 1
-                if vol_multiple > 3:
-                    severity = 'high'
-                    description = f"{ticker} volume spiked {vol_multiple:.1f}x above normal — possible institutional activity"
-                elif vol_multiple > 2:
-                    severity = 'medium'
-                    description = f"{ticker} volume was {vol_multiple:.1f}x normal — unusual trading activity"
-                else:
-                    severity = 'low'
-                    description = f"{ticker} had slightly abnormal volume ({vol_multiple:.1f}x)"
-
-            events.append({
-                'date': date_str,
-                'ticker': ticker,
-                'type': anomaly_type,
-                'severity': severity,
-                'description': description,
-                'metrics': {
-                    'price_change': round(ret * 100, 2),
-                    'volume_change': round(vol_chg * 100, 2),
-                    'anomaly_score': round(score, 4),
-                    'price_zscore': round(r_z, 2),
-                    'volume_zscore': round(v_z, 2)
-                }
-            })
+                severity = 'low'
+                description = f"{ticker} showed abnormal price behavior ({detail_val:+.1f}%)"
+        else:
+            anomaly_type = 'volume'
+            vol_multiple = abs(vol_chg) + 1
+            if vol_multiple > 3:
+                severity = 'high'
+                description = f"{ticker} volume spiked {vol_multiple:.1f}x above normal — possible institutional activity"
+            elif vol_multiple > 2:
+                severity = 'medium'
+                description = f"{ticker} volume was {vol_multiple:.1f}x normal — unusual trading activity"
+            else:
+                severity = 'low'
+                description = f"{ticker} had slightly abnormal volume ({vol_multiple:.1f}x)"
 
-        summary = {
-            'status': 'ok',
-            'anomalies_found': len(events),
-            'data_points_analyzed': len(df),
-            'avg_anomaly_score': round(_safe_float(np.mean(anomaly_scores)), 4)
+        return {
+            'date': date_str,
+            'ticker': ticker,
+            'type': anomaly_type,
+            'severity': severity,
+            'description': description,
+            'metrics': {
+                'price_change': round(ret * 100, 2),
+                'volume_change': round(vol_chg * 100, 2),
+                'anomaly_score': round(score, 4),
+                'price_zscore': round(r_z, 2),
+                'volume_zscore': round(v_z, 2)
+            }
         }
 
-        return events, summary
+
+# Singleton instance
+anomaly_detector = AnomalyDetector()
@@ -0,0 +1,216 @@
+"""
+Walk-Forward Backtester for Share Price Models
+Computes rolling-origin RMSE/MAE/MAPE off the request path and persists them
+per (ticker, model, horizon, as-of date)
+"""
+
+import os
+import json
+import threading
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from concurrent.futures import wait
+from datetime import datetime
+from typing import Dict, List, Optional
+import logging
+
+from ml.process_pool import get_process_pool
+from ml.shares.ets_forecaster import forecast_prices
+
+logger = logging.getLogger(__name__)
+
+# Backtest model name for each PricePredictor mode
+MODEL_FOR_MODE = {
+    'fast': 'ets',
+    'deep': 'ensemble',
+}
+
+MIN_TRAIN_DAYS = 60
+
+
+def _ensemble_origin_forecast(ticker: str, train_close: pd.Series, horizon: int) -> List[float]:
+    """Fit Prophet + ARIMA on one origin's training window (runs in a pool worker)"""
+    from ml.shares.price_predictor import PricePredictor
+
+    predictor = PricePredictor(ticker, horizon_days=horizon, mode='deep')
+    predictor.historical_data = train_close.to_frame('Close')
+    predictor.train_prophet()
+    predictor.train_arima()
+    return predictor.predict_ensemble()['predictions']
+
+
+def _error_metrics(actual: np.ndarray, predicted: np.ndarray) -> Dict[str, float]:
+    """Pooled RMSE / MAE / MAPE over every forecast step of every origin"""
+    errors = actual - predicted
+    return {
+        'rmse': float(np.sqrt(np.mean(errors ** 2))),
+        'mae': float(np.mean(np.abs(errors))),
+        'mape': float(np.mean(np.abs(errors / actual)) * 100),
+    }
+
+
+class BacktestStore:
+    """JSON-file store of backtest metrics, one file per ticker"""
+
+    # Keep this many as-of dates per (model, horizon)
+    MAX_AS_OF_ENTRIES = 5
+
+    def __init__(self, store_dir: Optional[str] = None):
+        self.store_dir = store_dir or os.path.join(os.path.dirname(__file__), '../cache/backtests')
+        os.makedirs(self.store_dir, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _path(self, ticker: str) -> str:
+        return os.path.join(self.store_dir, f"{ticker.upper()}.json")
+
+    def _read(self, ticker: str) -> Dict:
+        path = self._path(ticker)
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, ticker: str, model: str, horizon: int, as_of: Optional[str] = None) -> Optional[Dict]:
+        """
+        Return stored metrics for the exact as-of date, or the most recent
+        entry for (model, horizon) when as_of is None.
+        """
+        entries = self._read(ticker).get(f"{model}:{horizon}", {})
+        if not entries:
+            return None
+        if as_of is not None:
+            return entries.get(as_of)
+        return entries[max(entries)]
+
+    def put(self, ticker: str, model: str, horizon: int, as_of: str, metrics: Dict):
+        """Persist metrics (atomic replace so concurrent readers never see a partial file)"""
+        with self._lock:
+            data = self._read(ticker)
+            entries = data.setdefault(f"{model}:{horizon}", {})
+            entries[as_of] = metrics
+            for stale in sorted(entries)[:-self.MAX_AS_OF_ENTRIES]:
+                del entries[stale]
+
+            path = self._path(ticker)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, path)
+
+
+class WalkForwardBacktester:
+    """
+    Rolling-origin evaluation: refit the model at several past origins and
+    score each forecast against what actually happened.
+
+    ETS origins are fitted together as one vectorized batch; ensemble origins
+    (Prophet + ARIMA, seconds each) fan out across the shared process pool.
+    """
+
+    def __init__(self, store: Optional[BacktestStore] = None, n_origins: int = 4, origin_step: int = 5):
+        self.store = store or BacktestStore()
+        self.n_origins = n_origins
+        self.origin_step = origin_step
+        self._in_flight = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def as_of_date(close: pd.Series) -> str:
+        return pd.Timestamp(close.index[-1]).strftime('%Y-%m-%d')
+
+    def _origins(self, n_obs: int, horizon: int) -> List[int]:
+        last_origin = n_obs - horizon
+        origins = [last_origin - k * self.origin_step for k in range(self.n_origins)]
+        return sorted(o for o in origins if o >= MIN_TRAIN_DAYS)
+
+    def lookup(self, ticker: str, model: str, horizon: int, as_of: Optional[str] = None) -> Dict:
+        """
+        Metrics for the endpoint: exact as-of if available, else the latest
+        stored run flagged as stale, else zeros flagged as pending.
+        """
+        metrics = self.store.get(ticker, model, horizon, as_of) if as_of else None
+        if metrics is not None:
+            return {**metrics, 'status': 'ready'}
+
+        latest = self.store.get(ticker, model, horizon)
+        if latest is not None:
+            return {**latest, 'status': 'stale'}
+
+        return {'rmse': 0.0, 'mae': 0.0, 'mape': 0.0, 'status': 'pending'}
+
+    def _forecast_origins(self, ticker: str, model: str, close: pd.Series, origins: List[int], horizon: int) -> List[np.ndarray]:
+        if model == 'ets':
+            # Right-align every training window in one NaN-padded batch
+            batch = np.full((len(origins), origins[-1]), np.nan)
+            for row, origin in enumerate(origins):
+                batch[row, -origin:] = close.values[:origin]
+            predictions = forecast_prices(batch, horizon)['predictions']
+            return [predictions[row] for row in range(len(origins))]
+
+        pool = get_process_pool()
+        futures = [
+            pool.submit(_ensemble_origin_forecast, ticker, close.iloc[:origin], horizon)
+            for origin in origins
+        ]
+        wait(futures)
+        return [np.asarray(f.result(), dtype=float) for f in futures]
+
+    def run(self, ticker: str, model: str, horizon: int, close: Optional[pd.Series] = None) -> Optional[Dict]:
+        """
+        Run the walk-forward backtest and persist the result (blocking).
+
+        Args:
+            ticker: Stock ticker symbol
+            model: 'ets' or 'ensemble'
+            horizon: Forecast horizon in days
+            close: Closing prices indexed by date (fetched if omitted)
+        """
+        ticker = ticker.upper()
+        key = (ticker, model, horizon)
+        with self._lock:
+            if key in self._in_flight:
+                return None
+            self._in_flight.add(key)
+
+        try:
+            if close is None:
+                close = yf.Ticker(ticker).history(period='1y')['Close']
+            if close.empty:
+                raise ValueError(f"No data found for ticker {ticker}")
+
+            as_of = self.as_of_date(close)
+            cached = self.store.get(ticker, model, horizon, as_of)
+            if cached is not None:
+                return cached
+
+            origins = self._origins(len(close), horizon)
+            if not origins:
+                raise ValueError(f"Not enough history to backtest {ticker} at {horizon}d")
+
+            forecasts = self._forecast_origins(ticker, model, close, origins, horizon)
+            actual = np.concatenate([close.values[o:o + horizon] for o in origins])
+            predicted = np.concatenate([f[:horizon] for f in forecasts])
+
+            metrics = _error_metrics(actual, predicted)
+            metrics.update({
+                'as_of': as_of,
+                'origins': len(origins),
+                'computed_at': datetime.now().isoformat()
+            })
+            self.store.put(ticker, model, horizon, as_of, metrics)
+            return metrics
+
+        except Exception as e:
+            logger.warning(f"Backtest failed for {ticker} ({model}, {horizon}d): {e}")
+            return None
+        finally:
+            with self._lock:
+                self._in_flight.discard(key)
+
+
+# Singleton instance
+backtester = WalkForwardBacktester()
@@ -0,0 +1,165 @@
+"""
+Batch Stock Price Predictor
+Downloads every ticker in one pass and yields per-ticker forecasts as they finish
+"""
+
+import asyncio
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from typing import AsyncIterator, Dict, List
+import logging
+
+from ml.process_pool import get_process_pool
+from ml.shares.ets_forecaster import forecast_prices
+from ml.shares.price_predictor import PricePredictor, deep_refiner
+
+logger = logging.getLogger(__name__)
+
+# Running background refinements, referenced so they are not collected mid-fit
+_refinements = set()
+
+
+def fetch_histories(tickers: List[str], period: str = '1y') -> Dict[str, pd.DataFrame]:
+    """
+    Fetch OHLCV history for all tickers with a single yfinance download.
+
+    Returns:
+        Dict mapping ticker to its DataFrame; tickers with no data are omitted
+    """
+    data = yf.download(
+        tickers,
+        period=period,
+        group_by='ticker',
+        auto_adjust=True,
+        threads=True,
+        progress=False
+    )
+
+    histories = {}
+    for ticker in tickers:
+        if isinstance(data.columns, pd.MultiIndex):
+            if ticker not in data.columns.get_level_values(0):
+                continue
+            frame = data[ticker]
+        else:
+            frame = data
+
+        frame = frame.dropna(subset=['Close'])
+        if not frame.empty:
+            histories[ticker] = frame
+
+    return histories
+
+
+def _predict_fast(histories: Dict[str, pd.DataFrame], horizons: List[int]) -> List[Dict]:
+    """Fit the ETS model to every ticker at once and format each (ticker, horizon)"""
+    tickers = list(histories)
+    n_obs = max(len(histories[t]) for t in tickers)
+
+    # Right-align each ticker's own closes so calendars never mix
+    closes = np.full((len(tickers), n_obs), np.nan)
+    for row, ticker in enumerate(tickers):
+        values = histories[ticker]['Close'].values
+        closes[row, -len(values):] = values
+
+    # Forecasts for shorter horizons are prefixes of the longest one
+    forecast = forecast_prices(closes, max(horizons))
+
+    lines = []
+    for row, ticker in enumerate(tickers):
+        for horizon in horizons:
+            predictor = PricePredictor(ticker, horizon_days=horizon, mode='fast')
+            predictor.historical_data = histories[ticker]
+            predictions = predictor.predict_ets(forecast, row)
+            lines.append(_success(ticker, horizon, predictor.build_result(predictions, {'ets': 100})))
+    return lines
+
+
+def _predict_deep(ticker: str, history: pd.DataFrame, horizon: int) -> Dict:
+    """Run the Prophet + ARIMA ensemble for one ticker (runs in a pool worker)"""
+    predictor = PricePredictor(ticker, horizon_days=horizon, mode='deep')
+    predictor.historical_data = history
+    predictor.train_prophet()
+    predictor.train_arima()
+    return predictor.build_result(predictor.predict_ensemble(), {'prophet': 60, 'arima': 40})
+
+
+def refine_in_pool(ticker: str, horizon: int, history: pd.DataFrame):
+    """
+    Start a claimed deep refinement in the shared process pool and return at
+    once; the result lands in the refiner cache. Unlike request background
+    tasks, many of these run in parallel and none waits for the response.
+    """
+    loop = asyncio.get_running_loop()
+
+    async def refine():
+        try:
+            result = await loop.run_in_executor(get_process_pool(), _predict_deep, ticker, history, horizon)
+            deep_refiner.store(ticker, horizon, result)
+        except Exception as e:
+            logger.warning(f"Deep refinement failed for {ticker} ({horizon}d): {e}")
+        finally:
+            deep_refiner.release(ticker, horizon)
+
+    task = loop.create_task(refine())
+    _refinements.add(task)
+    task.add_done_callback(_refinements.discard)
+
+
+def _success(ticker: str, horizon: int, result: Dict) -> Dict:
+    return {'ticker': ticker, 'horizon': horizon, 'status': 'success', 'data': result}
+
+
+def _error(ticker: str, horizon: int, detail: str) -> Dict:
+    return {'ticker': ticker, 'horizon': horizon, 'status': 'error', 'detail': detail}
+
+
+async def stream_predictions(
+    histories: Dict[str, pd.DataFrame],
+    horizons: List[int],
+    mode: str = 'fast'
+) -> AsyncIterator[Dict]:
+    """
+    Yield one result per (ticker, horizon) as soon as it is available.
+
+    Fast mode fits every ticker in one vectorized call. Deep mode answers from
+    the refiner cache where possible and fans the remaining ensemble fits out
+    across the shared process pool, yielding in completion order.
+
+    Args:
+        histories: Output of fetch_histories
+        horizons: Forecast horizons in days
+        mode: 'fast' or 'deep'
+    """
+    if not histories:
+        return
+
+    if mode == 'fast':
+        for line in await asyncio.to_thread(_predict_fast, histories, horizons):
+            yield line
+        return
+
+    loop = asyncio.get_running_loop()
+    pool = get_process_pool()
+
+    async def run_deep(ticker, horizon):
+        try:
+            result = await loop.run_in_executor(pool, _predict_deep, ticker, histories[ticker], horizon)
+        except Exception as e:
+            logger.warning(f"Batch deep prediction failed for {ticker} ({horizon}d): {e}")
+            return _error(ticker, horizon, str(e))
+        deep_refiner.store(ticker, horizon, result)
+        return _success(ticker, horizon, result)
+
+    pending = []
+    for ticker in histories:
+        for horizon in horizons:
+            cached = deep_refiner.get(ticker, horizon)
+            if cached is not None:
+                yield _success(ticker, horizon, cached)
+            else:
+                pending.append(run_deep(ticker, horizon))
+
+    for finished in asyncio.as_completed(pending):
+        yield await finished
@@ -4,10 +4,11 @@ Computes Pearson correlation matrix, diversification score, and portfolio insigh
 """
 
 import numpy as np
-import yfinance as yf
-from datetime import datetime, timedelta
+from datetime import datetime
 import logging
 
+from ml.data.cross_asset import CrossAssetMatrix, EQUITY, fetch_equity_closes
+
 logger = logging.getLogger(__name__)
 
 
@@ -27,51 +28,23 @@ class CorrelationAnalyzer:
         if len(tickers) < 2:
             raise ValueError("Need at least 2 tickers for correlation analysis")
 
-        # Fetch 3 months of close prices
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=90)
-
-        prices = {}
-        valid_tickers = []
-
-        for ticker in tickers:
-            try:
-                df = yf.download(ticker, start=start_date, end=end_date, progress=False)
-                if df.empty or len(df) < 20:
-                    logger.warning(f"Insufficient data for {ticker}, skipping")
-                    continue
-                # Flatten MultiIndex columns
-                if hasattr(df.columns, 'levels'):
-                    df.columns = df.columns.get_level_values(0)
-                prices[ticker] = df['Close'].values
-                valid_tickers.append(ticker)
-            except Exception as e:
-                logger.warning(f"Failed to fetch data for {ticker}: {e}")
+        # 3 months of closes in one download, aligned across exchange calendars
+        # (NSE and NYSE holidays differ, so positional alignment would pair different days)
+        closes = {}
+        for ticker, close in fetch_equity_closes(tickers, days=90).items():
+            if len(close) < 20:
+                logger.warning(f"Insufficient data for {ticker}, skipping")
+                continue
+            closes[ticker] = close
+        valid_tickers = list(closes)
 
         if len(valid_tickers) < 2:
             raise ValueError("Need at least 2 tickers with valid data")
 
-        # Align data lengths (use shortest series)
-        min_len = min(len(v) for v in prices.values())
-        aligned = {t: prices[t][-min_len:] for t in valid_tickers}
-
-        # Compute daily returns
-        returns = {}
-        for t in valid_tickers:
-            p = aligned[t]
-            r = np.diff(p) / p[:-1]
-            returns[t] = r
-
+        matrix = CrossAssetMatrix(closes, {t: EQUITY for t in valid_tickers})
         n = len(valid_tickers)
-        corr_matrix = np.zeros((n, n))
-
-        for i in range(n):
-            for j in range(n):
-                if i == j:
-                    corr_matrix[i][j] = 1.0
-                else:
-                    corr_val = np.corrcoef(returns[valid_tickers[i]], returns[valid_tickers[j]])[0, 1]
-                    corr_matrix[i][j] = round(float(corr_val), 4) if not np.isnan(corr_val) else 0.0
+        corr_matrix = np.round(np.nan_to_num(matrix.correlation), 4)
+        min_len = len(matrix) + 1
 
         # Diversification Score (0-100)
         # Lower avg correlation = better diversification
@@ -0,0 +1,152 @@
+"""
+Damped-Trend Exponential Smoothing Forecaster
+Pure-NumPy ETS(A,Ad,N) model fitted across a whole batch of price series at once
+"""
+
+import numpy as np
+from typing import Dict
+
+# Smoothing parameter grid. Every series in a batch is fitted against every
+# combination in one vectorized pass, so the grid is kept deliberately small.
+ALPHA_GRID = (0.1, 0.2, 0.3, 0.5, 0.7, 0.9)
+BETA_FRACTIONS = (0.0, 0.05, 0.1, 0.2)   # trend smoothing as a fraction of alpha (keeps beta <= alpha)
+PHI_GRID = (0.8, 0.9, 0.95, 0.98)        # trend damping
+
+Z_95 = 1.959963984540054
+TREND_INIT_WINDOW = 10
+
+
+def _parameter_grid():
+    """Return (alpha, beta, phi) arrays covering every grid combination"""
+    combos = [
+        (alpha, alpha * frac, phi)
+        for alpha in ALPHA_GRID
+        for frac in BETA_FRACTIONS
+        for phi in PHI_GRID
+    ]
+    grid = np.array(combos, dtype=float)
+    return grid[:, 0], grid[:, 1], grid[:, 2]
+
+
+def fit_damped_trend(series: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Fit an additive damped-trend model to each row of a 2-D array.
+
+    Rows may be left-padded or contain gaps as NaN (e.g. a multi-ticker
+    download on mismatched calendars); missing observations simply carry the
+    state forward without an error correction.
+
+    Args:
+        series: Array of shape (n_series, n_obs), or a single 1-D series
+
+    Returns:
+        Dict of per-series arrays: alpha, beta, phi, level, trend, sigma, n_obs
+    """
+    y = np.atleast_2d(np.asarray(series, dtype=float))
+    n_series, n_obs = y.shape
+    rows = np.arange(n_series)
+
+    alpha, beta, phi = _parameter_grid()
+
+    observed = ~np.isnan(y)
+    if not observed.any(axis=1).all():
+        raise ValueError("Every series needs at least one observation")
+    first = observed.argmax(axis=1)
+
+    # Initial states: first observation and the mean of the next few steps
+    level0 = y[rows, first]
+    init_idx = np.minimum(first[:, None] + np.arange(1, TREND_INIT_WINDOW + 1), n_obs - 1)
+    init_vals = np.take_along_axis(y, init_idx, axis=1)
+    init_steps = np.diff(np.concatenate([level0[:, None], init_vals], axis=1), axis=1)
+    with np.errstate(all='ignore'):
+        trend0 = np.nanmean(np.where(np.isfinite(init_steps), init_steps, np.nan), axis=1)
+    trend0 = np.nan_to_num(trend0)
+
+    level = np.repeat(level0[:, None], len(alpha), axis=1)
+    trend = np.repeat(trend0[:, None], len(alpha), axis=1)
+    sse = np.zeros_like(level)
+    n_errors = np.zeros(n_series)
+
+    for t in range(1, n_obs):
+        active = (t > first)[:, None]
+        has_obs = observed[:, t] & (t > first)
+
+        forecast = level + phi * trend
+        err = np.where(has_obs[:, None], y[:, t, None] - forecast, 0.0)
+        sse += err ** 2
+        n_errors += has_obs
+
+        level = np.where(active, forecast + alpha * err, level)
+        trend = np.where(active, phi * trend + beta * err, trend)
+
+    best = sse.argmin(axis=1)
+    dof = np.maximum(n_errors - 3, 1)
+
+    return {
+        'alpha': alpha[best],
+        'beta': beta[best],
+        'phi': phi[best],
+        'level': level[rows, best],
+        'trend': trend[rows, best],
+        'sigma': np.sqrt(sse[rows, best] / dof),
+        'n_obs': n_errors + 1,
+    }
+
+
+def forecast_damped_trend(fit: Dict[str, np.ndarray], horizon: int, z: float = Z_95) -> Dict[str, np.ndarray]:
+    """
+    Forecast a fitted batch with analytic prediction intervals.
+
+    Uses the closed-form ETS(A,Ad,N) forecast variance
+    sigma^2 * (1 + sum_{j=1}^{h-1} c_j^2), with c_j = alpha + beta * phi * (1 - phi^j) / (1 - phi).
+
+    Returns:
+        Dict with 'mean', 'lower', 'upper' arrays of shape (n_series, horizon)
+    """
+    steps = np.arange(1, horizon + 1, dtype=float)
+    phi = fit['phi'][:, None]
+    alpha = fit['alpha'][:, None]
+    beta = fit['beta'][:, None]
+
+    damped_sum = phi * (1 - phi ** steps) / (1 - phi)   # sum_{i=1}^{h} phi^i
+    mean = fit['level'][:, None] + damped_sum * fit['trend'][:, None]
+
+    c = alpha + beta * damped_sum                        # c_j for j = 1..h
+    c_sq_cumsum = np.concatenate([np.zeros((c.shape[0], 1)), np.cumsum(c ** 2, axis=1)[:, :-1]], axis=1)
+    sd = fit['sigma'][:, None] * np.sqrt(1 + c_sq_cumsum)
+
+    return {
+        'mean': mean,
+        'lower': mean - z * sd,
+        'upper': mean + z * sd,
+    }
+
+
+def forecast_prices(closes: np.ndarray, horizon: int) -> Dict[str, np.ndarray]:
+    """
+    Fit and forecast a batch of price series on the log scale.
+
+    Working in logs keeps the intervals multiplicative (and positive) once
+    mapped back to prices.
+
+    Args:
+        closes: Array of shape (n_series, n_obs) of closing prices (NaN for gaps)
+        horizon: Number of steps to forecast
+
+    Returns:
+        Dict with 'predictions', 'lower', 'upper' price arrays of shape
+        (n_series, horizon) plus the fitted parameters under 'params'
+    """
+    closes = np.atleast_2d(np.asarray(closes, dtype=float))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_closes = np.where(closes > 0, np.log(closes), np.nan)
+
+    fit = fit_damped_trend(log_closes)
+    fc = forecast_damped_trend(fit, horizon)
+
+    return {
+        'predictions': np.exp(fc['mean']),
+        'lower': np.exp(fc['lower']),
+        'upper': np.exp(fc['upper']),
+        'params': fit,
+    }
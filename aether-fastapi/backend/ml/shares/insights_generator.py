@@ -11,6 +11,8 @@ import os
 import json
 from datetime import datetime, timedelta
 
+from ml.data import indicators
+
 
 class InsightsGenerator:
     def __init__(self):
@@ -42,8 +44,8 @@ class InsightsGenerator:
                 volatility = daily_returns.std() * np.sqrt(252) * 100  # Annualized %
                 
                 # Trend analysis
-                sma_20 = hist['Close'].rolling(20).mean().iloc[-1] if len(hist) >= 20 else current_price
-                sma_50 = hist['Close'].rolling(50).mean().iloc[-1] if len(hist) >= 50 else current_price
+                sma_20 = indicators.sma(hist['Close'].values, 20)[-1] if len(hist) >= 20 else current_price
+                sma_50 = indicators.sma(hist['Close'].values, 50)[-1] if len(hist) >= 50 else current_price
                 
                 # Volume analysis
                 avg_volume = hist['Volume'].mean()
@@ -1,22 +1,34 @@
 """
 Multi-Model Stock Price Predictor
-Combines Prophet (60%) and ARIMA (40%) for ensemble forecasting
+Fast mode: NumPy damped-trend exponential smoothing (interactive default)
+Deep mode: Prophet (60%) and ARIMA (40%) ensemble, refined in the background
 """
 
 import pandas as pd
-import numpy as np
+import threading
 from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
 import yfinance as yf
 from prophet import Prophet
 from statsmodels.tsa.arima.model import ARIMA
+from ml.shares.ets_forecaster import forecast_prices
+from ml.shares.backtester import backtester, MODEL_FOR_MODE
+import logging
 import warnings
 warnings.filterwarnings('ignore')
 
+logger = logging.getLogger(__name__)
+
+PREDICTION_MODES = ('fast', 'deep')
+
 
 class PricePredictor:
-    def __init__(self, ticker: str, horizon_days: int = 30):
+    def __init__(self, ticker: str, horizon_days: int = 30, mode: str = 'fast'):
+        if mode not in PREDICTION_MODES:
+            raise ValueError(f"Unknown prediction mode '{mode}' (expected one of {', '.join(PREDICTION_MODES)})")
         self.ticker = ticker.upper()
         self.horizon_days = horizon_days
+        self.mode = mode
         self.historical_data = None
         self.prophet_model = None
         self.arima_model = None
@@ -61,15 +73,43 @@ class PricePredictor:
         
         return self.arima_model
     
-    def predict_ensemble(self):
-        """Generate ensemble predictions (Prophet 60% + ARIMA 40%)"""
-        # Generate future dates
+    def _future_dates(self):
+        """Calendar dates covered by the forecast horizon"""
         last_date = self.historical_data.index[-1]
-        future_dates = pd.date_range(
+        return pd.date_range(
             start=last_date + timedelta(days=1),
             periods=self.horizon_days,
             freq='D'
         )
+    
+    def predict_ets(self, forecast: Optional[Dict] = None, row: int = 0):
+        """
+        Generate damped-trend exponential smoothing predictions with analytic intervals
+        
+        Args:
+            forecast: Precomputed batch forecast from forecast_prices (fitted here if omitted)
+            row: This ticker's row in the batch forecast
+        """
+        if forecast is None:
+            forecast = forecast_prices(self.historical_data['Close'].values, self.horizon_days)
+        
+        horizon = self.horizon_days
+        return {
+            'dates': [d.strftime('%Y-%m-%d') for d in self._future_dates()],
+            'predictions': forecast['predictions'][row, :horizon].tolist(),
+            'confidence_upper': forecast['upper'][row, :horizon].tolist(),
+            'confidence_lower': forecast['lower'][row, :horizon].tolist(),
+            'ets_params': {
+                'alpha': float(forecast['params']['alpha'][row]),
+                'beta': float(forecast['params']['beta'][row]),
+                'phi': float(forecast['params']['phi'][row])
+            }
+        }
+    
+    def predict_ensemble(self):
+        """Generate ensemble predictions (Prophet 60% + ARIMA 40%)"""
+        # Generate future dates
+        future_dates = self._future_dates()
         
         # Prophet predictions
         future_df = pd.DataFrame({'ds': pd.to_datetime(future_dates).tz_localize(None)})
@@ -101,53 +141,39 @@ class PricePredictor:
             'arima_predictions': arima_pred.tolist()
         }
     
-    def calculate_metrics(self, predictions):
-        """Calculate accuracy metrics using historical data cross-validation"""
-        # Use last 30 days for validation
-        train_data = self.historical_data[:-30]
-        test_data = self.historical_data[-30:]
-        
-        if len(test_data) < 30:
-            # Not enough data for validation, return placeholder metrics
-            return {
-                'rmse': 0.0,
-                'mae': 0.0,
-                'mape': 0.0
-            }
-        
-        # Train on reduced dataset
-        temp_predictor = PricePredictor(self.ticker, horizon_days=30)
-        temp_predictor.historical_data = train_data
-        temp_predictor.train_prophet()
-        temp_predictor.train_arima()
-        temp_predictions = temp_predictor.predict_ensemble()
+    def calculate_metrics(self, predictions=None):
+        """
+        Look up walk-forward backtest metrics for this model and horizon.
         
-        # Calculate errors
-        actual = test_data['Close'].values
-        predicted = np.array(temp_predictions['predictions'][:len(actual)])
+        Backtests run off the request path (see ml.shares.backtester); this only
+        reads the store. 'status' is 'ready' when the metrics match today's data,
+        'stale' when they come from an earlier run and 'pending' when none exist.
+        """
+        as_of = None
+        if self.historical_data is not None and not self.historical_data.empty:
+            as_of = backtester.as_of_date(self.historical_data['Close'])
         
-        rmse = np.sqrt(np.mean((actual - predicted) ** 2))
-        mae = np.mean(np.abs(actual - predicted))
-        mape = np.mean(np.abs((actual - predicted) / actual)) * 100
-        
-        return {
-            'rmse': float(rmse),
-            'mae': float(mae),
-            'mape': float(mape)
-        }
+        return backtester.lookup(self.ticker, MODEL_FOR_MODE[self.mode], self.horizon_days, as_of)
     
     def run_full_prediction(self):
         """Complete prediction pipeline"""
         # Fetch data
         self.fetch_historical_data()
         
-        # Train models
-        self.train_prophet()
-        self.train_arima()
-        
-        # Generate predictions
-        predictions = self.predict_ensemble()
+        if self.mode == 'fast':
+            predictions = self.predict_ets()
+            model_weights = {'ets': 100}
+        else:
+            # Train models
+            self.train_prophet()
+            self.train_arima()
+            predictions = self.predict_ensemble()
+            model_weights = {'prophet': 60, 'arima': 40}
         
+        return self.build_result(predictions, model_weights)
+    
+    def build_result(self, predictions: Dict, model_weights: Dict) -> Dict:
+        """Assemble the API response for a finished forecast"""
         # Calculate metrics
         metrics = self.calculate_metrics(predictions)
         
@@ -164,13 +190,81 @@ class PricePredictor:
             'horizon_days': self.horizon_days,
             'predictions': predictions,
             'metrics': metrics,
-            'model_weights': {
-                'prophet': 60,
-                'arima': 40
-            },
+            'as_of': backtester.as_of_date(self.historical_data['Close']),
+            'mode': self.mode,
+            'model_weights': model_weights,
             'forecast_summary': {
                 'horizon_days': self.horizon_days,
                 'predicted_price': round(predicted_price, 2),
                 'price_change_pct': round(price_change_pct, 2)
             }
         }
+
+
+class DeepPredictionRefiner:
+    """
+    Runs the Prophet + ARIMA (deep) pipeline in the background and caches the
+    result, so interactive requests can answer from the fast model first and
+    pick up the refined forecast on a later call.
+    """
+    
+    def __init__(self, cache_duration_hours: int = 6):
+        self.cache_duration_hours = cache_duration_hours
+        self._results: Dict[Tuple[str, int], Tuple[datetime, Dict]] = {}
+        self._in_flight = set()
+        self._lock = threading.Lock()
+    
+    def get(self, ticker: str, horizon_days: int) -> Optional[Dict]:
+        """Return a cached deep prediction if one is still fresh"""
+        entry = self._results.get((ticker.upper(), horizon_days))
+        if entry is None:
+            return None
+        computed_at, result = entry
+        if (datetime.now() - computed_at).total_seconds() > self.cache_duration_hours * 3600:
+            return None
+        return result
+    
+    def status(self, ticker: str, horizon_days: int) -> str:
+        """Refinement status: 'ready', 'pending' or 'not_started'"""
+        key = (ticker.upper(), horizon_days)
+        if self.get(*key) is not None:
+            return 'ready'
+        return 'pending' if key in self._in_flight else 'not_started'
+    
+    def claim(self, ticker: str, horizon_days: int) -> bool:
+        """Mark a refinement as in flight; False if one is already running or cached"""
+        key = (ticker.upper(), horizon_days)
+        with self._lock:
+            if key in self._in_flight or self.get(*key) is not None:
+                return False
+            self._in_flight.add(key)
+            return True
+    
+    def store(self, ticker: str, horizon_days: int, result: Dict):
+        """Cache a deep prediction computed elsewhere (e.g. by the batch endpoint)"""
+        self._results[(ticker.upper(), horizon_days)] = (datetime.now(), result)
+    
+    def release(self, ticker: str, horizon_days: int):
+        """Drop an in-flight claim for a refinement run outside refine()"""
+        with self._lock:
+            self._in_flight.discard((ticker.upper(), horizon_days))
+    
+    def refine(self, ticker: str, horizon_days: int) -> Optional[Dict]:
+        """Run the deep pipeline (blocking) and cache its result"""
+        key = (ticker.upper(), horizon_days)
+        with self._lock:
+            self._in_flight.add(key)
+        try:
+            result = PricePredictor(ticker, horizon_days, mode='deep').run_full_prediction()
+            self.store(ticker, horizon_days, result)
+            return result
+        except Exception as e:
+            logger.warning(f"Deep refinement failed for {key[0]} ({horizon_days}d): {e}")
+            return None
+        finally:
+            with self._lock:
+                self._in_flight.discard(key)
+
+
+# Singleton instance
+deep_refiner = DeepPredictionRefiner()
@@ -0,0 +1,484 @@
+"""
+Universe Stock Screener
+Scores momentum, RSI, volume and anomaly signals for every catalog stock from a local bar cache in one vectorized pass
+
+Usage:
+    python ml/shares/screener.py                 # refresh the bar cache, then rebuild the signal table
+    python ml/shares/screener.py --no-refresh    # rebuild from cached bars only
+    python ml/shares/screener.py --at 11:30      # run every day at 11:30 UTC (start.sh runs this)
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+import json
+import threading
+import time
+import warnings
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import logging
+
+from ml.data import indicators
+from services.indian_stocks import INDIAN_STOCKS
+
+logger = logging.getLogger(__name__)
+
+SCREENER_DIR = os.path.join(os.path.dirname(__file__), '../cache/screener')
+FIELDS = ('close', 'high', 'low', 'volume')
+# A year of trading days plus warm-up for the 52-week high
+HISTORY_DAYS = 400
+# Tickers per yfinance download call
+CHUNK_SIZE = 200
+# Calendar days before the last cached session that are downloaded again,
+# so late corrections replace cached bars
+OVERLAP_DAYS = 7
+# Relative close difference on the overlap that means the history was re-adjusted
+# (split/dividend), so the symbol's cached bars are replaced by a full download
+ADJUSTMENT_TOLERANCE = 0.002
+MIN_BARS = 64
+# Symbols whose last bar is this many sessions behind the universe are left out (suspended/delisted)
+MAX_STALE_BARS = 5
+
+RSI_OVERBOUGHT = 70
+RSI_OVERSOLD = 30
+VOLUME_SPIKE = 2.0
+ANOMALY_Z = 3.5
+NEAR_HIGH = -0.02
+
+SIGNALS = ('rsi_overbought', 'rsi_oversold', 'volume_spike', 'anomaly', 'near_52w_high')
+SORT_FIELDS = ('score', 'momentum_1m', 'momentum_3m', 'momentum_6m', 'change_1d', 'rsi', 'volume_ratio', 'anomaly_z')
+
+
+def universe() -> Dict[str, Dict]:
+    """Catalog symbols with name and every sector they are listed under"""
+    stocks = {}
+    for stock in INDIAN_STOCKS:
+        entry = stocks.setdefault(stock['symbol'], {'name': stock['name'], 'sectors': []})
+        if stock['sector'] not in entry['sectors']:
+            entry['sectors'].append(stock['sector'])
+    return stocks
+
+
+def _download(tickers: List[str], start: datetime) -> Dict[str, pd.DataFrame]:
+    """One field-by-date frame per field, columns are tickers (missing tickers omitted)"""
+    data = yf.download(
+        tickers,
+        start=start,
+        group_by='ticker',
+        auto_adjust=True,
+        threads=True,
+        progress=False
+    )
+    if data.empty:
+        return {}
+    if not isinstance(data.columns, pd.MultiIndex):
+        data.columns = pd.MultiIndex.from_product([tickers, data.columns])
+
+    frames = {}
+    for field in FIELDS:
+        column = field.title()
+        present = [t for t in tickers if (t, column) in data.columns]
+        frame = pd.DataFrame({t: data[(t, column)] for t in present}, index=data.index)
+        frames[field] = frame.dropna(axis=1, how='all')
+    frames['close'].index = pd.DatetimeIndex(frames['close'].index).tz_localize(None)
+    for field in FIELDS:
+        frames[field].index = frames['close'].index
+    return frames
+
+
+def _download_all(tickers: List[str], start: datetime, chunk_size: int) -> Dict[str, pd.DataFrame]:
+    """_download in chunks of chunk_size tickers, joined into one frame per field"""
+    parts: Dict[str, List[pd.DataFrame]] = {f: [] for f in FIELDS}
+    for i in range(0, len(tickers), chunk_size):
+        chunk = tickers[i:i + chunk_size]
+        try:
+            frames = _download(chunk, start)
+        except Exception as e:
+            logger.error(f"Bar download failed for {len(chunk)} tickers: {e}")
+            continue
+        for field, frame in frames.items():
+            parts[field].append(frame)
+    return {f: pd.concat(frames, axis=1) for f, frames in parts.items() if frames}
+
+
+def readjusted_symbols(fresh: pd.DataFrame, cached: pd.DataFrame, before: pd.Timestamp) -> List[str]:
+    """
+    Symbols whose freshly downloaded closes differ from the cached ones on
+    sessions before `before` (the last cached one may have been a live bar)
+
+    auto_adjust rescales a symbol's whole history after a split or dividend,
+    so such a symbol's cached bars no longer match the new ones.
+    """
+    symbols = fresh.columns.intersection(cached.columns)
+    dates = fresh.index.intersection(cached.index)
+    dates = dates[dates < before]
+    if symbols.empty or dates.empty:
+        return []
+    new = fresh.loc[dates, symbols].to_numpy(dtype=np.float64)
+    old = cached.loc[dates, symbols].to_numpy(dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        difference = np.abs(new / old - 1)
+    worst = np.where(np.isfinite(difference), difference, 0).max(axis=0)
+    return [symbol for symbol, d in zip(symbols, worst) if d > ADJUSTMENT_TOLERANCE]
+
+
+class BarCache:
+    """
+    Daily bars for the whole universe as (n_symbols, n_days) arrays
+
+    Stored as one .npz; a refresh only downloads the bars since the last
+    cached session (plus OVERLAP_DAYS), in chunks of CHUNK_SIZE tickers.
+    Bars are split/dividend adjusted, so a symbol whose overlap bars no
+    longer match the cache was re-adjusted and gets its full history again.
+    Symbols with a shorter history are front-padded with NaN.
+    """
+
+    def __init__(self, symbols: List[str], dates: np.ndarray, fields: Dict[str, np.ndarray]):
+        self.symbols = symbols
+        self.dates = dates
+        self.fields = fields
+
+    @property
+    def last_date(self) -> Optional[pd.Timestamp]:
+        return pd.Timestamp(self.dates[-1]) if len(self.dates) else None
+
+    def frame(self, field: str) -> pd.DataFrame:
+        return pd.DataFrame(self.fields[field].T, index=pd.DatetimeIndex(self.dates), columns=self.symbols)
+
+    @classmethod
+    def empty(cls) -> 'BarCache':
+        return cls([], np.array([], dtype='datetime64[ns]'), {f: np.empty((0, 0)) for f in FIELDS})
+
+    @classmethod
+    def load(cls, path: str) -> 'BarCache':
+        if not os.path.exists(path):
+            return cls.empty()
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data['symbols'].tolist(),
+                data['dates'].astype('datetime64[ns]'),
+                {f: data[f] for f in FIELDS}
+            )
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            symbols=np.array(self.symbols, dtype=str),
+            dates=self.dates.astype('datetime64[ns]').astype(np.int64),
+            **self.fields
+        )
+        os.replace(tmp_path, path)
+
+    def refresh(self, symbols: List[str], history_days: int = HISTORY_DAYS, chunk_size: int = CHUNK_SIZE) -> 'BarCache':
+        """New cache with the latest bars for `symbols` (the old cache is left unchanged)"""
+        today = datetime.now()
+        full_start = today - timedelta(days=int(history_days * 1.5))
+        cached = set(self.symbols)
+        merged = {f: self.frame(f) for f in FIELDS}
+
+        recent = {}
+        readjusted = []
+        if self.last_date is not None:
+            recent_start = self.last_date.to_pydatetime() - timedelta(days=OVERLAP_DAYS)
+            recent = _download_all([s for s in symbols if s in cached], recent_start, chunk_size)
+            if 'close' in recent:
+                readjusted = readjusted_symbols(recent['close'], merged['close'], self.last_date)
+            if readjusted:
+                logger.info(f"Re-downloading full history for {len(readjusted)} re-adjusted symbols")
+                for field in FIELDS:
+                    merged[field] = merged[field].drop(columns=readjusted)
+                recent = {f: frame.drop(columns=readjusted, errors='ignore') for f, frame in recent.items()}
+
+        # Symbols never seen before (or that failed last time) and re-adjusted ones need their full history
+        full = _download_all([s for s in symbols if s not in cached] + readjusted, full_start, chunk_size)
+
+        for frames in (recent, full):
+            for field, frame in frames.items():
+                # Freshly downloaded bars take precedence over cached ones
+                merged[field] = frame.combine_first(merged[field])
+
+        close = merged['close'].reindex(columns=[s for s in symbols if s in merged['close'].columns])
+        close = close.sort_index().iloc[-history_days:]
+        columns = list(close.columns)
+        fields = {
+            field: merged[field].reindex(index=close.index, columns=columns).to_numpy(dtype=np.float64).T
+            for field in FIELDS
+        }
+        return BarCache(columns, close.index.to_numpy(dtype='datetime64[ns]'), fields)
+
+
+def _percentile_rank(x: np.ndarray) -> np.ndarray:
+    """Cross-sectional percentile (0-100) of each value; NaN stays NaN"""
+    return pd.Series(x).rank(pct=True).to_numpy() * 100
+
+
+def compute_signals(close: np.ndarray, volume: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Latest-bar signals for every row of (n_symbols, n_days) close/volume
+
+    Returns:
+        Name to (n_symbols,) array; NaN where a row's history is too short
+    """
+    close = pd.DataFrame(close).ffill(axis=1).to_numpy()
+    n_days = close.shape[1]
+
+    def momentum(days: int) -> np.ndarray:
+        if n_days <= days:
+            return np.full(len(close), np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return close[:, -1] / close[:, -1 - days] - 1
+
+    returns = indicators.pct_change(close)
+    # Robust z-score of the latest return against the previous 60 sessions
+    window = returns[:, -61:-1]
+    with warnings.catch_warnings(), np.errstate(divide='ignore', invalid='ignore'):
+        # All-NaN rows (too little history) just give NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        median = np.nanmedian(window, axis=1)
+        mad = np.nanmedian(np.abs(window - median[:, np.newaxis]), axis=1)
+        anomaly_z = 0.6745 * (returns[:, -1] - median) / mad
+        average_volume = np.nanmean(volume[:, -21:-1], axis=1)
+        volume_ratio = volume[:, -1] / average_volume
+        from_high = close[:, -1] / indicators.rolling_max(close, 252, min_periods=MIN_BARS)[:, -1] - 1
+        above_sma_50 = close[:, -1] > indicators.sma(close, 50)[:, -1]
+
+    signals = {
+        'close': close[:, -1],
+        'change_1d': returns[:, -1],
+        'momentum_1m': momentum(21),
+        'momentum_3m': momentum(63),
+        'momentum_6m': momentum(126),
+        'rsi': indicators.rsi(close, 14)[:, -1],
+        'volatility_30d': indicators.rolling_volatility(close, 30, periods_per_year=252)[:, -1],
+        'volume_ratio': np.where(average_volume > 0, volume_ratio, np.nan),
+        'anomaly_z': np.where(mad > 0, anomaly_z, np.nan),
+        'from_52w_high': from_high,
+        'above_sma_50': above_sma_50,
+    }
+    # Momentum score: mean cross-sectional percentile of 1/3/6-month returns
+    ranks = np.vstack([_percentile_rank(signals[m]) for m in ('momentum_1m', 'momentum_3m', 'momentum_6m')])
+    counts = (~np.isnan(ranks)).sum(axis=0)
+    with np.errstate(invalid='ignore'):
+        signals['score'] = np.where(counts > 0, np.nansum(ranks, axis=0) / counts, np.nan)
+    return signals
+
+
+def signal_flags(signals: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Boolean (n_symbols,) mask per screener signal (NaN inputs never match)"""
+    with np.errstate(invalid='ignore'):
+        return {
+            'rsi_overbought': signals['rsi'] >= RSI_OVERBOUGHT,
+            'rsi_oversold': signals['rsi'] <= RSI_OVERSOLD,
+            'volume_spike': signals['volume_ratio'] >= VOLUME_SPIKE,
+            'anomaly': np.abs(signals['anomaly_z']) >= ANOMALY_Z,
+            'near_52w_high': signals['from_52w_high'] >= NEAR_HIGH,
+        }
+
+
+def _value(x, digits: int = 4):
+    return round(float(x), digits) if np.isfinite(x) else None
+
+
+class Screener:
+    """
+    Nightly signal table over the INDIAN_STOCKS catalog
+
+    `run` refreshes the bar cache and writes the ranked table as JSON; the
+    API reads that file (reloading it when a newer run lands) and filters,
+    sorts and pages it in memory.
+    """
+
+    def __init__(self, cache_dir: str = SCREENER_DIR):
+        self.cache_dir = cache_dir
+        self.bars_path = os.path.join(cache_dir, 'bars.npz')
+        self.table_path = os.path.join(cache_dir, 'signals.json')
+        self._table: Optional[Dict] = None
+        self._table_mtime = 0.0
+        self._lock = threading.Lock()
+
+    def build_table(self, bars: BarCache) -> Dict:
+        """Ranked signal table from cached bars"""
+        stocks = universe()
+        close, volume = bars.fields['close'], bars.fields['volume']
+        valid = ~np.isnan(close)
+        # Sessions since each symbol's last bar
+        stale = valid[:, ::-1].argmax(axis=1)
+        keep = (valid.sum(axis=1) >= MIN_BARS) & (stale <= MAX_STALE_BARS)
+
+        signals = compute_signals(close[keep], volume[keep])
+        flags = signal_flags(signals)
+        symbols = [s for s, k in zip(bars.symbols, keep) if k]
+
+        rows = []
+        for i, symbol in enumerate(symbols):
+            row = {
+                'symbol': symbol,
+                'name': stocks.get(symbol, {}).get('name', symbol),
+                'sectors': stocks.get(symbol, {}).get('sectors', []),
+                'close': _value(signals['close'][i], 2),
+                'change_1d': _value(signals['change_1d'][i] * 100, 2),
+                'momentum_1m': _value(signals['momentum_1m'][i] * 100, 2),
+                'momentum_3m': _value(signals['momentum_3m'][i] * 100, 2),
+                'momentum_6m': _value(signals['momentum_6m'][i] * 100, 2),
+                'rsi': _value(signals['rsi'][i], 1),
+                'volatility_30d': _value(signals['volatility_30d'][i] * 100, 1),
+                'volume_ratio': _value(signals['volume_ratio'][i], 2),
+                'anomaly_z': _value(signals['anomaly_z'][i], 2),
+                'from_52w_high': _value(signals['from_52w_high'][i] * 100, 2),
+                'above_sma_50': bool(signals['above_sma_50'][i]),
+                'score': _value(signals['score'][i], 1),
+                'signals': [name for name in SIGNALS if flags[name][i]],
+            }
+            rows.append(row)
+
+        rows.sort(key=lambda r: -1 if r['score'] is None else r['score'], reverse=True)
+        for rank, row in enumerate(rows, 1):
+            row['rank'] = rank
+
+        return {
+            'as_of': bars.last_date.date().isoformat() if bars.last_date is not None else None,
+            'generated_at': datetime.now().isoformat(),
+            'universe_size': len(stocks),
+            'screened': len(rows),
+            'skipped': sorted(set(stocks) - set(symbols)),
+            'rows': rows,
+        }
+
+    def run(self, refresh: bool = True) -> Dict:
+        """Refresh bars (optionally), rebuild the table and write it"""
+        bars = BarCache.load(self.bars_path)
+        if refresh:
+            bars = bars.refresh(list(universe()))
+            bars.save(self.bars_path)
+        table = self.build_table(bars)
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{self.table_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(table, f)
+        os.replace(tmp_path, self.table_path)
+        return table
+
+    def table(self) -> Optional[Dict]:
+        """Latest written table (None before the first run)"""
+        try:
+            mtime = os.path.getmtime(self.table_path)
+        except OSError:
+            return None
+        with self._lock:
+            if self._table is None or mtime != self._table_mtime:
+                with open(self.table_path, 'r') as f:
+                    self._table = json.load(f)
+                self._table_mtime = mtime
+            return self._table
+
+    def query(
+        self,
+        sector: Optional[str] = None,
+        signal: Optional[str] = None,
+        sort: str = 'score',
+        descending: bool = True,
+        page: int = 1,
+        page_size: int = 50
+    ) -> Optional[Dict]:
+        """
+        One page of the signal table
+
+        Args:
+            sector: Keep symbols listed under this sector (case-insensitive)
+            signal: Keep symbols with this flag (one of SIGNALS)
+            sort: Column to order by (one of SORT_FIELDS); missing values sort last
+            descending: Largest first
+            page: 1-based page number
+            page_size: Rows per page
+
+        Returns:
+            Page with totals, or None if the screener has never run
+        """
+        if signal is not None and signal not in SIGNALS:
+            raise ValueError(f"Unknown signal '{signal}' (choose from {', '.join(SIGNALS)})")
+        if sort not in SORT_FIELDS:
+            raise ValueError(f"Unknown sort field '{sort}' (choose from {', '.join(SORT_FIELDS)})")
+
+        table = self.table()
+        if table is None:
+            return None
+
+        rows = table['rows']
+        if sector:
+            sector_lower = sector.strip().lower()
+            rows = [r for r in rows if any(s.lower() == sector_lower for s in r['sectors'])]
+        if signal:
+            rows = [r for r in rows if signal in r['signals']]
+
+        present = [r for r in rows if r[sort] is not None]
+        present.sort(key=lambda r: r[sort], reverse=descending)
+        rows = present + [r for r in rows if r[sort] is None]
+
+        start = (page - 1) * page_size
+        return {
+            'as_of': table['as_of'],
+            'generated_at': table['generated_at'],
+            'total': len(rows),
+            'page': page,
+            'page_size': page_size,
+            'pages': (len(rows) + page_size - 1) // page_size,
+            'items': rows[start:start + page_size],
+        }
+
+
+# Singleton instance
+screener = Screener()
+
+
+def run_once(refresh: bool) -> int:
+    started = time.perf_counter()
+    table = screener.run(refresh=refresh)
+    print(f"Screened {table['screened']}/{table['universe_size']} symbols as of {table['as_of']} "
+          f"in {time.perf_counter() - started:.1f}s ({screener.table_path})")
+    for row in table['rows'][:10]:
+        print(f"  {row['rank']:>3}. {row['symbol']:<16} score {row['score']:>5}  "
+              f"3m {row['momentum_3m']}%  RSI {row['rsi']}  {', '.join(row['signals'])}")
+    return 0 if table['screened'] else 1
+
+
+def run_scheduled(refresh: bool):
+    """run_once for the daily loop: a failed run is reported and retried at the next slot"""
+    try:
+        run_once(refresh)
+    except Exception as e:
+        print(f"❌ Screener run failed: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the universe-wide stock screener table")
+    parser.add_argument('--no-refresh', action='store_true', help="Use cached bars without downloading")
+    parser.add_argument('--at', help="Run every day at this UTC time (HH:MM) instead of once")
+    args = parser.parse_args()
+
+    if not args.at:
+        return run_once(refresh=not args.no_refresh)
+
+    hour, minute = (int(part) for part in args.at.split(':'))
+    # First start: build a table now rather than leave the endpoint empty until tonight
+    if screener.table() is None:
+        run_scheduled(refresh=not args.no_refresh)
+    while True:
+        now = datetime.utcnow()
+        next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        time.sleep((next_run - now).total_seconds())
+        run_scheduled(refresh=not args.no_refresh)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,16 +6,14 @@ Adapted from the crypto sentiment pipeline for the Shares AI Lab
 
 import os
 import random
-import requests
 import numpy as np
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 from functools import lru_cache
 
-try:
-    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-except ImportError:
-    SentimentIntensityAnalyzer = None
+from ml.data.news_providers import news_provider_pool, NewsRequest
+from ml.data.headline_store import headline_store
+from ml.nlp.sentiment_scorer import sentiment_scorer
 
 
 # ---------------------------------------------------------------------------
@@ -32,6 +30,9 @@ COMPANY_NAMES = {
     'MRK': 'Merck', 'ABBV': 'AbbVie', 'TMO': 'Thermo Fisher', 'AVGO': 'Broadcom',
 }
 
+# Seconds before a ticker's stored headlines are refreshed from the news APIs on demand
+NEWS_TTL = 600
+
 # Sentiment source weights
 WEIGHTS = {
     'news': 0.45,
@@ -45,28 +46,11 @@ class StockSentimentAnalyzer:
     """Analyze sentiment for stock tickers using VADER + news headlines"""
 
     def __init__(self):
-        if SentimentIntensityAnalyzer:
-            self.vader = SentimentIntensityAnalyzer()
-            # Add stock-specific lexicon tweaks
-            stock_lexicon = {
-                'bullish': 2.5, 'bearish': -2.5, 'rally': 2.0, 'crash': -3.0,
-                'surge': 2.5, 'plunge': -2.8, 'beat': 1.5, 'miss': -1.5,
-                'upgrade': 2.0, 'downgrade': -2.0, 'outperform': 1.8,
-                'underperform': -1.8, 'buy': 1.5, 'sell': -1.5, 'hold': 0.2,
-                'breakout': 2.0, 'breakdown': -2.0, 'overweight': 1.5,
-                'underweight': -1.5, 'recession': -2.5, 'growth': 1.5,
-                'layoffs': -2.0, 'hiring': 1.3, 'dividend': 1.0,
-                'bankruptcy': -3.5, 'acquisition': 1.2, 'lawsuit': -1.5,
-                'innovation': 1.5, 'disruption': 1.0, 'regulation': -0.8,
-            }
-            self.vader.lexicon.update(stock_lexicon)
-        else:
-            self.vader = None
+        # Shared process-wide VADER analyzer (finance + crypto lexicon) with memoized scores
+        self.scorer = sentiment_scorer
 
         self.newsdata_key = os.getenv('NEWSDATA_API_KEY')
         self.gnews_key = os.getenv('GNEWS_API_KEY')
-        self._cache: Dict[str, Dict] = {}
-        self._cache_ttl = 600  # 10 min
 
     # ------------------------------------------------------------------
     # Public API
@@ -84,7 +68,7 @@ class StockSentimentAnalyzer:
 
         # 1. Fetch & score news headlines
         headlines = self._fetch_news(ticker, company)
-        news_scores = [self._score_text(h['title']) for h in headlines]
+        news_scores = self.scorer.compound_batch([h['title'] for h in headlines])
         news_sentiment = float(np.mean(news_scores)) if news_scores else 0.0
 
         # Attach scores + emojis to headlines
@@ -131,7 +115,37 @@ class StockSentimentAnalyzer:
         }
 
     def get_history(self, ticker: str, days: int = 30) -> List[Dict]:
-        """Generate sentiment history for charting (random-walk mock)."""
+        """
+        Daily news sentiment from the headline store for charting.
+
+        Days without headlines carry the previous day's score forward
+        (headline_count 0); falls back to a random walk when nothing has
+        been stored for the ticker yet.
+        """
+        ticker = ticker.upper()
+        # Make sure today's headlines are in the store
+        self._fetch_news(ticker, COMPANY_NAMES.get(ticker, ticker))
+        stored = {d['date']: d for d in headline_store.daily_sentiment(self._store_key(ticker), days)}
+        if not stored:
+            return self._mock_history(ticker, days)
+
+        history = []
+        for i in range(days + 1):
+            date = (datetime.utcnow() - timedelta(days=days - i)).strftime('%Y-%m-%d')
+            day = stored.get(date)
+            if day is None and not history:
+                continue
+            score = day['score'] if day else history[-1]['score']
+            history.append({
+                'date': date,
+                'score': round(score, 3),
+                'classification': self._classify(score),
+                'headline_count': day['headline_count'] if day else 0,
+            })
+        return history
+
+    def _mock_history(self, ticker: str, days: int) -> List[Dict]:
+        """Random-walk history from the current score (no stored headlines yet)."""
         current = self.analyze(ticker)
         current_score = current['sentiment_score']
         history = []
@@ -153,79 +167,94 @@ class StockSentimentAnalyzer:
         return history
 
     # ------------------------------------------------------------------
-    # News fetching (real APIs with fallback)
+    # News fetching (shared headline store, refreshed from the APIs, with fallback)
     # ------------------------------------------------------------------
 
     def _fetch_news(self, ticker: str, company: str, max_articles: int = 8) -> List[Dict]:
-        """Fetch stock news with multi-API fallback → mock."""
-        # Check cache
-        cached = self._cache.get(ticker)
-        if cached and (datetime.now() - cached['time']).seconds < self._cache_ttl:
-            return cached['headlines'][:max_articles]
-
-        headlines: List[Dict] = []
-
-        # Try GNews
-        if not headlines and self.gnews_key:
-            try:
-                headlines = self._fetch_gnews(ticker, company, max_articles)
-            except Exception:
-                pass
-
-        # Try NewsData
-        if not headlines and self.newsdata_key:
-            try:
-                headlines = self._fetch_newsdata(ticker, company, max_articles)
-            except Exception:
-                pass
+        """Stored headlines (refreshed from the news APIs when stale) → mock."""
+        if not headline_store.is_fresh(self._store_key(ticker), NEWS_TTL):
+            self.refresh_news(ticker, company)
+
+        headlines = headline_store.recent(self._store_key(ticker), max_articles, max_age_hours=24 * 7)
 
         # Fallback: generate mock headlines
         if not headlines:
             headlines = self._mock_headlines(ticker, company)
-
-        self._cache[ticker] = {'headlines': headlines, 'time': datetime.now()}
         return headlines[:max_articles]
 
-    def _fetch_gnews(self, ticker: str, company: str, max_articles: int) -> List[Dict]:
-        query = f"{company} stock"
-        url = f"https://gnews.io/api/v4/search?q={query}&lang=en&max={max_articles}&apikey={self.gnews_key}"
-        resp = requests.get(url, timeout=8)
-        resp.raise_for_status()
-        data = resp.json()
-        articles = data.get('articles', [])
-        return [
-            {
-                'title': a.get('title', ''),
-                'source': a.get('source', {}).get('name', 'Unknown'),
-                'hours_ago': self._hours_ago(a.get('publishedAt', '')),
-            }
-            for a in articles
-        ]
+    def refresh_news(
+        self,
+        ticker: str,
+        company: Optional[str] = None,
+        max_articles: int = 10,
+        scheduled: bool = False
+    ) -> int:
+        """
+        Race the news APIs for a ticker, score the headlines and add them to
+        the shared store. Returns the number of new headlines.
 
-    def _fetch_newsdata(self, ticker: str, company: str, max_articles: int) -> List[Dict]:
-        query = f"{company} stock"
-        url = f"https://newsdata.io/api/1/news?apikey={self.newsdata_key}&q={query}&language=en&size={max_articles}"
-        resp = requests.get(url, timeout=8)
-        resp.raise_for_status()
-        data = resp.json()
-        articles = data.get('results', [])
-        return [
-            {
-                'title': a.get('title', ''),
-                'source': a.get('source_id', 'Unknown'),
-                'hours_ago': self._hours_ago(a.get('pubDate', '')),
-            }
-            for a in articles
-        ]
+        Scheduled (background) refreshes leave the interactive reserve of
+        each provider budget alone.
+        """
+        ticker = ticker.upper()
+        company = company or COMPANY_NAMES.get(ticker, ticker)
+
+        # GNews preferred, NewsData second; the pool reorders by observed latency
+        provider_requests = []
+        if self.gnews_key:
+            provider_requests.append(self._gnews_request(company, max_articles))
+        if self.newsdata_key:
+            provider_requests.append(self._newsdata_request(company, max_articles))
+
+        admit = headline_store.spend_scheduled if scheduled else headline_store.spend
+        headlines = news_provider_pool.fetch(provider_requests, min_articles=max_articles, admit=admit)
+        for h, score in zip(headlines, self.scorer.compound_batch([h['title'] for h in headlines])):
+            h['sentiment'] = score
+        # Stored even when empty, so a failing ticker isn't re-fetched on every request
+        return headline_store.add(self._store_key(ticker), headlines)
+
+    @staticmethod
+    def _store_key(ticker: str) -> str:
+        return f"stock:{ticker}"
+
+    def _gnews_request(self, company: str, max_articles: int) -> NewsRequest:
+        return NewsRequest(
+            provider='gnews',
+            url="https://gnews.io/api/v4/search",
+            params={'q': f"{company} stock", 'lang': 'en', 'max': max_articles, 'apikey': self.gnews_key},
+            parse=lambda data: [
+                {
+                    'title': a.get('title', ''),
+                    'source': a.get('source', {}).get('name', 'Unknown'),
+                    'hours_ago': self._hours_ago(a.get('publishedAt', '')),
+                    'url': a.get('url', ''),
+                }
+                for a in data.get('articles', [])
+            ],
+        )
+
+    def _newsdata_request(self, company: str, max_articles: int) -> NewsRequest:
+        return NewsRequest(
+            provider='newsdata',
+            url="https://newsdata.io/api/1/news",
+            params={'apikey': self.newsdata_key, 'q': f"{company} stock", 'language': 'en', 'size': max_articles},
+            parse=lambda data: [
+                {
+                    'title': a.get('title', ''),
+                    'source': a.get('source_id', 'Unknown'),
+                    'hours_ago': self._hours_ago(a.get('pubDate', '')),
+                    'url': a.get('link', ''),
+                }
+                for a in data.get('results', [])
+            ],
+        )
 
     # ------------------------------------------------------------------
     # VADER scoring helpers
     # ------------------------------------------------------------------
 
     def _score_text(self, text: str) -> float:
-        if not self.vader or not text:
-            return 0.0
-        return self.vader.polarity_scores(text)['compound']
+        return self.scorer.compound(text)
 
     def _classify(self, score: float) -> str:
         if score >= 0.5:
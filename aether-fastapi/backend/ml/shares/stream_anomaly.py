@@ -0,0 +1,273 @@
+"""
+Streaming Anomaly Detection for Share Quotes
+Robust streaming z-scores, updated one quote at a time in constant memory per symbol
+"""
+
+import os
+import threading
+import numpy as np
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Union
+import logging
+
+logger = logging.getLogger(__name__)
+
+STATE_DIR = os.path.join(os.path.dirname(__file__), '../cache/stream_anomaly')
+# Iglewicz-Hoaglin cut-off for the modified (median/MAD) z-score
+Z_THRESHOLD = 3.5
+# Log-return scale floor, so a run of unchanged quotes can't make every move extreme
+MIN_SCALE = 1e-4
+
+
+class RobustZScore:
+    """
+    Streaming median and median absolute deviation
+
+    The first `warmup` values seed exact estimates; after that both are
+    tracked by stochastic approximation (step proportional to the current
+    scale), so memory stays constant and single outliers barely move them.
+    """
+
+    def __init__(self, warmup: int = 30, learning_rate: float = 0.02):
+        self.warmup = warmup
+        self.learning_rate = learning_rate
+        self.count = 0
+        self.median = 0.0
+        self.mad = 0.0
+        self.buffer: List[float] = []
+
+    @property
+    def ready(self) -> bool:
+        return self.count >= self.warmup
+
+    def score(self, x: float) -> float:
+        """Modified z-score 0.6745 * (x - median) / MAD (NaN during warm-up)"""
+        if not self.ready:
+            return np.nan
+        return 0.6745 * (x - self.median) / max(self.mad, MIN_SCALE)
+
+    def update(self, x: float):
+        self.count += 1
+        if self.count <= self.warmup:
+            self.buffer.append(x)
+            if self.count == self.warmup:
+                values = np.array(self.buffer)
+                self.median = float(np.median(values))
+                self.mad = float(np.median(np.abs(values - self.median)))
+                self.buffer = []
+            return
+
+        step = self.learning_rate * max(self.mad, MIN_SCALE)
+        self.median += step * np.sign(x - self.median)
+        self.mad = max(self.mad + step * np.sign(abs(x - self.median) - self.mad), 0.0)
+
+    def to_arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        return {
+            f"{prefix}state": np.array([self.count, self.median, self.mad]),
+            f"{prefix}buffer": np.array(self.buffer, dtype=np.float64),
+        }
+
+    def load_arrays(self, arrays: Dict[str, np.ndarray], prefix: str):
+        count, self.median, self.mad = arrays[f"{prefix}state"].tolist()
+        self.count = int(count)
+        self.buffer = arrays[f"{prefix}buffer"].tolist()
+
+
+class SymbolStream:
+    """Constant-size detector state for one symbol"""
+
+    def __init__(self):
+        self.price: Optional[float] = None
+        self.volume: Optional[float] = None
+        self.quote_time: Optional[datetime] = None
+        self.returns = RobustZScore()
+        self.volume_changes = RobustZScore()
+
+    def save(self, path: str):
+        arrays = {
+            'quote': np.array([
+                np.nan if self.price is None else self.price,
+                np.nan if self.volume is None else self.volume,
+                np.nan if self.quote_time is None else self.quote_time.timestamp(),
+            ])
+        }
+        arrays.update(self.returns.to_arrays('returns.'))
+        arrays.update(self.volume_changes.to_arrays('volume.'))
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'SymbolStream':
+        stream = cls()
+        with np.load(path) as data:
+            arrays = {key: data[key] for key in data.files}
+        price, volume, timestamp = arrays['quote'].tolist()
+        stream.price = None if np.isnan(price) else price
+        stream.volume = None if np.isnan(volume) else volume
+        stream.quote_time = None if np.isnan(timestamp) else datetime.fromtimestamp(timestamp, tz=timezone.utc)
+        stream.returns.load_arrays(arrays, 'returns.')
+        stream.volume_changes.load_arrays(arrays, 'volume.')
+        return stream
+
+
+Quote = Union[float, Dict[str, float]]
+
+
+class StreamingAnomalyDetector:
+    """
+    Online anomaly detection on the live quote feed
+
+    Every quote updates its symbol's robust z-scores (log return and, when
+    the quote carries volume, log volume change). A quote is anomalous when
+    either z-score passes Z_THRESHOLD. State is constant-size per symbol
+    and saved as .npz after each batch.
+    """
+
+    def __init__(self, state_dir: str = STATE_DIR):
+        self.state_dir = state_dir
+        self._streams: Dict[str, SymbolStream] = {}
+        self._lock = threading.Lock()
+
+    def _state_path(self, symbol: str) -> str:
+        return os.path.join(self.state_dir, f"{symbol.upper()}.npz")
+
+    def _stream(self, symbol: str) -> SymbolStream:
+        stream = self._streams.get(symbol)
+        if stream is None:
+            path = self._state_path(symbol)
+            try:
+                stream = SymbolStream.load(path) if os.path.exists(path) else SymbolStream()
+            except Exception as e:
+                logger.warning(f"Discarding unreadable anomaly state {path}: {e}")
+                stream = SymbolStream()
+            self._streams[symbol] = stream
+        return stream
+
+    def ingest(self, quotes: Dict[str, Optional[Quote]], quote_time: Optional[datetime] = None) -> List[Dict]:
+        """
+        Advance each symbol's detector by one quote
+
+        Args:
+            quotes: Symbol to price, or to {'price': ..., 'volume': ...};
+                None (price unavailable) is skipped
+            quote_time: When the quotes were taken (default now, UTC)
+
+        Returns:
+            Anomaly events, as AnomalyEvent column values
+        """
+        quote_time = quote_time or datetime.now(timezone.utc)
+        events = []
+
+        with self._lock:
+            changed = []
+            for symbol, quote in quotes.items():
+                if quote is None:
+                    continue
+                price, volume = (quote.get('price'), quote.get('volume')) if isinstance(quote, dict) else (quote, None)
+                if not price or price <= 0:
+                    continue
+
+                stream = self._stream(symbol)
+                event = self._observe(symbol, stream, float(price), volume, quote_time)
+                if event is not None:
+                    events.append(event)
+                changed.append(symbol)
+
+            if changed:
+                os.makedirs(self.state_dir, exist_ok=True)
+                for symbol in changed:
+                    self._streams[symbol].save(self._state_path(symbol))
+
+        return events
+
+    def _observe(self, symbol: str, stream: SymbolStream, price: float, volume: Optional[float], quote_time: datetime) -> Optional[Dict]:
+        """Score one quote against the symbol's state, then fold it in"""
+        previous_price, previous_volume = stream.price, stream.volume
+        if previous_price is not None and price == previous_price and volume == previous_volume:
+            # Unchanged quote (e.g. market closed, or two refreshes close together)
+            return None
+
+        stream.price, stream.volume, stream.quote_time = price, volume, quote_time
+        if previous_price is None:
+            return None
+
+        log_return = float(np.log(price / previous_price))
+        volume_change = None
+        if volume and previous_volume:
+            volume_change = float(np.log(volume / previous_volume))
+
+        price_z = stream.returns.score(log_return)
+        volume_z = stream.volume_changes.score(volume_change) if volume_change is not None else np.nan
+
+        stream.returns.update(log_return)
+        if volume_change is not None:
+            stream.volume_changes.update(volume_change)
+
+        z_values = [abs(z) for z in (price_z, volume_z) if np.isfinite(z)]
+        if not z_values or max(z_values) < Z_THRESHOLD:
+            return None
+        return self._event(symbol, price, previous_price, volume_change, price_z, volume_z, quote_time)
+
+    def _event(
+        self,
+        symbol: str,
+        price: float,
+        previous_price: float,
+        volume_change: Optional[float],
+        price_z: float,
+        volume_z: float,
+        quote_time: datetime
+    ) -> Dict:
+        """Classify and describe an anomalous quote"""
+        change = price / previous_price - 1
+        volume_pct = None if volume_change is None else float(np.expm1(volume_change))
+
+        if not np.isfinite(volume_z) or abs(price_z) >= abs(volume_z):
+            anomaly_type = 'price'
+            detail_val = change * 100
+            if abs(change) > 0.05:
+                severity = 'high'
+                description = f"{symbol} had a {'surge' if change > 0 else 'drop'} of {detail_val:+.1f}% since the last quote — significantly outside normal range"
+            elif abs(change) > 0.03:
+                severity = 'medium'
+                description = f"{symbol} moved {detail_val:+.1f}% since the last quote — an unusual price swing"
+            else:
+                severity = 'low'
+                description = f"{symbol} showed abnormal price behavior ({detail_val:+.1f}%)"
+        else:
+            anomaly_type = 'volume'
+            vol_multiple = float(np.exp(volume_change))
+            if vol_multiple < 1:
+                severity = 'low'
+                description = f"{symbol} volume fell to {vol_multiple:.2f}x the previous quote — unusually thin trading"
+            elif vol_multiple > 3:
+                severity = 'high'
+                description = f"{symbol} volume spiked {vol_multiple:.1f}x above normal — possible institutional activity"
+            elif vol_multiple > 2:
+                severity = 'medium'
+                description = f"{symbol} volume was {vol_multiple:.1f}x normal — unusual trading activity"
+            else:
+                severity = 'low'
+                description = f"{symbol} had slightly abnormal volume ({vol_multiple:.1f}x)"
+
+        def _finite(value):
+            return round(float(value), 4) if value is not None and np.isfinite(value) else None
+
+        return {
+            'symbol': symbol,
+            'anomaly_type': anomaly_type,
+            'severity': severity,
+            'description': description,
+            'price': price,
+            'previous_price': previous_price,
+            'price_change': round(change * 100, 2),
+            'volume_change': None if volume_pct is None else round(volume_pct * 100, 2),
+            'price_zscore': _finite(price_z),
+            'volume_zscore': _finite(volume_z),
+            'quote_time': quote_time,
+        }
+
+
+# Singleton instance
+stream_anomaly_detector = StreamingAnomalyDetector()
@@ -0,0 +1,424 @@
+"""
+Training Pipeline
+Retrains every supported symbol's models in parallel and publishes versioned artifacts the API hot-reloads
+
+Usage:
+    python ml/train_pipeline.py                      # LSTM, XGBoost baseline and risk classifier for every symbol
+    python ml/train_pipeline.py BTC ETH --models lstm
+    python ml/train_pipeline.py --workers 4 --deadline-minutes 45
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import glob
+import json
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from typing import Dict, List, Optional
+import multiprocessing
+
+from ml.artifacts import hash_arrays
+from ml.data.data_collector import CryptoDataCollector, data_collector
+
+FEATURES_DIR = os.path.join(os.path.dirname(__file__), 'cache', 'features')
+RUNS_DIR = os.path.join(os.path.dirname(__file__), 'cache', 'training_runs')
+MODELS = ('lstm', 'xgboost', 'risk')
+# Symbol column of jobs that train one model on every symbol's history
+UNIVERSE = 'ALL'
+
+# Concurrent CoinGecko requests (the free tier rate-limits bursts)
+FETCH_CONCURRENCY = 2
+# Newest share of the XGBoost training range held out for early stopping and trial selection
+XGBOOST_VALIDATION_FRACTION = 0.125
+# Risk classifier rows: features over the trailing RISK_WINDOW days (30-day volatility and
+# its 90-day average), every RISK_STEP days, labeled by the next RISK_HORIZON days' volatility
+RISK_WINDOW = 120
+RISK_STEP = 5
+RISK_HORIZON = 30
+
+
+# ---------------------------------------------------------------------------
+# Shared feature cache
+# ---------------------------------------------------------------------------
+
+def feature_cache_path(symbol: str, history: pd.DataFrame, features_dir: str = FEATURES_DIR) -> str:
+    """Cache file for a symbol's indicator frame, keyed by a hash of the raw history"""
+    digest = hash_arrays(
+        pd.to_numeric(history['price'], errors='coerce').to_numpy(dtype=np.float64),
+        pd.to_numeric(history['volume'], errors='coerce').to_numpy(dtype=np.float64)
+    )
+    return os.path.join(features_dir, f"{symbol.upper()}_{digest[:16]}.npz")
+
+
+def build_feature_cache(symbol: str, history: pd.DataFrame, features_dir: str = FEATURES_DIR) -> str:
+    """
+    Compute a symbol's technical indicators once and store them for every
+    model's worker (reused as long as the raw history is unchanged)
+
+    Returns:
+        Path of the cached feature file
+    """
+    from ml.data.feature_engineering import feature_engineer
+
+    path = feature_cache_path(symbol, history, features_dir)
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(features_dir, exist_ok=True)
+    df = feature_engineer.add_technical_indicators(history)
+    columns = {name: df[name].to_numpy() for name in df.columns if name != 'date'}
+    if 'date' in df.columns:
+        columns['date'] = pd.to_datetime(df['date']).to_numpy(dtype='datetime64[ns]')
+
+    tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, **columns)
+    os.replace(tmp_path, path)
+
+    # Drop the symbol's stale feature files
+    for stale in glob.glob(os.path.join(features_dir, f"{symbol.upper()}_*.npz")):
+        if stale != path:
+            os.remove(stale)
+    return path
+
+
+def load_feature_cache(path: str) -> pd.DataFrame:
+    with np.load(path) as data:
+        return pd.DataFrame({name: data[name] for name in data.files})
+
+
+# ---------------------------------------------------------------------------
+# Workers (run in the pipeline's process pool)
+# ---------------------------------------------------------------------------
+
+def _init_worker(threads: int):
+    """Pin each worker to its share of the cores before any model code runs"""
+    os.environ['OMP_NUM_THREADS'] = str(threads)
+    os.environ['MKL_NUM_THREADS'] = str(threads)
+    import torch
+    torch.set_num_threads(threads)
+
+
+def _train_lstm(symbol: str, features_path: str, publish: bool, deadline: float) -> Dict:
+    from ml.predictors.lstm_training import train_symbol
+
+    return train_symbol(
+        symbol,
+        load_feature_cache(features_path),
+        publish=publish,
+        deadline=deadline
+    )
+
+
+def xgboost_dataset(features_path: str, lookback: int = 30) -> Dict:
+    """
+    Next-day price regression set (features as in ml/train_xgboost.py) with
+    a chronological 80/20 split, scaled on the training part only.
+
+    The training part is further split into X_fit (older) and X_val (newest
+    XGBOOST_VALIDATION_FRACTION) for tuning, so X_test stays held out for
+    the reported metrics.
+    """
+    from sklearn.preprocessing import MinMaxScaler
+    from ml.train_xgboost import XGBoostTrainer
+
+    trainer = XGBoostTrainer(lookback=lookback)
+    df_features = trainer.create_features(load_feature_cache(features_path)[['price']])
+    feature_cols = [col for col in df_features.columns if col not in ('price', 'target')]
+
+    X = df_features[feature_cols].values
+    y = df_features['target'].values
+    split_idx = int(len(X) * 0.8)
+
+    val_idx = int(split_idx * (1 - XGBOOST_VALIDATION_FRACTION))
+
+    scaler = MinMaxScaler(feature_range=(0, 1))
+    X_train = scaler.fit_transform(X[:split_idx])
+    return {
+        'X_train': X_train,
+        'X_test': scaler.transform(X[split_idx:]),
+        'y_train': y[:split_idx],
+        'y_test': y[split_idx:],
+        'X_fit': X_train[:val_idx],
+        'y_fit': y[:val_idx],
+        'X_val': X_train[val_idx:],
+        'y_val': y[val_idx:split_idx],
+        'scaler': scaler,
+        'feature_columns': feature_cols,
+        'lookback': lookback,
+        'data_hash': hash_arrays(X, y)
+    }
+
+
+def _train_xgboost(symbol: str, features_path: str, publish: bool, deadline: float) -> Dict:
+    """
+    Next-day price XGBoost baseline with the symbol's tuned parameters
+
+    Only its held-out metrics go in the run report, as a yardstick for the
+    LSTM; no API path serves XGBoost prices, so nothing is published.
+    """
+    import xgboost as xgb
+    from sklearn.metrics import mean_absolute_error, mean_squared_error
+    from ml.hparam_search import XGBOOST_DEFAULTS, load_best_params
+
+    data = xgboost_dataset(features_path)
+    params = {**XGBOOST_DEFAULTS, **(load_best_params(symbol, 'xgboost') or {})}
+
+    model = xgb.XGBRegressor(
+        **params,
+        random_state=42,
+        n_jobs=int(os.environ.get('OMP_NUM_THREADS', 1))
+    )
+    model.fit(data['X_train'], data['y_train'])
+
+    y_pred = model.predict(data['X_test'])
+    return {
+        'test_rmse': float(np.sqrt(mean_squared_error(data['y_test'], y_pred))),
+        'test_mae': float(mean_absolute_error(data['y_test'], y_pred)),
+        'data_hash': data['data_hash']
+    }
+
+
+def risk_dataset(feature_paths: Dict[str, str]) -> Dict:
+    """
+    Universe-wide risk classification set
+
+    Each row is one symbol's risk features on one day, computed from the
+    trailing RISK_WINDOW days exactly as the API's universe scoring does
+    (BTC as the correlation benchmark), with the annualized volatility of
+    the following RISK_HORIZON days as the label input. Rows are in time
+    order, so the classifier's 80/20 split is chronological.
+    """
+    from ml.data import indicators
+    from ml.data.risk_features import RiskFeatureEngineer, RISK_FEATURE_NAMES
+
+    frames = {symbol: load_feature_cache(path) for symbol, path in feature_paths.items()}
+    symbols = list(frames)
+    # Front-pad shorter histories so the newest day lines up
+    length = max(len(frame) for frame in frames.values())
+    prices = np.full((len(symbols), length), np.nan)
+    volumes = np.full((len(symbols), length), np.nan)
+    for i, symbol in enumerate(symbols):
+        prices[i, length - len(frames[symbol]):] = frames[symbol]['price'].to_numpy(dtype=np.float64)
+        volumes[i, length - len(frames[symbol]):] = frames[symbol]['volume'].to_numpy(dtype=np.float64)
+
+    btc = prices[symbols.index('BTC')] if 'BTC' in frames else None
+    benchmark_rows = np.array([s == 'BTC' for s in symbols])
+    engineer = RiskFeatureEngineer()
+    returns = indicators.pct_change(prices)
+
+    X, volatility = [], []
+    for end in range(RISK_WINDOW, length - RISK_HORIZON + 1, RISK_STEP):
+        start = end - RISK_WINDOW
+        features = engineer.engineer_feature_matrix(
+            prices[:, start:end], volumes[:, start:end],
+            None if btc is None else btc[start:end],
+            benchmark_rows=benchmark_rows
+        )
+        forward = returns[:, end:end + RISK_HORIZON]
+        with np.errstate(invalid='ignore'):
+            realized = np.nanstd(forward, axis=1, ddof=1) * np.sqrt(365) * 100
+        keep = ~np.isnan(prices[:, start]) & (np.isnan(forward).sum(axis=1) == 0)
+        X.append(features[keep])
+        volatility.append(realized[keep])
+
+    if not X:
+        raise ValueError(f"Need at least {RISK_WINDOW + RISK_HORIZON} days of history for the risk classifier")
+    X, volatility = np.vstack(X), np.concatenate(volatility)
+    return {
+        'X': X,
+        'volatility': volatility,
+        'feature_names': list(RISK_FEATURE_NAMES),
+        'data_hash': hash_arrays(X, volatility)
+    }
+
+
+def _train_risk(feature_paths: Dict[str, str], publish: bool, deadline: float) -> Dict:
+    """The risk classifier the API scores with, trained on every symbol and published for hot reload"""
+    from ml.predictors.risk_classifier import CryptoRiskClassifier, RISK_MODEL_NAME
+
+    data = risk_dataset(feature_paths)
+    classifier = CryptoRiskClassifier()
+    metrics = classifier.train(data['X'], data['volatility'], data['feature_names'])
+    version = classifier.save_model(
+        f'{RISK_MODEL_NAME}.pkl',
+        training_data_hash=data['data_hash'],
+        make_current=publish
+    )
+    return {'version': version, **metrics}
+
+
+WORKERS = {
+    'lstm': _train_lstm,
+    'xgboost': _train_xgboost,
+}
+# Models trained once on every symbol's history
+UNIVERSE_WORKERS = {
+    'risk': _train_risk,
+}
+
+
+# ---------------------------------------------------------------------------
+# Pipeline
+# ---------------------------------------------------------------------------
+
+def partition_cpus(workers: Optional[int] = None, n_jobs: Optional[int] = None) -> Dict[str, int]:
+    """
+    Split the machine into worker processes x threads per worker.
+
+    More narrow workers beat fewer wide ones for these small models, so
+    the default is one process per two cores, never more than there are
+    jobs; each worker gets an equal share of the cores as its thread budget.
+    """
+    cpus = os.cpu_count() or 2
+    workers = max(1, workers or cpus // 2)
+    if n_jobs:
+        workers = min(workers, n_jobs)
+    return {'workers': workers, 'threads': max(1, cpus // workers)}
+
+
+async def fetch_histories(symbols: List[str], days: int) -> Dict[str, pd.DataFrame]:
+    """Fetch every symbol's history (through the collector's cache), a few at a time"""
+    semaphore = asyncio.Semaphore(FETCH_CONCURRENCY)
+
+    async def fetch(symbol):
+        async with semaphore:
+            return symbol, await data_collector.fetch_historical_data(symbol, days=days)
+
+    return dict(await asyncio.gather(*(fetch(symbol) for symbol in symbols)))
+
+
+def run_pipeline(
+    histories: Dict[str, pd.DataFrame],
+    models: List[str],
+    workers: Optional[int] = None,
+    deadline_minutes: Optional[float] = None,
+    publish: bool = True
+) -> List[Dict]:
+    """
+    Train every (symbol, model) job in a process pool.
+
+    Jobs still queued when the deadline passes are cancelled; running LSTM
+    jobs stop at the end of their current epoch and keep their best weights.
+
+    Returns:
+        One result dict per job: symbol, model, status, seconds and the
+        worker's result (or error)
+    """
+    # LSTMs first: they are the long jobs, so they should start immediately
+    symbol_models = sorted((m for m in models if m in WORKERS), key=lambda m: m != 'lstm')
+    jobs = [(symbol, model) for model in symbol_models for symbol in histories]
+    jobs += [(UNIVERSE, model) for model in models if model in UNIVERSE_WORKERS]
+    cpus = partition_cpus(workers, len(jobs))
+    deadline = time.time() + deadline_minutes * 60 if deadline_minutes else float('inf')
+
+    print(f"Building feature cache for {len(histories)} symbols...")
+    feature_paths = {symbol: build_feature_cache(symbol, history) for symbol, history in histories.items()}
+
+    print(f"Training {len(jobs)} jobs on {cpus['workers']} workers x {cpus['threads']} threads")
+    results = []
+    with ProcessPoolExecutor(
+        max_workers=cpus['workers'],
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+        initargs=(cpus['threads'],)
+    ) as executor:
+        def submit(symbol: str, model: str):
+            if symbol == UNIVERSE:
+                return executor.submit(UNIVERSE_WORKERS[model], feature_paths, publish, deadline)
+            return executor.submit(WORKERS[model], symbol, feature_paths[symbol], publish, deadline)
+
+        futures = {submit(symbol, model): (symbol, model, time.time()) for symbol, model in jobs}
+        pending = set(futures)
+
+        while pending:
+            timeout = None if deadline == float('inf') else max(0.0, deadline - time.time())
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                symbol, model, submitted = futures[future]
+                entry = {'symbol': symbol, 'model': model, 'seconds': round(time.time() - submitted, 1)}
+                try:
+                    entry.update(status='completed', result=future.result())
+                except Exception as e:
+                    entry.update(status='failed', error=str(e))
+                results.append(entry)
+                print(f"  {symbol:<6} {model:<8} {entry['status']} ({entry['seconds']}s)")
+
+            if pending and time.time() >= deadline:
+                for future in list(pending):
+                    if future.cancel():
+                        pending.discard(future)
+                        symbol, model, _ = futures[future]
+                        results.append({'symbol': symbol, 'model': model, 'status': 'skipped', 'error': 'deadline'})
+                deadline = float('inf')  # let the running jobs finish their current epoch
+
+    return results
+
+
+def write_run_report(results: List[Dict], started_at: datetime, runs_dir: str = RUNS_DIR) -> str:
+    os.makedirs(runs_dir, exist_ok=True)
+    path = os.path.join(runs_dir, f"{started_at.strftime('%Y%m%dT%H%M%S')}.json")
+    with open(path, 'w') as f:
+        json.dump({
+            'started_at': started_at.isoformat(),
+            'finished_at': datetime.now().isoformat(),
+            'jobs': results
+        }, f, indent=2)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrain models for every supported symbol")
+    parser.add_argument('symbols', nargs='*', help="Symbols to train (default: every symbol in the data collector)")
+    parser.add_argument('--models', default=','.join(MODELS), help="Comma-separated models: lstm,xgboost,risk")
+    parser.add_argument('--days', type=int, default=365, help="Days of history to train on")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: cores / 2)")
+    parser.add_argument('--deadline-minutes', type=float, default=None, help="Stop scheduling jobs after this long")
+    parser.add_argument('--no-publish', action='store_true', help="Write new versions without activating them")
+    args = parser.parse_args()
+
+    symbols = [s.upper() for s in args.symbols] or list(CryptoDataCollector.SYMBOL_MAP)
+    models = [m.strip() for m in args.models.split(',') if m.strip()]
+    unknown = [m for m in models if m not in MODELS]
+    if unknown:
+        print(f"Unknown models: {', '.join(unknown)} (choose from {', '.join(MODELS)})")
+        return 1
+
+    print("\n" + "=" * 60)
+    print(f"TRAINING PIPELINE: {', '.join(models)} x {len(symbols)} symbols")
+    print("=" * 60)
+
+    started_at = datetime.now()
+    histories = asyncio.run(fetch_histories(symbols, args.days))
+    # A failed fetch gives None, or the collector's synthetic fallback series
+    histories = {
+        symbol: df for symbol, df in histories.items()
+        if df is not None and not df.attrs.get('synthetic') and len(df) >= 100
+    }
+    for symbol in sorted(set(symbols) - set(histories)):
+        print(f"  {symbol:<6} skipped: insufficient historical data")
+
+    results = run_pipeline(
+        histories, models,
+        workers=args.workers,
+        deadline_minutes=args.deadline_minutes,
+        publish=not args.no_publish
+    )
+    report = write_run_report(results, started_at)
+
+    failed = [r for r in results if r['status'] != 'completed']
+    print("=" * 60)
+    print(f"{len(results) - len(failed)}/{len(results)} jobs completed in "
+          f"{(datetime.now() - started_at).total_seconds():.0f}s (report: {report})")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,3 +9,4 @@ from .crypto import CryptoHolding, CryptoTransaction, CryptoWallet
 from .shares import Share
 from .bonds import Bond
 from .business import Business, BusinessTransaction
+from .anomaly_event import AnomalyEvent
@@ -0,0 +1,34 @@
+from sqlalchemy import Column, String, Float, DateTime, BigInteger, Integer, Index
+from sqlalchemy.sql import func
+from database import Base
+
+
+class AnomalyEvent(Base):
+    """Anomaly detected on the live quote feed (market data, shared by all users)"""
+    __tablename__ = "anomaly_events"
+
+    # Sequential id: events are append-only and paged newest-first by id
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    symbol = Column(String, nullable=False)  # Normalized ticker, e.g. AAPL, SUZLON.NS
+
+    anomaly_type = Column(String, nullable=False)  # price, volume
+    severity = Column(String, nullable=False)      # low, medium, high
+    description = Column(String, nullable=False)
+
+    # Quote that triggered the event
+    price = Column(Float, nullable=False)
+    previous_price = Column(Float, nullable=False)
+    price_change = Column(Float, nullable=False)   # Percent since the previous quote
+    volume_change = Column(Float, nullable=True)   # Percent, when the feed has volume
+    price_zscore = Column(Float, nullable=True)    # Robust (median/MAD) z-score
+    volume_zscore = Column(Float, nullable=True)
+
+    quote_time = Column(DateTime(timezone=True), nullable=False)
+    detected_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index('ix_anomaly_events_symbol_id', 'symbol', 'id'),
+    )
+
+    def __repr__(self):
+        return f"<AnomalyEvent(id={self.id}, symbol='{self.symbol}', type='{self.anomaly_type}', severity='{self.severity}')>"
@@ -4,11 +4,13 @@ Endpoints for crypto price predictions and AI insights
 """
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import Optional, List
 from uuid import UUID
 from datetime import datetime
 import asyncio
+import json
 
 from database import get_db
 from models.crypto import CryptoHolding
@@ -17,6 +19,7 @@ from routes.auth import get_current_user
 from ml.predictors.crypto_forecaster import crypto_forecaster
 from ml.predictors.insight_generator import generate_all_insights, calculate_portfolio_health_score
 from ml.predictors.scenario_engine import scenario_simulator
+from ml.predictors.stress_engine import stress_tester, MAX_PATH_DAYS
 from pydantic import BaseModel
 
 router = APIRouter(
@@ -55,6 +58,42 @@ async def predict_crypto_price(
     return prediction
 
 
+class BatchPredictionRequest(BaseModel):
+    symbols: List[str]
+    horizons: List[int] = [30]
+
+
+@router.post("/predict/batch")
+async def predict_crypto_batch(
+    request: BatchPredictionRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Predict several cryptocurrencies in one call
+    
+    Histories are fetched concurrently and models are fitted in parallel;
+    results stream back as NDJSON, one line per (symbol, horizon) in
+    completion order, so cached symbols appear immediately.
+    
+    Args:
+        symbols: Crypto symbols (e.g. ["BTC", "ETH"])
+        horizons: Forecast horizons in days (default: [30])
+    
+    Returns:
+        application/x-ndjson stream of {symbol, days_ahead, status, data|detail}
+    """
+    if not request.symbols:
+        raise HTTPException(status_code=400, detail="At least one symbol is required")
+    if any(days < 1 or days > 365 for days in request.horizons) or not request.horizons:
+        raise HTTPException(status_code=400, detail="Horizons must be between 1 and 365 days")
+    
+    async def ndjson():
+        async for line in crypto_forecaster.predict_batch(request.symbols, request.horizons):
+            yield json.dumps(line) + "\n"
+    
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+
 @router.get("/predict-multi/{symbol}")
 async def predict_crypto_multi_horizon(
     symbol: str,
@@ -190,15 +229,17 @@ async def get_ai_insights(
     
     # Generate insights and health score
     try:
-        # We need predictions for the health score calculation
+        # Predict once; both the insights and the health score use the same predictions
         predictions = await crypto_forecaster.get_portfolio_predictions(
             holdings=holdings_data,
-            days_ahead=days_ahead
+            days_ahead=days_ahead,
+            user_id=str(current_user.id)
         )
         
         insights = await generate_all_insights(
             holdings=holdings_data,
-            days_ahead=days_ahead
+            days_ahead=days_ahead,
+            predictions=predictions
         )
         
         health_score = await asyncio.to_thread(calculate_portfolio_health_score, holdings_data, predictions)
@@ -308,3 +349,113 @@ async def simulate_scenario(
     )
     
     return result
+
+
+class SimulationGridRequest(BaseModel):
+    shock_targets: List[str]
+    shock_percents: List[float]
+
+
+@router.post("/simulate/grid")
+async def simulate_scenario_grid(
+    request: SimulationGridRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Stress surface: every shock target x magnitude in one call
+    
+    Args:
+        shock_targets: Assets to shock (e.g. ["BTC", "ETH", "SOL"])
+        shock_percents: Moves to apply to each (e.g. [-50, -30, -10, 10, 30])
+        
+    Returns:
+        Portfolio change per (target, magnitude), per-holding moves and betas
+    """
+    if not request.shock_targets or not request.shock_percents:
+        raise HTTPException(status_code=400, detail="At least one shock target and one shock percent are required")
+    if len(request.shock_targets) > 20 or len(request.shock_percents) > 100:
+        raise HTTPException(status_code=400, detail="At most 20 shock targets and 100 shock percents")
+
+    holdings = db.query(CryptoHolding).filter(
+        CryptoHolding.user_id == current_user.id
+    ).all()
+    
+    if not holdings:
+        raise HTTPException(status_code=400, detail="No holdings to simulate")
+        
+    holdings_data = [
+        {
+            "symbol": h.symbol,
+            "quantity": float(h.quantity),
+            "current_value": float(h.quantity * (h.current_price or 0))
+        }
+        for h in holdings
+    ]
+    
+    return await scenario_simulator.simulate_grid(
+        holdings=holdings_data,
+        shock_targets=request.shock_targets,
+        shock_percents=request.shock_percents
+    )
+
+
+class StressTestRequest(BaseModel):
+    horizon_days: int = 30
+    n_paths: int = 10000
+    seed: Optional[int] = None
+
+
+@router.post("/stress-test")
+async def stress_test_portfolio(
+    request: StressTestRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Monte Carlo stress test of the user's crypto holdings
+    
+    Simulates joint fat-tailed (Student-t copula) daily return paths from
+    the scenario engine's correlation data.
+    
+    Args:
+        horizon_days: Days to simulate (1-365, default 30)
+        n_paths: Monte Carlo paths (1,000-100,000, default 10,000;
+            n_paths x horizon_days at most 2,000,000)
+        seed: Optional RNG seed for reproducible results
+        
+    Returns:
+        VaR/CVaR (95%, 99%), drawdown probability curve and value percentiles
+    """
+    if not 1 <= request.horizon_days <= 365:
+        raise HTTPException(status_code=400, detail="horizon_days must be between 1 and 365")
+    if not 1000 <= request.n_paths <= 100000:
+        raise HTTPException(status_code=400, detail="n_paths must be between 1000 and 100000")
+    if request.n_paths * request.horizon_days > MAX_PATH_DAYS:
+        raise HTTPException(status_code=400, detail=f"n_paths x horizon_days must not exceed {MAX_PATH_DAYS:,}")
+
+    holdings = db.query(CryptoHolding).filter(
+        CryptoHolding.user_id == current_user.id
+    ).all()
+    
+    if not holdings:
+        raise HTTPException(status_code=400, detail="No holdings to stress test")
+        
+    holdings_data = [
+        {
+            "symbol": h.symbol,
+            "quantity": float(h.quantity),
+            "current_price": float(h.current_price or 0)
+        }
+        for h in holdings
+    ]
+    
+    try:
+        return await stress_tester.stress_test(
+            holdings_data,
+            horizon_days=request.horizon_days,
+            n_paths=request.n_paths,
+            seed=request.seed
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid input: {str(e)}")
@@ -5,7 +5,6 @@ FastAPI endpoints for ML-powered crypto insights
 
 from fastapi import APIRouter, HTTPException, Depends
 from typing import Optional, List
-import numpy as np
 from datetime import datetime
 import sys
 import asyncio
@@ -14,21 +13,18 @@ import os
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from ml.predictors.lstm_price_predictor import lstm_predictor
+from ml.predictors.lstm_model_pool import lstm_model_pool
+from ml.predictors.lstm_training import training_jobs
 from ml.predictors.crypto_forecaster import crypto_forecaster
 from ml.predictors.prophet_predictor import prophet_predictor
 from ml.predictors.ensemble_predictor import ensemble_predictor
-from ml.data.feature_engineering import feature_engineer
-from ml.data.data_collector import data_collector
-from ml.data.risk_features import RiskFeatureEngineer
-from ml.predictors.risk_classifier import CryptoRiskClassifier
+from ml.data.feature_store import feature_store
+from ml.data.indicator_state import indicator_states
+from ml.predictors.risk_classifier import risk_classifier
+from ml.predictors.risk_universe import risk_universe, format_risk_result
 from ml.nlp.sentiment_aggregator import sentiment_aggregator
 from ml.predictors.crypto_insights_generator import crypto_insights_generator
 
-# Initialize risk classifier
-risk_feature_engineer = RiskFeatureEngineer()
-risk_classifier = CryptoRiskClassifier()
-
 router = APIRouter(prefix="/api/ml", tags=["AI Lab"])
 
 
@@ -53,67 +49,47 @@ async def predict_lstm_price(
         symbol = symbol.upper()
         horizon_list = [int(h.strip()) for h in horizons.split(',')]
         
-        # Try to load existing model
-        model_loaded = (await asyncio.to_thread(lstm_predictor.load_model, symbol)) if not retrain else False
+        # Shared, read-only model from the pool (loaded from disk once per symbol)
+        model = None if retrain else await asyncio.to_thread(lstm_model_pool.get, symbol)
+        model_loaded = model is not None
         
-        if not model_loaded or retrain:
-            # Fetch historical data
-            df = await data_collector.fetch_historical_data(symbol, days=365)
-            
-            if len(df) < 100:
+        # Today's history and indicators, materialized once per symbol per day
+        features = await feature_store.get(symbol)
+        
+        if not model_loaded:
+            if len(features) < 100:
                 raise HTTPException(status_code=400, detail="Insufficient historical data")
             
-            # Add features
-            df = await asyncio.to_thread(feature_engineer.add_technical_indicators, df)
-            
-            # Prepare sequences
-            seq_data = await asyncio.to_thread(feature_engineer.prepare_lstm_sequences, df, 60)
-            
-            X = seq_data['X']
-            y = seq_data['y']
-            
-            # Split into train/validation (80/20)
-            split_idx = int(len(X) * 0.8)
-            X_train, X_val = X[:split_idx], X[split_idx:]
-            y_train, y_val = y[:split_idx], y[split_idx:]
-            
-            # Train model
+            # Train in the ML process pool (its own torch thread budget) and
+            # wait for the new weights to be published to the model pool
             print(f"Training LSTM for {symbol}...")
-            history = await asyncio.to_thread(
-                lstm_predictor.train,
-                X_train, y_train,
-                X_val, y_val,
-                50,  # epochs
-                32,  # batch_size
-                10   # early_stopping_patience
-            )
+            job = training_jobs.submit(symbol, features.frame())
+            job = await asyncio.to_thread(training_jobs.wait, job['job_id'])
+            if job['status'] != 'completed':
+                raise RuntimeError(f"LSTM training failed: {job['error']}")
             
-            # Save model and scaler
-            lstm_predictor.scaler = seq_data['scaler']
-            lstm_predictor.feature_columns = seq_data['feature_columns']
-            lstm_predictor.sequence_length = seq_data['sequence_length']
-            await asyncio.to_thread(lstm_predictor.save_model, symbol)
+            model = await asyncio.to_thread(lstm_model_pool.get, symbol)
             
             # Calculate training metrics
-            train_rmse = np.sqrt(history['train_loss'][-1])
-            val_rmse = np.sqrt(history['val_loss'][-1]) if history['val_loss'] else None
+            train_rmse = job['result']['train_rmse']
+            val_rmse = job['result']['val_rmse']
         else:
-            # Load recent data for prediction
-            df = await data_collector.fetch_historical_data(symbol, days=90)
-            df = await asyncio.to_thread(feature_engineer.add_technical_indicators, df)
-            seq_data = await asyncio.to_thread(feature_engineer.prepare_lstm_sequences, df, 60)
-            
             train_rmse = None  # Model already trained
             val_rmse = None
         
-        # Get last sequence for prediction
-        last_sequence = seq_data['X'][-1]  # Shape: (60, num_features)
+        # Closed bars from the store plus the collector's current live bar; indicators
+        # come from the symbol's incremental state, not a full recompute
+        df = await feature_store.live_history(symbol)
+        
+        # Only the newest window is needed, scaled the way the model was trained
+        last_sequence = await asyncio.to_thread(
+            indicator_states.inference_window,
+            symbol, df, model.scaler, model.feature_columns, model.sequence_length
+        )
         
         # Make multi-horizon predictions
-        predictions = await asyncio.to_thread(lstm_predictor.predict_multi_horizon, last_sequence, horizon_list)
+        predictions = await asyncio.to_thread(model.predict_multi_horizon, last_sequence, horizon_list)
         
-        # Inverse transform predictions to original scale
-        scaler = lstm_predictor.scaler
         current_price = df['price'].iloc[-1]
         
         result = {
@@ -124,21 +100,15 @@ async def predict_lstm_price(
             "model_metrics": {
                 "train_rmse": round(train_rmse, 4) if train_rmse else "N/A",
                 "val_rmse": round(val_rmse, 4) if val_rmse else "N/A",
-                "model_trained": not model_loaded or retrain
+                "model_trained": not model_loaded
             },
             "timestamp": datetime.now().isoformat()
         }
         
         # Transform predictions back to original scale
         for horizon_key, pred_data in predictions.items():
-            predicted_scaled = pred_data['prediction']
-            
-            # Create a dummy array with all features set to 0 except price
-            dummy_features = np.zeros(len(lstm_predictor.feature_columns))
-            dummy_features[0] = predicted_scaled  # Price is first column
-            
-            # Inverse transform
-            predicted_price = scaler.inverse_transform([dummy_features])[0][0]
+            # Inverse transform to original scale (price is the first feature column)
+            predicted_price = model.inverse_transform_price(pred_data['prediction'])
             
             # Calculate confidence intervals (simple ±5%)
             confidence_lower = predicted_price * 0.95
@@ -218,20 +188,51 @@ async def get_model_performance():
     }
 
 
-@router.post("/models/retrain/{symbol}")
+@router.post("/models/retrain/{symbol}", status_code=202)
 async def retrain_model(symbol: str):
     """
-    Trigger model retraining for a symbol
+    Start retraining a symbol's LSTM in the background
+    
+    Returns the training job; poll /models/retrain/jobs/{job_id} for progress.
+    The new model is served as soon as the job completes.
     """
     try:
-        result = await predict_lstm_price(symbol, retrain=True)
+        symbol = symbol.upper()
+        features = await feature_store.get(symbol)
+        
+        if len(features) < 100:
+            raise HTTPException(status_code=400, detail="Insufficient historical data")
+        
+        job = training_jobs.submit(symbol, features.frame())
         return {
-            "message": f"Model retrained successfully for {symbol}",
-            "result": result
+            "message": f"Retraining started for {symbol}",
+            "job": job
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Retraining error: {str(e)}")
 
+
+@router.get("/models/retrain/jobs/{job_id}")
+async def get_retrain_job(job_id: str):
+    """
+    Status and per-epoch progress of a retraining job
+    """
+    job = training_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown training job: {job_id}")
+    return job
+
+
+@router.get("/features/stats")
+async def get_feature_store_stats():
+    """
+    Feature store hit rate, build cost and per-symbol staleness
+    """
+    return feature_store.stats()
+
+
 @router.get("/risk/classify/{symbol}")
 async def classify_risk(symbol: str):
     """
@@ -246,22 +247,13 @@ async def classify_risk(symbol: str):
     try:
         symbol = symbol.upper()
         
-        # Fetch historical data (365 days for better feature calculation)
-        df = await data_collector.fetch_historical_data(symbol, days=365)
+        # Risk features (365 days, BTC correlation) from today's feature store entry
+        features = await feature_store.get(symbol)
         
-        if len(df) < 100:
+        if len(features) < 100:
             raise HTTPException(status_code=400, detail="Insufficient data for risk analysis")
         
-        # Fetch BTC data for correlation features
-        btc_df = None
-        if symbol != 'BTC':
-            try:
-                btc_df = await data_collector.fetch_historical_data('BTC', days=365)
-            except:
-                pass  # If BTC data unavailable, correlation features will use defaults
-        
-        # Calculate risk features
-        risk_features = await asyncio.to_thread(risk_feature_engineer.engineer_features, df, btc_df)
+        risk_features = dict(features.risk)
         
         # Classify risk
         risk_prediction = await asyncio.to_thread(risk_classifier.predict, risk_features)
@@ -269,48 +261,74 @@ async def classify_risk(symbol: str):
         # Get top risk factors
         top_factors = await asyncio.to_thread(risk_classifier.get_top_risk_factors, risk_features, 5)
         
-        # Calculate volatility forecast (simple rolling forecast)
-        current_volatility = risk_features.get('historical_volatility', 0)
-        ewm_volatility = risk_features.get('ewm_volatility', 0)
+        result = format_risk_result(symbol, risk_prediction, risk_features, top_factors)
+        result["timestamp"] = datetime.now().isoformat()
         
-        # Simple forecast: blend current and EWM
-        forecast_7d = (current_volatility + ewm_volatility) / 2
-        forecast_30d = ewm_volatility  # Longer-term tends toward EWM
+        return result
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Risk classification error: {str(e)}")
+
+@router.get("/risk/universe")
+async def classify_risk_universe():
+    """
+    Risk classification for every tracked cryptocurrency
+    
+    Scored in one batch and cached for the day.
+    """
+    try:
+        return await risk_universe.classify()
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Risk classification error: {str(e)}")
+
+
+@router.get("/risk/portfolio")
+async def classify_portfolio_risk(
+    symbols: str = "BTC,ETH",
+    weights: Optional[str] = None
+):
+    """
+    Aggregate risk of a crypto portfolio from the day's cached classifications
+    
+    Args:
+        symbols: Comma-separated crypto symbols (e.g., "BTC,ETH,SOL")
+        weights: Optional comma-separated position weights in the same order
+            (default: equal weights)
+    
+    Returns:
+        Weighted risk level, score and probabilities, plus per-holding risk
+    """
+    try:
+        symbol_list = [s.strip().upper() for s in symbols.split(',') if s.strip()]
+        if not symbol_list:
+            raise HTTPException(status_code=400, detail="No symbols provided")
         
-        result = {
-            "symbol": symbol,
-            "risk_level": risk_prediction['risk_level'],
-            "risk_score": round(risk_prediction['risk_score'], 1),
-            "probabilities": {
-                "low": round(risk_prediction['probabilities']['low'], 3),
-                "medium": round(risk_prediction['probabilities']['medium'], 3),
-                "high": round(risk_prediction['probabilities']['high'], 3)
-            },
-            "volatility": {
-                "current": round(current_volatility, 2),
-                "forecast_7d": round(forecast_7d, 2),
-                "forecast_30d": round(forecast_30d, 2)
-            },
-            "top_risk_factors": [
-                {
-                    "factor": f['factor'].replace('_', ' ').title(),
-                    "value": round(f.get('value', 0), 2),
-                    "impact": round(f['impact'], 3)
-                }
-                for f in top_factors
-            ],
-            "model_trained": risk_prediction['model_trained'],
-            "timestamp": datetime.now().isoformat()
-        }
+        if weights:
+            weight_list = [float(w) for w in weights.split(',')]
+            if len(weight_list) != len(symbol_list):
+                raise HTTPException(status_code=400, detail="Provide one weight per symbol")
+        else:
+            weight_list = [1.0] * len(symbol_list)
         
+        result = await risk_universe.portfolio(dict(zip(symbol_list, weight_list)))
+        result["timestamp"] = datetime.now().isoformat()
         return result
     
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid input: {str(e)}")
     except Exception as e:
         import traceback
         traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Risk classification error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Portfolio risk error: {str(e)}")
+
 
 @router.get("/sentiment/analyze/{symbol}")
 async def analyze_sentiment(symbol: str):
@@ -328,8 +346,7 @@ async def analyze_sentiment(symbol: str):
         
         # Get current price for context
         try:
-            df = await data_collector.fetch_historical_data(symbol, days=7)
-            current_price = float(df['price'].iloc[-1]) if len(df) > 0 else None
+            current_price = await feature_store.latest_price(symbol)
         except:
             current_price = None
         
@@ -413,8 +430,8 @@ async def compare_models(symbol: str):
     try:
         symbol = symbol.upper()
         
-        # Fetch historical data
-        df = await data_collector.fetch_historical_data(symbol, days=365)
+        # Historical data from the feature store
+        df = await feature_store.live_history(symbol)
         
         if len(df) < 60:
             raise HTTPException(status_code=400, detail="Insufficient data for comparison")
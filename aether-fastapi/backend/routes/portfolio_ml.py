@@ -0,0 +1,71 @@
+"""
+Portfolio ML API Routes
+Cross-asset analytics spanning the user's crypto and share holdings
+"""
+
+import asyncio
+from typing import Dict, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from database import get_db
+from models.crypto import CryptoHolding
+from models.shares import Share, ShareStatus
+from models.user import User
+from routes.auth import get_current_user
+from services.stock_api import normalize_indian_stock_symbol
+from ml.data.cross_asset import cross_asset_engine
+
+router = APIRouter(prefix="/api/portfolio/ml", tags=["Portfolio ML"])
+
+
+def _holding_values(db: Session, user_id) -> Tuple[Dict[str, float], Dict[str, float]]:
+    """Position value per crypto symbol and per (yfinance-normalized) share ticker"""
+    crypto: Dict[str, float] = {}
+    for h in db.query(CryptoHolding).filter(CryptoHolding.user_id == user_id).all():
+        value = float(h.quantity or 0) * float(h.current_price or 0)
+        if value > 0:
+            symbol = h.symbol.upper()
+            crypto[symbol] = crypto.get(symbol, 0.0) + value
+
+    equities: Dict[str, float] = {}
+    for share in db.query(Share).filter(
+        Share.user_id == user_id,
+        Share.status == ShareStatus.ACTIVE
+    ).all():
+        value = float(share.quantity or 0) * float(share.current_price or 0)
+        if value > 0:
+            ticker = normalize_indian_stock_symbol(share.symbol)
+            equities[ticker] = equities.get(ticker, 0.0) + value
+    return crypto, equities
+
+
+@router.get("/diversification")
+async def get_cross_asset_diversification(
+    days: int = Query(90, ge=30, le=365, description="History window in days"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Cross-asset diversification of the user's crypto and share holdings.
+
+    Crypto (trading 7 days a week) and equities (NSE/NYSE sessions) are
+    aligned on a common session grid before correlating, so weekend crypto
+    moves count towards the next session.
+
+    Returns:
+        Correlation matrix, average correlation within and across asset
+        classes, portfolio vs. stand-alone volatility and risk contributions
+    """
+    crypto, equities = await asyncio.to_thread(_holding_values, db, current_user.id)
+
+    if len(crypto) + len(equities) < 2:
+        raise HTTPException(status_code=400, detail="Need at least 2 holdings for diversification analysis")
+
+    try:
+        results = await cross_asset_engine.diversification(crypto, equities, days)
+        return {"status": "success", "data": results}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid input: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Cross-asset analysis error: {str(e)}")
@@ -8,7 +8,9 @@ from uuid import UUID
 from database import get_db
 from models.shares import Share, ShareStatus, HoldingDuration
 from models.user import User
+from models.anomaly_event import AnomalyEvent
 from routes.auth import get_current_user
+from ml.shares.stream_anomaly import stream_anomaly_detector
 
 router = APIRouter(prefix="/api/shares", tags=["Shares"])
 
@@ -473,11 +475,25 @@ def refresh_all_prices(
             else:
                 errors.append(f"{share.symbol}: Price unavailable")
         
+        # Feed the quotes to the streaming anomaly detector; a detector or
+        # insert failure must never block the price update itself, so the
+        # events are written in a savepoint that alone is rolled back
+        db.flush()
+        anomaly_count = 0
+        try:
+            events = stream_anomaly_detector.ingest(prices)
+            with db.begin_nested():
+                db.add_all([AnomalyEvent(**event) for event in events])
+            anomaly_count = len(events)
+        except Exception as e:
+            print(f"Streaming anomaly detection failed: {e}")
+        
         db.commit()
         
         return {
             "updated_count": updated_count,
             "total_holdings": len(active_shares),
+            "anomalies_detected": anomaly_count,
             "errors": errors if errors else None,
             "message": f"Successfully updated {updated_count} holdings"
         }
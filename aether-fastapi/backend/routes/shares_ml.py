@@ -4,16 +4,23 @@ Isolated endpoints for stock predictions, risk analysis, and insights
 """
 
 import asyncio
-from fastapi import APIRouter, HTTPException, Depends, Query
+import json
+from fastapi import APIRouter, HTTPException, Depends, Query, BackgroundTasks
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from typing import Optional, List
 from database import get_db
-from ml.shares.price_predictor import PricePredictor
+from models.anomaly_event import AnomalyEvent
+from ml.shares.price_predictor import PricePredictor, PREDICTION_MODES, deep_refiner
+from ml.shares.backtester import backtester, MODEL_FOR_MODE
+from ml.shares.batch_predictor import fetch_histories, stream_predictions, refine_in_pool
 from ml.shares.risk_analyzer import RiskAnalyzer
 from ml.shares.insights_generator import InsightsGenerator
 from ml.shares.sentiment_analyzer import stock_sentiment_analyzer
-from ml.shares.anomaly_detector import AnomalyDetector
+from ml.shares.anomaly_detector import anomaly_detector
 from ml.shares.correlation_analyzer import CorrelationAnalyzer
+from ml.shares.screener import screener, SIGNALS as SCREENER_SIGNALS, SORT_FIELDS as SCREENER_SORT_FIELDS
 
 # Isolated router for Shares ML
 router = APIRouter(prefix="/api", tags=["Shares ML"])
@@ -22,15 +29,24 @@ router = APIRouter(prefix="/api", tags=["Shares ML"])
 @router.get("/shares/ml/price-prediction")
 async def get_price_prediction(
     ticker: str,
+    background_tasks: BackgroundTasks,
     horizon: Optional[int] = 30,
+    mode: str = Query("fast", description="'fast' (exponential smoothing) or 'deep' (Prophet + ARIMA)"),
     db: Session = Depends(get_db)
 ):
     """
-    Multi-model stock price prediction using Prophet + ARIMA ensemble.
+    Stock price prediction.
+    
+    The default fast mode answers from a damped-trend exponential smoothing
+    model in milliseconds and queues the Prophet + ARIMA ensemble in the
+    background; once that finishes, mode=deep returns it from cache.
+    Accuracy metrics are read from a walk-forward backtest that is also
+    computed in the background ('status' says whether they are current).
     
     Args:
         ticker: Stock ticker symbol (e.g., 'AAPL', 'MSFT')
         horizon: Prediction horizon in days (7, 30, or 90)
+        mode: 'fast' or 'deep'
     
     Returns:
         Prediction results with confidence intervals and metrics
@@ -41,11 +57,42 @@ async def get_price_prediction(
             status_code=400,
             detail="Horizon must be 7, 30, or 90 days"
         )
+    if mode not in PREDICTION_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Mode must be one of: {', '.join(PREDICTION_MODES)}"
+        )
     
     try:
-        # Initialize and run predictor — wrapped in thread so event loop stays free
-        predictor = PricePredictor(ticker=ticker, horizon_days=horizon)
-        results = await asyncio.to_thread(predictor.run_full_prediction)
+        close = None
+        if mode == 'deep':
+            results = deep_refiner.get(ticker, horizon)
+            if results is None:
+                results = await asyncio.to_thread(deep_refiner.refine, ticker, horizon)
+                if results is None:
+                    raise ValueError(f"Deep prediction unavailable for {ticker.upper()}")
+            # Cached results may predate the backtest finishing
+            results = {
+                **results,
+                'metrics': backtester.lookup(ticker.upper(), MODEL_FOR_MODE['deep'], horizon, results.get('as_of'))
+            }
+        else:
+            # Initialize and run predictor — wrapped in thread so event loop stays free
+            predictor = PricePredictor(ticker=ticker, horizon_days=horizon, mode='fast')
+            results = await asyncio.to_thread(predictor.run_full_prediction)
+            close = predictor.historical_data['Close']
+            
+            # Refine with the deep ensemble after the response is sent
+            if deep_refiner.claim(ticker, horizon):
+                background_tasks.add_task(deep_refiner.refine, ticker, horizon)
+            results['refinement'] = {
+                'mode': 'deep',
+                'status': deep_refiner.status(ticker, horizon)
+            }
+        
+        # Metrics come from the walk-forward backtest store; compute them off the request path
+        if results['metrics'].get('status') != 'ready':
+            background_tasks.add_task(backtester.run, ticker, MODEL_FOR_MODE[mode], horizon, close)
         
         return {
             "status": "success",
@@ -64,6 +111,86 @@ async def get_price_prediction(
         )
 
 
+class BatchPredictionRequest(BaseModel):
+    tickers: List[str]
+    horizons: List[int] = [30]
+    mode: str = "fast"
+
+
+@router.post("/shares/ml/price-prediction/batch")
+async def get_batch_price_predictions(
+    request: BatchPredictionRequest,
+    background_tasks: BackgroundTasks
+):
+    """
+    Stock price predictions for many tickers in one call.
+    
+    All histories come from a single batched download. Fast mode fits every
+    ticker in one vectorized pass; deep mode runs the ensemble fits in
+    parallel worker processes. Results stream back as NDJSON, one line per
+    (ticker, horizon), as each finishes. Fast-mode deep refinements are
+    started in the worker pool as their lines go out.
+    
+    Args:
+        tickers: Stock ticker symbols
+        horizons: Prediction horizons in days (each 7, 30, or 90)
+        mode: 'fast' or 'deep'
+    
+    Returns:
+        application/x-ndjson stream of {ticker, horizon, status, data|detail}
+    """
+    tickers = list(dict.fromkeys(t.strip().upper() for t in request.tickers if t.strip()))
+    horizons = sorted(set(request.horizons))
+    mode = request.mode
+    
+    if not tickers:
+        raise HTTPException(status_code=400, detail="At least one ticker is required")
+    if not horizons or any(h not in [7, 30, 90] for h in horizons):
+        raise HTTPException(status_code=400, detail="Horizons must be 7, 30, or 90 days")
+    if mode not in PREDICTION_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Mode must be one of: {', '.join(PREDICTION_MODES)}"
+        )
+    
+    try:
+        histories = await asyncio.to_thread(fetch_histories, tickers)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+    
+    async def ndjson():
+        for ticker in tickers:
+            if ticker not in histories:
+                for horizon in horizons:
+                    yield json.dumps({
+                        'ticker': ticker, 'horizon': horizon, 'status': 'error',
+                        'detail': f"No data found for ticker {ticker}"
+                    }) + "\n"
+        
+        async for line in stream_predictions(histories, horizons, mode):
+            if line['status'] == 'success':
+                ticker, horizon, results = line['ticker'], line['horizon'], line['data']
+                if mode == 'deep':
+                    results = line['data'] = {
+                        **results,
+                        'metrics': backtester.lookup(ticker, MODEL_FOR_MODE['deep'], horizon, results.get('as_of'))
+                    }
+                else:
+                    if deep_refiner.claim(ticker, horizon):
+                        refine_in_pool(ticker, horizon, histories[ticker])
+                    results['refinement'] = {
+                        'mode': 'deep',
+                        'status': deep_refiner.status(ticker, horizon)
+                    }
+                if results['metrics'].get('status') != 'ready':
+                    background_tasks.add_task(
+                        backtester.run, ticker, MODEL_FOR_MODE[mode], horizon, histories[ticker]['Close']
+                    )
+            yield json.dumps(line) + "\n"
+    
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson", background=background_tasks)
+
+
 @router.get("/shares/ml/risk-analysis")
 async def get_risk_analysis(
     tickers: str = Query(..., description="Comma-separated list of tickers"),
@@ -217,21 +344,59 @@ async def get_stock_sentiment_history(
 @router.get("/shares/ml/anomaly-detection")
 async def get_anomaly_detection(
     tickers: str = Query(..., description="Comma-separated list of tickers"),
+    limit: int = Query(30, ge=1, le=100, description="Streaming events per page"),
+    before_id: Optional[int] = Query(None, description="Return streaming events older than this id"),
     db: Session = Depends(get_db)
 ):
     """
     Detect anomalies in stock price and volume using Isolation Forest.
 
+    Daily-bar anomalies come from the per-ticker Isolation Forests;
+    stream_events pages (newest first) through the events recorded by the
+    streaming detector on each price refresh. Pass next_before_id back as
+    before_id for the next page.
+
     Args:
         tickers: Comma-separated ticker symbols (e.g., 'AAPL,MSFT,GOOGL')
+        limit: Streaming events per page
+        before_id: Cursor from the previous page
 
     Returns:
         Anomaly events with severity, descriptions, and summary stats
     """
     try:
         ticker_list = [t.strip().upper() for t in tickers.split(',')]
-        detector = AnomalyDetector()
-        results = await asyncio.to_thread(detector.detect, ticker_list)
+        results = await asyncio.to_thread(anomaly_detector.detect, ticker_list)
+
+        # Refresh stores normalized symbols; bare Indian tickers gain .NS/.BO
+        symbols = set(ticker_list)
+        symbols.update(f"{t}{suffix}" for t in ticker_list if '.' not in t for suffix in ('.NS', '.BO'))
+        query = db.query(AnomalyEvent).filter(AnomalyEvent.symbol.in_(symbols))
+        if before_id is not None:
+            query = query.filter(AnomalyEvent.id < before_id)
+        events = query.order_by(AnomalyEvent.id.desc()).limit(limit).all()
+
+        results["stream_events"] = {
+            "items": [
+                {
+                    "id": e.id,
+                    "symbol": e.symbol,
+                    "type": e.anomaly_type,
+                    "severity": e.severity,
+                    "description": e.description,
+                    "price": e.price,
+                    "previous_price": e.previous_price,
+                    "price_change": e.price_change,
+                    "volume_change": e.volume_change,
+                    "price_zscore": e.price_zscore,
+                    "volume_zscore": e.volume_zscore,
+                    "quote_time": e.quote_time.isoformat() if e.quote_time else None,
+                    "detected_at": e.detected_at.isoformat() if e.detected_at else None,
+                }
+                for e in events
+            ],
+            "next_before_id": events[-1].id if len(events) == limit else None,
+        }
         return {"status": "success", "data": results}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=f"Invalid input: {str(e)}")
@@ -264,6 +429,40 @@ async def get_correlation_analysis(
         raise HTTPException(status_code=500, detail=f"Correlation analysis error: {str(e)}")
 
 
+@router.get("/shares/ml/screener")
+async def get_screener(
+    sector: Optional[str] = Query(None, description="Filter by sector (e.g. 'Banks')"),
+    signal: Optional[str] = Query(None, description=f"Filter by signal: {', '.join(SCREENER_SIGNALS)}"),
+    sort: str = Query("score", description=f"Sort by: {', '.join(SCREENER_SORT_FIELDS)}"),
+    descending: bool = True,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=200)
+):
+    """
+    Ranked momentum/RSI/volume/anomaly signals for the whole INDIAN_STOCKS
+    catalog, as written by the nightly screener job
+    (python ml/shares/screener.py).
+
+    Returns:
+        One page of the signal table with totals
+    """
+    try:
+        results = await asyncio.to_thread(
+            screener.query, sector, signal, sort, descending, page, page_size
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid input: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Screener error: {str(e)}")
+
+    if results is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Screener has not run yet (run python ml/shares/screener.py)"
+        )
+    return {"status": "success", "data": results}
+
+
 @router.get("/shares/ml/test")
 async def test_shares_ml():
     """Test endpoint to verify Shares ML router is working"""
@@ -276,6 +475,7 @@ async def test_shares_ml():
             "/api/shares/ml/insights",
             "/api/shares/ml/sentiment",
             "/api/shares/ml/sentiment/history",
+            "/api/shares/ml/screener",
             "/api/shares/ml/test"
         ]
     }
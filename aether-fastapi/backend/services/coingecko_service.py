@@ -11,6 +11,8 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 import logging
 
+from ml.data import indicators
+
 logger = logging.getLogger(__name__)
 
 # CoinGecko API base URL (free tier)
@@ -200,32 +202,29 @@ def calculate_technical_indicators(df: pd.DataFrame) -> pd.DataFrame:
         DataFrame with additional indicator columns
     """
     df = df.copy()
+    price = df["price"].values
     
     # Moving Averages
-    df["ma_7"] = df["price"].rolling(window=7, min_periods=1).mean()
-    df["ma_30"] = df["price"].rolling(window=30, min_periods=1).mean()
-    df["ma_90"] = df["price"].rolling(window=90, min_periods=1).mean()
+    df["ma_7"] = indicators.sma(price, 7, min_periods=1)
+    df["ma_30"] = indicators.sma(price, 30, min_periods=1)
+    df["ma_90"] = indicators.sma(price, 90, min_periods=1)
     
     # Price momentum (% change)
-    df["momentum_7d"] = df["price"].pct_change(periods=7) * 100
-    df["momentum_30d"] = df["price"].pct_change(periods=30) * 100
+    df["momentum_7d"] = indicators.pct_change(price, 7) * 100
+    df["momentum_30d"] = indicators.pct_change(price, 30) * 100
     
     # Volatility (rolling std)
-    df["volatility_7d"] = df["price"].rolling(window=7, min_periods=1).std()
-    df["volatility_30d"] = df["price"].rolling(window=30, min_periods=1).std()
+    df["volatility_7d"] = indicators.rolling_std(price, 7, min_periods=1)
+    df["volatility_30d"] = indicators.rolling_std(price, 30, min_periods=1)
     
-    # RSI (14-day)
-    delta = df["price"].diff()
-    gain = delta.where(delta > 0, 0).rolling(window=14, min_periods=1).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=14, min_periods=1).mean()
-    rs = gain / loss.replace(0, 1e-10)
-    df["rsi_14"] = 100 - (100 / (1 + rs))
+    # RSI (14-day, simple-average smoothing)
+    df["rsi_14"] = indicators.rsi(price, 14, smoothing='sma', min_periods=1)
     
     # Price relative to moving averages
     df["price_vs_ma_30"] = (df["price"] / df["ma_30"] - 1) * 100
     df["price_vs_ma_90"] = (df["price"] / df["ma_90"] - 1) * 100
     
     # Fill NaN values
-    df = df.fillna(method="bfill").fillna(0)
+    df = df.bfill().fillna(0)
     
     return df
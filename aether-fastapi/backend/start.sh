@@ -11,6 +11,15 @@ echo "🔄 Clearing port 8000..."
 lsof -ti :8000 | xargs kill -9 2>/dev/null
 sleep 1
 
+echo "📰 Starting news ingester (every 15 min)..."
+python ingest_news.py --every 15 &
+INGEST_PID=$!
+
+echo "📊 Starting stock screener (daily at 11:30 UTC, after the NSE close)..."
+python ml/shares/screener.py --at 11:30 &
+SCREENER_PID=$!
+trap 'kill $INGEST_PID $SCREENER_PID 2>/dev/null' EXIT
+
 echo "🚀 Starting Aether with auto-restart..."
 while true; do
     uvicorn main:app \